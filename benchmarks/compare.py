@@ -0,0 +1,79 @@
+# benchmarks/compare.py
+"""
+Compare two benchmarks.run result files and flag regressions.
+
+A scenario regresses when its median grew by more than --threshold percent
+AND by more than --min-delta-ms (so sub-millisecond noise is ignored), or
+when it issues more SQL queries than before. Exit status is 1 if anything
+regressed, so the script can gate CI.
+
+Usage (from the repository root):
+    python -m benchmarks.compare base.json head.json --threshold 10
+"""
+
+import argparse
+import json
+import sys
+
+
+def load(path):
+    with open(path, encoding="utf-8") as fh:
+        report = json.load(fh)
+    return {
+        (run["dialect"], name): stats
+        for run in report["runs"]
+        for name, stats in run["scenarios"].items()
+    }, report["meta"]
+
+
+def compare(base, head, threshold, min_delta_ms):
+    """Yield (key, base_stats, head_stats, change_pct, regressed) per shared scenario."""
+    for key in sorted(set(base) & set(head)):
+        b, h = base[key], head[key]
+        delta = h["median_ms"] - b["median_ms"]
+        change = (delta / b["median_ms"] * 100) if b["median_ms"] else 0.0
+
+        slower = change > threshold and delta > min_delta_ms
+        more_queries = h.get("sql_queries", 0) > b.get("sql_queries", 0)
+        failing = h.get("errors", 0) > b.get("errors", 0)
+
+        yield key, b, h, change, slower or more_queries or failing
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("base")
+    parser.add_argument("head")
+    parser.add_argument("--threshold", type=float, default=10.0, help="allowed median slowdown in percent")
+    parser.add_argument("--min-delta-ms", type=float, default=1.0, help="ignore slowdowns smaller than this")
+    args = parser.parse_args(argv)
+
+    base, base_meta = load(args.base)
+    head, head_meta = load(args.head)
+
+    if base_meta.get("outgoing_rows") != head_meta.get("outgoing_rows") or base_meta.get("seed") != head_meta.get("seed"):
+        print("warning: results were produced with a different scale or seed", file=sys.stderr)
+
+    print(f"base {base_meta.get('commit') or '?'} -> head {head_meta.get('commit') or '?'}")
+    print(f"{'database':<11} {'scenario':<26} {'base ms':>10} {'head ms':>10} {'change':>8} {'queries':>9}")
+
+    regressions = 0
+    for (dialect, name), b, h, change, regressed in compare(base, head, args.threshold, args.min_delta_ms):
+        queries = f"{b.get('sql_queries', '-')}->{h.get('sql_queries', '-')}"
+        flag = "  REGRESSION" if regressed else ""
+        print(f"{dialect:<11} {name:<26} {b['median_ms']:>10.2f} {h['median_ms']:>10.2f} "
+              f"{change:>+7.1f}% {queries:>9}{flag}")
+        regressions += regressed
+
+    missing = sorted(set(base) - set(head))
+    for dialect, name in missing:
+        print(f"{dialect:<11} {name:<26} missing from head")
+
+    if regressions:
+        print(f"\n{regressions} scenario(s) regressed beyond {args.threshold:.0f}%")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,184 @@
+# benchmarks/datagen.py
+"""
+Seeded synthetic data generator for the inventory models.
+
+The same (scale, seed) always produces the same rows, so timings taken on
+different commits are comparable. Rows are written with Core executemany
+inserts in chunks, which keeps memory flat up to millions of rows.
+
+Usage (from the repository root):
+    SQLALCHEMY_DATABASE_URI=sqlite:////tmp/bench.db \
+        python -m benchmarks.datagen --scale medium --seed 42
+"""
+
+import argparse
+import random
+from datetime import date, timedelta
+from decimal import Decimal
+
+from sqlalchemy import insert, text
+from werkzeug.security import generate_password_hash
+
+ADMIN_EMAIL = "bench-admin@example.com"
+ADMIN_PASSWORD = "bench-password"
+
+# number of Outgoing rows per preset; every other table is derived from it
+SCALES = {
+    "tiny": 1_000,
+    "small": 10_000,
+    "medium": 100_000,
+    "large": 1_000_000,
+    "xlarge": 5_000_000,
+}
+
+CHUNK_SIZE = 10_000
+
+
+def table_counts(outgoing):
+    """Row counts per model for a given number of Outgoing rows."""
+    return {
+        "users": 10,
+        "categories": 25,
+        "products": max(50, outgoing // 100),
+        "customers": max(50, outgoing // 50),
+        "suppliers": max(10, outgoing // 500),
+        "outgoing": outgoing,
+        "purchases": max(10, outgoing // 2),
+    }
+
+
+def category_name(i):
+    return f"Category {i:03d}"
+
+
+def product_name(i):
+    return f"Product {i:07d}"
+
+
+def generate(db, outgoing=SCALES["small"], seed=42, years=3, end_date=None, echo=print):
+    """
+    Fill an empty database. Must be called inside an app context.
+    Returns the row counts that were written.
+    """
+    from website.models import User, Category, Product, Customer, Supplier, Outgoing, Purchase
+
+    rng = random.Random(seed)
+    counts = table_counts(outgoing)
+    end_date = end_date or date.today()
+    span_days = 365 * years
+
+    def random_date():
+        return end_date - timedelta(days=rng.randrange(span_days))
+
+    def write(model, total, make_row):
+        table = model.__table__
+        written = 0
+        while written < total:
+            n = min(CHUNK_SIZE, total - written)
+            rows = [make_row(written + i + 1) for i in range(n)]
+            db.session.execute(insert(table), rows)
+            db.session.commit()
+            written += n
+        echo(f"  {table.name}: {written} rows")
+
+    password = generate_password_hash(ADMIN_PASSWORD)
+    write(User, counts["users"], lambda i: {
+        "id": i,
+        "email": ADMIN_EMAIL if i == 1 else f"user{i}@example.com",
+        "first_name": "Bench" if i == 1 else f"User{i}",
+        "password": password,
+        "role": "admin" if i <= 2 else "user",
+    })
+
+    write(Category, counts["categories"], lambda i: {
+        "id": i,
+        "name": category_name(i),
+    })
+
+    prices = [None] + [Decimal(rng.randrange(100, 100_000)) / 100 for _ in range(counts["products"])]
+    write(Product, counts["products"], lambda i: {
+        "id": i,
+        "name": product_name(i),
+        "price": prices[i],
+        "quantity": rng.randrange(0, 1000),
+        "category_id": rng.randrange(1, counts["categories"] + 1),
+    })
+
+    write(Customer, counts["customers"], lambda i: {
+        "id": i,
+        "name": f"Customer {i:07d}",
+        "address": f"{rng.randrange(1, 999)} Main Street, Town {rng.randrange(1, 200)}",
+        "email": f"customer{i}@example.com",
+        "contact": f"09{rng.randrange(10**8, 10**9)}",
+    })
+
+    write(Supplier, counts["suppliers"], lambda i: {
+        "id": i,
+        "name": f"Supplier {i:05d}",
+        "address": f"{rng.randrange(1, 999)} Industrial Road",
+        "email": f"supplier{i}@example.com",
+        "contact": f"08{rng.randrange(10**8, 10**9)}",
+    })
+
+    def outgoing_row(i):
+        product_id = rng.randrange(1, counts["products"] + 1)
+        quantity = rng.randrange(1, 50)
+        return {
+            "id": i,
+            "product_id": product_id,
+            "customer_id": rng.randrange(1, counts["customers"] + 1),
+            "quantity": quantity,
+            "date": random_date(),
+            "unit_price": prices[product_id],
+            "line_total": prices[product_id] * quantity,
+        }
+
+    write(Outgoing, counts["outgoing"], outgoing_row)
+
+    write(Purchase, counts["purchases"], lambda i: {
+        "id": i,
+        "product_id": rng.randrange(1, counts["products"] + 1),
+        "supplier_id": rng.randrange(1, counts["suppliers"] + 1),
+        "quantity": rng.randrange(1, 200),
+        "date": random_date(),
+    })
+
+    _reset_sequences(db)
+    return counts
+
+
+def _reset_sequences(db):
+    """Explicit ids bypass Postgres sequences; move them past the max id."""
+    if db.engine.dialect.name != "postgresql":
+        return
+
+    for table in ("user", "category", "product", "customer", "supplier", "outgoing", "purchase"):
+        db.session.execute(text(
+            f"SELECT setval(pg_get_serial_sequence('\"{table}\"', 'id'), "
+            f"COALESCE((SELECT MAX(id) FROM \"{table}\"), 1))"
+        ))
+    db.session.commit()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--scale", default="small",
+                        help=f"preset ({', '.join(SCALES)}) or a number of Outgoing rows")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--years", type=int, default=3, help="history spread of Outgoing/Purchase dates")
+    parser.add_argument("--end-date", type=date.fromisoformat, default=None,
+                        help="newest Outgoing/Purchase date, YYYY-MM-DD (default today)")
+    args = parser.parse_args(argv)
+
+    outgoing = SCALES[args.scale] if args.scale in SCALES else int(args.scale)
+
+    from website import create_app, db
+
+    app = create_app()
+    with app.app_context():
+        print(f"Generating {outgoing} outgoing rows (seed={args.seed}) into {db.engine.url!r}")
+        generate(db, outgoing=outgoing, seed=args.seed, years=args.years, end_date=args.end_date)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+# benchmarks/pdf_reports.py
+"""
+Render time and size of a large tabular PDF: website.pdf_reports against
+the per-cell drawString layout the export views used before it.
+
+No database is needed; rows are synthetic and shaped like the outgoing
+export (id, product, customer, quantity, date).
+
+Usage (from the repository root):
+    python -m benchmarks.pdf_reports --rows 100000 --repeat 3
+"""
+
+import argparse
+import io
+import statistics
+from datetime import date, timedelta
+from time import perf_counter
+
+from reportlab import rl_config
+from reportlab.lib.pagesizes import letter
+from reportlab.pdfgen import canvas
+
+from website.pdf_reports import Column, render_report
+
+
+def make_rows(count):
+    start = date(2024, 1, 1)
+    return [
+        (i, f"Product {i % 5000:05d}", f"Customer {i % 800:05d}", i % 40 + 1, start + timedelta(days=i % 700))
+        for i in range(1, count + 1)
+    ]
+
+
+def legacy(out, rows):
+    # the layout of outgoing_export_pdf before the shared report engine,
+    # with reportlab's default ASCII85 page encoding (the engine turns it off)
+    rl_config.useA85 = 1
+    try:
+        _legacy(out, rows)
+    finally:
+        rl_config.useA85 = 0
+
+
+def _legacy(out, rows):
+    c = canvas.Canvas(out, pagesize=letter)
+    width, height = letter
+    y = height - 50
+
+    c.setFont("Helvetica-Bold", 14)
+    c.drawString(30, y, "Outgoing Products List")
+    y -= 30
+
+    c.setFont("Helvetica-Bold", 10)
+    c.drawString(30, y, "ID")
+    c.drawString(60, y, "Product")
+    c.drawString(200, y, "Customer")
+    c.drawString(380, y, "Qty")
+    c.drawString(420, y, "Date")
+    y -= 20
+    c.setFont("Helvetica", 9)
+
+    for row_id, product, customer, quantity, day in rows:
+        if y < 50:
+            c.showPage()
+            y = height - 50
+            c.setFont("Helvetica", 9)
+        c.drawString(30, y, str(row_id))
+        c.drawString(60, y, product[:20])
+        c.drawString(200, y, customer[:20])
+        c.drawString(380, y, str(quantity))
+        c.drawString(420, y, day.isoformat())
+        y -= 15
+    c.save()
+
+
+def engine(out, rows):
+    render_report(
+        out,
+        "Outgoing Products List",
+        [
+            Column("ID", 30),
+            Column("Product", 60, 20),
+            Column("Customer", 200, 20),
+            Column("Qty", 380),
+            Column("Date", 420),
+        ],
+        rows,
+    )
+
+
+def measure(fn, rows, repeat):
+    times = []
+    size = 0
+    for _ in range(repeat):
+        out = io.BytesIO()
+        started = perf_counter()
+        fn(out, rows)
+        times.append(perf_counter() - started)
+        size = len(out.getvalue())
+    return statistics.median(times), size
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    rows = make_rows(args.rows)
+    results = {name: measure(fn, rows, args.repeat) for name, fn in (("legacy", legacy), ("engine", engine))}
+
+    print(f"{args.rows} rows, median of {args.repeat}")
+    for name, (seconds, size) in results.items():
+        print(f"  {name:7} {seconds:7.2f} s  {size / 1024 / 1024:7.2f} MiB")
+    (t_old, s_old), (t_new, s_new) = results["legacy"], results["engine"]
+    print(f"  engine: {t_new / t_old:.0%} of the time, {s_new / s_old:.0%} of the size")
+
+
+if __name__ == "__main__":
+    main()
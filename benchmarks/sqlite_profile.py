@@ -0,0 +1,151 @@
+# benchmarks/sqlite_profile.py
+"""
+Write throughput of outgoing_create on SQLite with SQLite's defaults
+against website.sqlite_profile (WAL, synchronous=NORMAL, ...).
+
+For each profile a child process seeds a fresh SQLite file with
+benchmarks.datagen, then for each --threads value runs that many
+closed-loop clients (threads, each with its own logged-in test client)
+POSTing /admin/outgoing/new for --seconds. Reported per run: requests per
+second, p50 / p95 latency, and errors (any response but the redirect,
+e.g. "database is locked").
+
+Usage (from the repository root):
+    python -m benchmarks.sqlite_profile --scale tiny --threads 1,4,8 --seconds 10
+    python -m benchmarks.sqlite_profile --output sqlite.json
+"""
+
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+from time import perf_counter
+
+from .datagen import ADMIN_EMAIL, ADMIN_PASSWORD, SCALES, table_counts
+from .run import percentile
+
+PROFILES = {"default": "0", "profile": "1"}
+
+
+def _clerk(app, counts, seed, deadline, samples, errors):
+    rng = random.Random(seed)
+    client = app.test_client()
+    client.post("/login", data={"email": ADMIN_EMAIL, "password": ADMIN_PASSWORD})
+    while perf_counter() < deadline:
+        form = {
+            "product_id": rng.randrange(1, counts["products"] + 1),
+            "customer_id": rng.randrange(1, counts["customers"] + 1),
+            "quantity": rng.randrange(1, 10),
+            "date": "",
+        }
+        t0 = perf_counter()
+        try:
+            ok = client.post("/admin/outgoing/new", data=form).status_code == 302
+        except Exception:
+            ok = False
+        if ok:
+            samples.append((perf_counter() - t0) * 1000)
+        else:
+            errors.append(1)
+
+
+def child(outgoing, threads, seconds, seed):
+    """Runs in a child process with SQLITE_PROFILE set; returns the results."""
+    fd, path = tempfile.mkstemp(suffix=".db", prefix="bench-sqlite-")
+    os.close(fd)
+    os.environ["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{path}"
+    os.environ.setdefault("PERF_LOG", "0")
+    os.environ.setdefault("METRICS_ENABLED", "0")
+
+    from benchmarks.datagen import generate
+    from website import create_app, db
+
+    try:
+        app = create_app()
+        with app.app_context():
+            db.drop_all()
+            db.create_all()
+            generate(db, outgoing=outgoing, seed=seed, echo=lambda msg: None)
+            journal = db.session.execute(db.text("PRAGMA journal_mode")).scalar()
+
+        counts = table_counts(outgoing)
+        runs = []
+        for n in threads:
+            samples, errors = [], []
+            deadline = perf_counter() + seconds
+            workers = [
+                threading.Thread(target=_clerk, args=(app, counts, seed + i, deadline, samples, errors))
+                for i in range(n)
+            ]
+            started = perf_counter()
+            for w in workers:
+                w.start()
+            for w in workers:
+                w.join()
+            elapsed = perf_counter() - started
+            runs.append({
+                "threads": n,
+                "requests": len(samples),
+                "errors": len(errors),
+                "rps": round(len(samples) / elapsed, 1),
+                "p50_ms": round(percentile(samples, 50), 2) if samples else None,
+                "p95_ms": round(percentile(samples, 95), 2) if samples else None,
+            })
+        return {"journal_mode": journal, "runs": runs}
+    finally:
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--scale", default="tiny",
+                        help=f"preset ({', '.join(SCALES)}) or a number of Outgoing rows")
+    parser.add_argument("--threads", default="1,4,8", help="comma-separated client thread counts")
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="write JSON results here (default: stdout)")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    outgoing = SCALES[args.scale] if args.scale in SCALES else int(args.scale)
+    threads = [int(n) for n in args.threads.split(",")]
+
+    if args.child:
+        print(json.dumps(child(outgoing, threads, args.seconds, args.seed)))
+        return
+
+    # one process per profile: the profile is read when the app is created
+    report = {"scale": args.scale, "outgoing_rows": outgoing, "seconds": args.seconds, "profiles": {}}
+    for name, flag in PROFILES.items():
+        print(f"Running {name} ({outgoing} outgoing rows)...", file=sys.stderr)
+        out = subprocess.check_output(
+            [sys.executable, "-m", "benchmarks.sqlite_profile", "--child", "--scale", str(outgoing),
+             "--threads", args.threads, "--seconds", str(args.seconds), "--seed", str(args.seed)],
+            env={**os.environ, "SQLITE_PROFILE": flag},
+            text=True,
+        )
+        report["profiles"][name] = json.loads(out.strip().splitlines()[-1])
+
+    print(f"{'profile':<10} {'journal':<8} {'threads':>7} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'errors':>7}",
+          file=sys.stderr)
+    for name, result in report["profiles"].items():
+        for run in result["runs"]:
+            print(f"{name:<10} {result['journal_mode']:<8} {run['threads']:>7} {run['rps']:>8} "
+                  f"{run['p50_ms']!s:>8} {run['p95_ms']!s:>8} {run['errors']:>7}", file=sys.stderr)
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as fh:
+            fh.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+# benchmarks/template_cache.py
+"""
+First-request latency of the admin pages in a fresh process, with and
+without the Jinja bytecode cache (website.template_cache).
+
+A SQLite file is seeded once with benchmarks.datagen. Then, per mode,
+--processes fresh child processes each create the app, log in (which
+also opens the database connection), and GET every page twice: the first
+hit pays for compiling the page's templates, the second shows the page's
+steady-state time. The startup heap is frozen out of the garbage
+collector before the first page, so a full collection does not land on
+a random request. Modes:
+
+- off:  TEMPLATE_CACHE=0, every worker compiles every template;
+- cold: cache enabled but empty (a first deploy without the build step);
+- warm: cache filled by `flask precompile-templates`, as after the
+        Docker build.
+
+Usage (from the repository root):
+    python -m benchmarks.template_cache --processes 5
+    python -m benchmarks.template_cache --scale small --output templates.json
+"""
+
+import argparse
+import gc
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+from time import perf_counter
+
+from .datagen import ADMIN_EMAIL, ADMIN_PASSWORD, SCALES
+
+PAGES = [
+    "/",
+    "/admin/products",
+    "/admin/categories",
+    "/admin/customers",
+    "/admin/suppliers",
+    "/admin/outgoing",
+    "/admin/purchases",
+    "/admin/users",
+]
+
+
+def _env(db_path, cache_dir, enabled):
+    return {
+        **os.environ,
+        "SQLALCHEMY_DATABASE_URI": f"sqlite:///{db_path}",
+        "PERF_LOG": "0",
+        "METRICS_ENABLED": "0",
+        "TEMPLATE_CACHE": "1" if enabled else "0",
+        "TEMPLATE_CACHE_DIR": cache_dir,
+    }
+
+
+def child():
+    """Runs in a fresh process: {page: [first ms, second ms]}."""
+    from website import create_app
+
+    app = create_app()
+    client = app.test_client()
+    resp = client.post("/login", data={"email": ADMIN_EMAIL, "password": ADMIN_PASSWORD})
+    if resp.status_code != 302:
+        raise RuntimeError(f"benchmark login failed with status {resp.status_code}")
+
+    # a full collection over the import-time heap takes tens of ms and
+    # lands on whichever request happens to trigger it; take it out of
+    # every mode alike
+    gc.collect()
+    gc.freeze()
+
+    timings = {}
+    for page in PAGES:
+        hits = []
+        for _ in range(2):
+            t0 = perf_counter()
+            resp = client.get(page)
+            hits.append((perf_counter() - t0) * 1000)
+            if resp.status_code != 200:
+                raise RuntimeError(f"{page} answered {resp.status_code}")
+        timings[page] = hits
+    return timings
+
+
+def _seed(db_path, outgoing, seed):
+    os.environ.update(_env(db_path, "", False))
+    from benchmarks.datagen import generate
+    from website import create_app, db
+
+    app = create_app()
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        generate(db, outgoing=outgoing, seed=seed, echo=lambda msg: None)
+
+
+def run_mode(mode, db_path, cache_dir, processes):
+    enabled = mode != "off"
+    shutil.rmtree(cache_dir, ignore_errors=True)
+    if mode == "warm":
+        subprocess.run(
+            [sys.executable, "-m", "flask", "--app", "main", "precompile-templates"],
+            env=_env(db_path, cache_dir, True), check=True, stdout=subprocess.DEVNULL,
+        )
+
+    runs = []
+    for _ in range(processes):
+        if mode == "cold":
+            # every process must find the cache empty, as on a first deploy
+            shutil.rmtree(cache_dir, ignore_errors=True)
+        out = subprocess.check_output(
+            [sys.executable, "-m", "benchmarks.template_cache", "--child"],
+            env=_env(db_path, cache_dir, enabled), text=True,
+        )
+        runs.append(json.loads(out.strip().splitlines()[-1]))
+
+    pages = {}
+    for page in PAGES:
+        first = [run[page][0] for run in runs]
+        second = [run[page][1] for run in runs]
+        pages[page] = {
+            "first_ms": round(statistics.median(first), 2),
+            "second_ms": round(statistics.median(second), 2),
+        }
+    total = statistics.median(sum(run[page][0] for page in PAGES) for run in runs)
+    return {"pages": pages, "first_hits_total_ms": round(total, 2)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--scale", default="tiny",
+                        help=f"preset ({', '.join(SCALES)}) or a number of Outgoing rows")
+    parser.add_argument("--processes", type=int, default=5, help="fresh processes per mode")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="write JSON results here (default: stdout)")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        print(json.dumps(child()))
+        return
+
+    outgoing = SCALES[args.scale] if args.scale in SCALES else int(args.scale)
+    workdir = tempfile.mkdtemp(prefix="bench-templates-")
+    db_path = os.path.join(workdir, "bench.db")
+    cache_dir = os.path.join(workdir, "jinja_cache")
+    try:
+        print(f"Seeding SQLite ({outgoing} outgoing rows)...", file=sys.stderr)
+        _seed(db_path, outgoing, args.seed)
+        report = {"scale": args.scale, "processes": args.processes, "modes": {}}
+        for mode in ("off", "cold", "warm"):
+            print(f"Running {mode}...", file=sys.stderr)
+            report["modes"][mode] = run_mode(mode, db_path, cache_dir, args.processes)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    modes = report["modes"]
+    print(f"{'page':<20}" + "".join(f"{m + ' 1st':>11}" for m in modes) + f"{'2nd':>9}", file=sys.stderr)
+    for page in PAGES:
+        row = "".join(f"{modes[m]['pages'][page]['first_ms']:>11.1f}" for m in modes)
+        print(f"{page:<20}{row}{modes['warm']['pages'][page]['second_ms']:>9.1f}", file=sys.stderr)
+    print(f"{'all first hits':<20}" + "".join(f"{modes[m]['first_hits_total_ms']:>11.1f}" for m in modes),
+          file=sys.stderr)
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as fh:
+            fh.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
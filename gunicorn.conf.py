@@ -0,0 +1,35 @@
+# gunicorn.conf.py
+# Loaded automatically by gunicorn from the working directory.
+
+import os
+import shutil
+import tempfile
+
+# Prometheus multiprocess mode: every worker writes its metric values to
+# files in this directory and /metrics aggregates them. It has to be set
+# before the workers import prometheus_client, and must belong to this
+# gunicorn instance alone. Without PROMETHEUS_MULTIPROC_DIR a fresh
+# directory is made for each start and removed on exit; an explicitly set
+# directory is cleared so values from a previous run are not summed in.
+if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+    metrics_dir = os.environ["PROMETHEUS_MULTIPROC_DIR"]
+    owns_metrics_dir = False
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+    os.makedirs(metrics_dir, exist_ok=True)
+else:
+    metrics_dir = tempfile.mkdtemp(prefix="inventory_metrics-")
+    owns_metrics_dir = True
+    os.environ["PROMETHEUS_MULTIPROC_DIR"] = metrics_dir
+
+# imported here, not inside child_exit: that hook runs from the SIGCHLD
+# handler and a first import there can be interrupted by the next signal
+from prometheus_client import multiprocess  # noqa: E402
+
+
+def child_exit(server, worker):
+    multiprocess.mark_process_dead(worker.pid)
+
+
+def on_exit(server):
+    if owns_metrics_dir:
+        shutil.rmtree(metrics_dir, ignore_errors=True)
@@ -35,24 +35,96 @@ def create_app():
 
     app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
 
+    # SQLITE PROFILE (WAL, PRAGMAs, pool) for the SQLite fallback; before
+    # db.init_app, which creates the engine
+    from .sqlite_profile import init_sqlite
+    init_sqlite(app)
+
     # INIT EXTENSIONS
     db.init_app(app)
+    # the SQLite profile's PRAGMAs, on the engine db.init_app just created
+    from .sqlite_profile import attach_sqlite_pragmas
+    attach_sqlite_pragmas(app)
     mail.init_app(app)
     login_manager.init_app(app)
     login_manager.login_view = "auth.login"
 
+    # PERFORMANCE INSTRUMENTATION (Server-Timing + structured logs)
+    from .instrumentation import init_instrumentation
+    init_instrumentation(app)
+
+    # PROMETHEUS METRICS (/metrics)
+    from .metrics import init_metrics
+    init_metrics(app)
+
+    # SLOW QUERY LOG (opt-in, SLOW_QUERY_LOG=1)
+    from .slow_queries import init_slow_query_log
+    init_slow_query_log(app)
+
+    # ON-DEMAND PROFILER (admins: X-Profile header or ?_profile=)
+    from .profiling import init_profiler
+    init_profiler(app)
+
+    # ARCHIVE of cold outgoing / purchase rows (flask archive)
+    from .archive import init_archive
+    init_archive(app)
+
+    # TABLE VERSIONS + CONDITIONAL GET (ETag / Last-Modified, 304)
+    from .versioning import init_versioning
+    init_versioning(app)
+
+    # CHANGE LOG for incremental sync (/api/changes)
+    from .changes import init_changes
+    init_changes(app)
+
+    # EXPORT CACHE (rendered Excel / PDF exports on disk)
+    from .export_cache import init_export_cache
+    init_export_cache(app)
+
+    # DELTA EXPORTS (?since= on the Excel exports)
+    from .delta import init_delta
+    init_delta(app)
+
+    # UPLOADS (request size limits, file signature checks, UPLOAD_FOLDER)
+    from .uploads import init_uploads
+    init_uploads(app)
+
+    # INVOICES (batch rendering over a process pool)
+    from .invoices import init_invoices
+    init_invoices(app)
+
+    # TEMPLATE CACHE (compiled Jinja bytecode on disk; flask precompile-templates)
+    from .template_cache import init_template_cache
+    init_template_cache(app)
+
     # BLUEPRINTS
     from .views import views
     from .auth import auth
     app.register_blueprint(views)
     app.register_blueprint(auth)
 
+    # JSON API (/api, session or bearer-token auth)
+    from .api import init_api
+    init_api(app, login_manager)
+
     # CREATE TABLES IN NEON
     from .models import User, Note
 
     with app.app_context():
         db.create_all()
 
+        # SCHEMA MIGRATIONS for tables that already existed. Off by default on
+        # Postgres: index builds on big tables belong in `flask db-upgrade` at
+        # deploy, not in every worker's boot
+        auto_migrate = "0" if db.engine.dialect.name == "postgresql" else "1"
+        if os.getenv("AUTO_MIGRATE", auto_migrate) == "1":
+            from .migrations import upgrade
+            upgrade()
+
+    # CLI COMMANDS (flask db-upgrade, ...)
+    from .commands import register_commands
+    register_commands(app)
+
     @login_manager.user_loader
     def load_user(user_id):
         return User.query.get(int(user_id))
@@ -0,0 +1,295 @@
+# website/api.py
+"""
+JSON API for POS terminals and scripts.
+
+Incremental sync for admins (see website/changes.py):
+
+    GET /api/changes?since=<cursor>&limit=N
+        -> {"changes": [{"seq": 8, "table": "product", "id": 3,
+                         "op": "update", "data": {...}}, ...],
+            "cursor": 8, "has_more": false}
+
+Auth: the normal session cookie, or "Authorization: Bearer <token>" with a
+token from POST /api/token (see init_api). Bulk endpoints validate a whole
+batch against one prefetch of the referenced rows and insert it in one
+transaction:
+
+    POST /api/outgoing/bulk   {"lines": [{"product_id": 1, "customer_id": 2,
+                                          "quantity": 3, "date": "2025-01-31"}, ...]}
+    POST /api/purchases/bulk  {"lines": [{"product_id": 1, "supplier_id": 2,
+                                          "quantity": 3, "date": "2025-01-31"}, ...]}
+
+By default a batch is all or nothing: if any line is invalid nothing is
+written and the response (422) lists the errors per line. With
+"partial": true the valid lines are written and the invalid ones reported.
+"""
+
+import os
+from datetime import datetime
+from functools import wraps
+
+from flask import Blueprint, current_app, jsonify, request
+from flask_login import current_user
+from sqlalchemy import func
+from werkzeug.security import check_password_hash
+
+from . import db
+from .changes import oldest_seq, read_changes
+from .metrics import record_rows
+from .models import Customer, Outgoing, Product, Purchase, Supplier, User
+from .roles import has_role
+from .tokens import generate_api_token, verify_api_token
+
+api = Blueprint("api", __name__, url_prefix="/api")
+
+
+def init_api(app, login_manager):
+    """
+    Register the /api blueprint and bearer-token login.
+
+    Config (env vars of the same name):
+    - API_TOKEN_MAX_AGE: token lifetime in seconds (default 30 days)
+    - API_MAX_BATCH: most lines accepted per bulk call (default 1000)
+    """
+    app.config.setdefault("API_TOKEN_MAX_AGE", int(os.getenv("API_TOKEN_MAX_AGE", str(30 * 24 * 3600))))
+    app.config.setdefault("API_MAX_BATCH", int(os.getenv("API_MAX_BATCH", "1000")))
+
+    @login_manager.request_loader
+    def load_user_from_token(req):
+        if req.blueprint != "api":
+            return None
+        header = req.headers.get("Authorization", "")
+        if not header.startswith("Bearer "):
+            return None
+        return verify_api_token(header[7:].strip(), current_app.config["API_TOKEN_MAX_AGE"])
+
+    app.register_blueprint(api)
+
+
+def api_login_required(f):
+    """Like login_required, but answers 401 JSON instead of redirecting."""
+    @wraps(f)
+    def wrapped(*args, **kwargs):
+        if not current_user.is_authenticated:
+            return jsonify(error="Authentication required."), 401
+        return f(*args, **kwargs)
+    return wrapped
+
+
+@api.route("/token", methods=["POST"])
+def issue_token():
+    data = request.get_json(silent=True) or {}
+    email = (data.get("email") or "").strip().lower()
+    password = data.get("password") or ""
+
+    user = User.query.filter_by(email=email).first() if email else None
+    if not user or not check_password_hash(user.password, password):
+        return jsonify(error="Invalid email or password."), 401
+
+    return jsonify(
+        token=generate_api_token(user),
+        expires_in=current_app.config["API_TOKEN_MAX_AGE"],
+    )
+
+
+# --------------------------------------------------
+# BULK HELPERS
+# --------------------------------------------------
+def _read_batch():
+    """(lines, partial, None) from the JSON body, or (None, None, error response)."""
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict) or not isinstance(data.get("lines"), list):
+        return None, None, (jsonify(error='Body must be a JSON object with a "lines" list.'), 400)
+
+    lines = data["lines"]
+    limit = current_app.config["API_MAX_BATCH"]
+    if not lines:
+        return None, None, (jsonify(error="No lines given."), 400)
+    if len(lines) > limit:
+        return None, None, (jsonify(error=f"At most {limit} lines per call."), 413)
+    return lines, bool(data.get("partial")), None
+
+
+def _int_field(line, key):
+    value = line.get(key)
+    if isinstance(value, bool):
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _prefetch(model, lines, key):
+    """{id: instance} for every id referenced by `key`, in one query."""
+    ids = {i for i in (_int_field(line, key) for line in lines if isinstance(line, dict)) if i is not None}
+    if not ids:
+        return {}
+    return {obj.id: obj for obj in model.query.filter(model.id.in_(ids))}
+
+
+def _validate_common(line, products):
+    """Shared checks: (errors, product, quantity, date)."""
+    errors = []
+
+    product = products.get(_int_field(line, "product_id"))
+    if not product:
+        errors.append("Product is required.")
+
+    quantity = _int_field(line, "quantity")
+    if quantity is None:
+        errors.append("Quantity must be an integer.")
+    elif quantity <= 0:
+        errors.append("Quantity must be a positive integer.")
+
+    date_raw = (str(line.get("date") or "")).strip()
+    date_val = None
+    if date_raw:
+        try:
+            date_val = datetime.strptime(date_raw, "%Y-%m-%d").date()
+        except ValueError:
+            errors.append("Invalid date format.")
+    else:
+        date_val = datetime.utcnow().date()
+
+    return errors, product, quantity, date_val
+
+
+def _respond(results, records, partial, operation):
+    """Write `records` (index -> instance) unless a strict batch had errors."""
+    failed = sum(1 for r in results if r["status"] == "error")
+
+    if failed and not partial:
+        for r in results:
+            if r["status"] == "ok":
+                r["status"] = "not_written"
+        return jsonify(created=0, failed=failed, results=results), 422
+
+    db.session.add_all(records.values())
+    db.session.flush()
+    # read ids before commit expires the instances (one SELECT each otherwise)
+    for index, record in records.items():
+        results[index]["id"] = record.id
+    db.session.commit()
+
+    record_rows(operation, len(records))
+    return jsonify(created=len(records), failed=failed, results=results), 200 if not failed else 207
+
+
+# --------------------------------------------------
+# BULK ENDPOINTS
+# --------------------------------------------------
+@api.route("/outgoing/bulk", methods=["POST"])
+@api_login_required
+def outgoing_bulk_create():
+    lines, partial, error = _read_batch()
+    if error:
+        return error
+
+    products = _prefetch(Product, lines, "product_id")
+    customers = _prefetch(Customer, lines, "customer_id")
+
+    results = []
+    records = {}
+    for index, line in enumerate(lines):
+        if not isinstance(line, dict):
+            results.append({"index": index, "status": "error", "errors": ["Line must be an object."]})
+            continue
+
+        errors, product, quantity, date_val = _validate_common(line, products)
+        customer = customers.get(_int_field(line, "customer_id"))
+        if not customer:
+            errors.append("Customer is required.")
+
+        if errors:
+            results.append({"index": index, "status": "error", "errors": errors})
+            continue
+
+        record = Outgoing(
+            product_id=product.id,
+            customer_id=customer.id,
+            quantity=quantity,
+            date=date_val,
+        )
+        record.snapshot_price(product)
+        records[index] = record
+        results.append({"index": index, "status": "ok"})
+
+    return _respond(results, records, partial, "api_outgoing_bulk")
+
+
+@api.route("/purchases/bulk", methods=["POST"])
+@api_login_required
+def purchase_bulk_create():
+    lines, partial, error = _read_batch()
+    if error:
+        return error
+
+    products = _prefetch(Product, lines, "product_id")
+    suppliers = _prefetch(Supplier, lines, "supplier_id")
+
+    results = []
+    records = {}
+    for index, line in enumerate(lines):
+        if not isinstance(line, dict):
+            results.append({"index": index, "status": "error", "errors": ["Line must be an object."]})
+            continue
+
+        errors, product, quantity, date_val = _validate_common(line, products)
+        supplier = suppliers.get(_int_field(line, "supplier_id"))
+        if not supplier:
+            errors.append("Supplier is required.")
+
+        if errors:
+            results.append({"index": index, "status": "error", "errors": errors})
+            continue
+
+        records[index] = Purchase(
+            product_id=product.id,
+            supplier_id=supplier.id,
+            quantity=quantity,
+            date=date_val,
+        )
+        results.append({"index": index, "status": "ok"})
+
+    failed = any(r["status"] == "error" for r in results)
+    if records and (partial or not failed):
+        # increase stock like purchase_create: one UPDATE per product,
+        # computed in SQL so concurrent terminals don't overwrite each other
+        added = {}
+        for record in records.values():
+            added[record.product_id] = added.get(record.product_id, 0) + record.quantity
+        for product_id, quantity in added.items():
+            products[product_id].quantity = func.coalesce(Product.quantity, 0) + quantity
+
+    return _respond(results, records, partial, "api_purchases_bulk")
+
+
+# --------------------------------------------------
+# CHANGE FEED
+# --------------------------------------------------
+@api.route("/changes")
+@api_login_required
+def changes():
+    """
+    Log entries after `since` (0 = the oldest kept), oldest first. Pass
+    the returned cursor as the next `since`; has_more means another page
+    is ready. 410 means entries after `since` were pruned: resync from a
+    full export, then continue from the newest cursor.
+    """
+    if not has_role(current_user, "admin"):
+        return jsonify(error="Admin role required."), 403
+
+    since = request.args.get("since", 0, type=int)
+    limit = request.args.get("limit", 1000, type=int)
+    if since < 0 or limit < 1:
+        return jsonify(error="since must be >= 0 and limit >= 1."), 400
+    limit = min(limit, current_app.config["CHANGES_MAX_LIMIT"])
+
+    if since:
+        oldest = oldest_seq()
+        if oldest is not None and since < oldest - 1:
+            return jsonify(error="Changes after this cursor were pruned.", oldest=oldest), 410
+
+    entries, cursor, has_more = read_changes(since, limit)
+    return jsonify(changes=entries, cursor=cursor, has_more=has_more)
@@ -0,0 +1,282 @@
+# website/archive.py
+"""
+Archival of cold outgoing / purchase rows.
+
+`flask archive` moves rows older than the retention window out of the hot
+tables into one gzip'd NDJSON file per table and month under ARCHIVE_DIR
+(instance/archive/<table>/<YYYY-MM>-<run>.ndjson.gz). Each line is the row
+joined with its product and customer / supplier, so an archived record
+stays readable after those are edited or deleted. `archived_record` maps
+every archived id to its file; load_archived() uses it to serve invoices
+for archived rows. Stock levels are not touched: archiving only moves
+history out of the way.
+
+Outgoing rows that are lines of a sales order are not archived: orders
+are not, and an order's invoice and list entry read all its lines from
+the hot table.
+
+Files are written to a temp name, fsynced and renamed before the rows are
+deleted, and the index rows and the delete commit together, so an
+interrupted run never loses a row (at worst it leaves an unreferenced
+file behind).
+"""
+
+import gzip
+import json
+import os
+import uuid
+from datetime import date, datetime
+from decimal import Decimal
+from types import SimpleNamespace
+
+from flask import current_app
+from sqlalchemy import delete, func, insert, select
+
+from . import db
+from .models import ArchivedRecord, Customer, Outgoing, Product, Purchase, Supplier
+
+DELETE_BATCH = 1000
+
+
+def init_archive(app):
+    """
+    Config (env vars of the same name):
+    - ARCHIVE_DIR: where archive files are written (default instance/archive)
+    - ARCHIVE_RETENTION_MONTHS: months kept in the hot tables (default 12)
+    """
+    app.config.setdefault(
+        "ARCHIVE_DIR",
+        os.getenv("ARCHIVE_DIR") or os.path.join(app.instance_path, "archive"),
+    )
+    app.config.setdefault(
+        "ARCHIVE_RETENTION_MONTHS",
+        int(os.getenv("ARCHIVE_RETENTION_MONTHS", "12")),
+    )
+
+
+def _outgoing_columns():
+    return [
+        Outgoing.id, Outgoing.date, Outgoing.quantity, Outgoing.unit_price,
+        Outgoing.line_total, Outgoing.created_at, Outgoing.order_id,
+        Outgoing.product_id, Product.name.label("product_name"),
+        Product.price.label("product_price"),
+        Outgoing.customer_id, Customer.name.label("customer_name"),
+        Customer.address.label("customer_address"), Customer.email.label("customer_email"),
+        Customer.contact.label("customer_contact"),
+    ]
+
+
+def _purchase_columns():
+    return [
+        Purchase.id, Purchase.date, Purchase.quantity, Purchase.created_at,
+        Purchase.product_id, Product.name.label("product_name"),
+        Purchase.supplier_id, Supplier.name.label("supplier_name"),
+        Supplier.address.label("supplier_address"), Supplier.email.label("supplier_email"),
+        Supplier.contact.label("supplier_contact"),
+    ]
+
+
+# table name -> (model, denormalized select for a date range)
+ARCHIVES = {
+    "outgoing": (
+        Outgoing,
+        lambda: select(*_outgoing_columns())
+        .outerjoin(Product, Product.id == Outgoing.product_id)
+        .outerjoin(Customer, Customer.id == Outgoing.customer_id),
+    ),
+    "purchase": (
+        Purchase,
+        lambda: select(*_purchase_columns())
+        .outerjoin(Product, Product.id == Purchase.product_id)
+        .outerjoin(Supplier, Supplier.id == Purchase.supplier_id),
+    ),
+}
+
+
+def _archivable(model):
+    # order lines stay with their order (see the module docstring)
+    if model is Outgoing:
+        return [Outgoing.order_id.is_(None)]
+    return []
+
+
+def archive_cutoff(retention_months, today=None):
+    """First day of the oldest month that stays in the hot tables."""
+    today = today or date.today()
+    index = today.year * 12 + (today.month - 1) - retention_months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _next_month(d):
+    return date(d.year + d.month // 12, d.month % 12 + 1, 1)
+
+
+def _encode(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    raise TypeError(f"cannot archive {type(value).__name__}")
+
+
+def archive_table(table, cutoff, archive_dir, dry_run=False, echo=None):
+    """
+    Archive all rows of `table` dated before `cutoff`, one file per month.
+    Returns the number of rows archived (or that would be, with dry_run).
+    """
+    model, build_select = ARCHIVES[table]
+    say = echo or (lambda msg: None)
+
+    archivable = _archivable(model)
+    oldest = db.session.scalar(select(func.min(model.date)).where(model.date < cutoff, *archivable))
+    if oldest is None:
+        say(f"{table}: nothing older than {cutoff}")
+        return 0
+
+    total = 0
+    month = date(oldest.year, oldest.month, 1)
+    while month < cutoff:
+        end = _next_month(month)
+        stmt = build_select().where(model.date >= month, model.date < end, *archivable).order_by(model.id)
+
+        if dry_run:
+            count = db.session.scalar(
+                select(func.count()).select_from(model)
+                .where(model.date >= month, model.date < end, *archivable)
+            )
+            if count:
+                say(f"{table} {month:%Y-%m}: {count} rows")
+            total += count
+            month = end
+            continue
+
+        count = _archive_month(table, model, stmt, month, archive_dir)
+        if count:
+            say(f"{table} {month:%Y-%m}: archived {count} rows")
+        total += count
+        month = end
+
+    return total
+
+
+def _archive_month(table, model, stmt, month, archive_dir):
+    folder = os.path.join(archive_dir, table)
+    os.makedirs(folder, exist_ok=True)
+    name = f"{month:%Y-%m}-{datetime.now():%Y%m%d%H%M%S}-{uuid.uuid4().hex[:6]}.ndjson.gz"
+    path = os.path.join(folder, name)
+    tmp = path + ".tmp"
+
+    ids = []
+    with open(tmp, "wb") as raw:
+        with gzip.GzipFile(fileobj=raw, mode="wb") as gz:
+            for row in db.session.execute(stmt.execution_options(yield_per=2000)):
+                record = dict(row._mapping)
+                ids.append(record["id"])
+                gz.write(json.dumps(record, default=_encode).encode("utf-8") + b"\n")
+        raw.flush()
+        os.fsync(raw.fileno())
+
+    if not ids:
+        os.remove(tmp)
+        return 0
+    os.replace(tmp, path)
+
+    relative = os.path.join(table, name)
+    try:
+        label = f"{month:%Y-%m}"
+        for start in range(0, len(ids), DELETE_BATCH):
+            batch = ids[start:start + DELETE_BATCH]
+            db.session.execute(
+                insert(ArchivedRecord),
+                [{"kind": table, "record_id": i, "month": label, "path": relative} for i in batch],
+            )
+            db.session.execute(
+                delete(model).where(model.id.in_(batch))
+                .execution_options(synchronize_session=False, change_op="archive")
+            )
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        os.remove(path)
+        raise
+    return len(ids)
+
+
+def archive_old_records(retention_months=None, dry_run=False, echo=None):
+    """Archive outgoing and purchase rows older than the retention window."""
+    if retention_months is None:
+        retention_months = current_app.config["ARCHIVE_RETENTION_MONTHS"]
+    cutoff = archive_cutoff(retention_months)
+    archive_dir = current_app.config["ARCHIVE_DIR"]
+
+    return {
+        table: archive_table(table, cutoff, archive_dir, dry_run=dry_run, echo=echo)
+        for table in ARCHIVES
+    }
+
+
+# --------------------------------------------------
+# READ-THROUGH
+# --------------------------------------------------
+def load_archived(table, record_id):
+    """
+    An archived row as an object shaped like the model instance (with
+    .product and .customer / .supplier), or None if it was never archived.
+    """
+    entry = db.session.get(ArchivedRecord, (table, record_id))
+    if entry is None:
+        return None
+
+    path = os.path.join(current_app.config["ARCHIVE_DIR"], entry.path)
+    try:
+        with gzip.open(path, "rt", encoding="utf-8") as fh:
+            for line in fh:
+                # cheap prefilter before parsing: every line starts with "id"
+                if not line.startswith(f'{{"id": {record_id},'):
+                    continue
+                return _to_record(table, json.loads(line))
+    except OSError:
+        current_app.logger.exception("archive file %s unreadable", path)
+    return None
+
+
+def _to_record(table, data):
+    def dec(value):
+        return Decimal(value) if value is not None else None
+
+    record = SimpleNamespace(
+        id=data["id"],
+        date=date.fromisoformat(data["date"]) if data.get("date") else None,
+        quantity=data["quantity"],
+        created_at=data.get("created_at"),
+        product_id=data.get("product_id"),
+        product=SimpleNamespace(
+            id=data.get("product_id"),
+            name=data.get("product_name") or "",
+            price=dec(data.get("product_price")),
+        ),
+        archived=True,
+    )
+
+    if table == "outgoing":
+        record.unit_price = dec(data.get("unit_price"))
+        record.line_total = dec(data.get("line_total"))
+        record.customer_id = data.get("customer_id")
+        record.order_id = data.get("order_id")
+        record.customer = SimpleNamespace(
+            id=data.get("customer_id"),
+            name=data.get("customer_name") or "",
+            address=data.get("customer_address"),
+            email=data.get("customer_email"),
+            contact=data.get("customer_contact"),
+        )
+    else:
+        record.supplier_id = data.get("supplier_id")
+        record.supplier = SimpleNamespace(
+            id=data.get("supplier_id"),
+            name=data.get("supplier_name") or "",
+            address=data.get("supplier_address"),
+            email=data.get("supplier_email"),
+            contact=data.get("supplier_contact"),
+        )
+    return record
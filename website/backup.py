@@ -0,0 +1,353 @@
+# website/backup.py
+"""
+Whole-database backup and restore (`flask db-backup` / `flask db-restore`).
+
+A backup is a directory with gzip-compressed data and a manifest.json,
+written last, so a directory without one is an incomplete backup.
+
+Postgres: every table the models declare (and each partition of a
+partitioned table on its own) is streamed with COPY ... TO STDOUT as CSV
+into <table>[.<partition>].csv.gz, by `jobs` connections in parallel.
+All of them read the same snapshot (pg_export_snapshot), so the backup
+is consistent while the app keeps writing. Restore brings the schema up
+to date (create_all + migrations), reads every file through once (gzip
+checksum, CSV header against the table's columns), then truncates the
+tables and COPYs the files back in parallel, one level of the foreign
+key graph at a time (categories, customers, ... before products, before
+outgoing rows), then resets the id sequences and ANALYZEs the tables.
+
+The truncate commits before the loads, which commit one file each: a
+load that fails after the checks (a lost connection, a full disk, a row
+count that does not match) leaves the database partially loaded. Run
+the restore again once the cause is fixed.
+
+SQLite: the online backup API copies the live database into a
+consistent file, which is stored as database.sqlite3.gz; restore checks
+the copy (quick_check) and copies it back into the live database the
+same way. Stop the app first: only this process drops its pooled
+connections, and writes from running workers would land in the middle
+of the copy.
+
+table_version is not part of a Postgres backup; restore bumps the
+version of every restored table instead, so no ETag or cached export
+from before the restore can match afterwards.
+"""
+
+import csv
+import gzip
+import json
+import os
+import shutil
+import sqlite3
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+from sqlalchemy import inspect, text
+
+from . import db
+from .migrations import MIGRATIONS, upgrade
+from .models import TableVersion
+from .partitioning import is_partitioned, list_partitions
+from .versioning import bump_tables
+
+FORMAT = 1
+
+MANIFEST = "manifest.json"
+
+SQLITE_FILE = "database.sqlite3.gz"
+
+# gzip level: 1-3 compress CSV nearly as well as 6-9 at several times the speed
+COMPRESSLEVEL = 3
+
+COPY_BUFFER = 1 << 20
+
+
+class BackupError(Exception):
+    """A backup that cannot be written or restored here."""
+
+
+def _tables():
+    """The tables to back up, parents before children."""
+    return [t for t in db.metadata.sorted_tables if t.name != TableVersion.__tablename__]
+
+
+def _levels(tables):
+    # a table's level is one more than that of the tables it references,
+    # so every table of a level can be loaded at the same time
+    level = {}
+    for table in tables:
+        parents = {fk.column.table.name for fk in table.foreign_keys} - {table.name}
+        level[table.name] = max((level.get(p, -1) + 1 for p in parents), default=0)
+    return level
+
+
+def _schema_version(conn):
+    return conn.execute(text("SELECT max(version) FROM schema_migrations")).scalar()
+
+
+def _write_manifest(output, manifest):
+    manifest.update({
+        "format": FORMAT,
+        "dialect": db.engine.dialect.name,
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+    })
+    with open(os.path.join(output, MANIFEST), "w", encoding="utf-8") as fh:
+        json.dump(manifest, fh, indent=2)
+
+
+def read_manifest(path):
+    try:
+        with open(os.path.join(path, MANIFEST), encoding="utf-8") as fh:
+            manifest = json.load(fh)
+    except FileNotFoundError:
+        raise BackupError(f"{path} has no {MANIFEST}: not a backup, or an incomplete one.")
+    if manifest.get("format") != FORMAT:
+        raise BackupError(f"Unsupported backup format {manifest.get('format')!r}.")
+    if manifest["dialect"] != db.engine.dialect.name:
+        raise BackupError(f"This is a {manifest['dialect']} backup; the database is {db.engine.dialect.name}.")
+    if (manifest.get("schema_version") or 0) > max(version for version, _, _ in MIGRATIONS):
+        raise BackupError("The backup was made with a newer schema than this code knows; upgrade the code first.")
+    return manifest
+
+
+# --------------------------------------------------
+# BACKUP
+# --------------------------------------------------
+def backup(output, jobs=4, echo=None):
+    """Write a backup of the whole database into the directory `output`."""
+    say = echo or (lambda msg: None)
+    if os.path.exists(os.path.join(output, MANIFEST)):
+        raise BackupError(f"{output} already holds a backup.")
+    os.makedirs(output, exist_ok=True)
+    if db.engine.dialect.name == "postgresql":
+        return _backup_postgres(output, jobs, say)
+    if db.engine.dialect.name == "sqlite":
+        return _backup_sqlite(output, say)
+    raise BackupError(f"Backups of {db.engine.dialect.name} databases are not supported.")
+
+
+def _copy_out(engine, snapshot, sql, path):
+    raw = engine.raw_connection()
+    try:
+        with raw.cursor() as cur:
+            cur.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ READ ONLY")
+            cur.execute("SET TRANSACTION SNAPSHOT %s", (snapshot,))
+            with gzip.open(path, "wb", compresslevel=COMPRESSLEVEL) as fh:
+                cur.copy_expert(sql, fh, size=COPY_BUFFER)
+            return cur.rowcount
+    finally:
+        raw.rollback()
+        raw.close()
+
+
+def _backup_postgres(output, jobs, say):
+    engine = db.engine
+    # the snapshot stays valid while the transaction exporting it is open
+    with engine.connect().execution_options(isolation_level="REPEATABLE READ") as conn:
+        conn.execute(text("SET TRANSACTION READ ONLY"))
+        snapshot = conn.execute(text("SELECT pg_export_snapshot()")).scalar()
+        schema_version = _schema_version(conn)
+
+        units = []
+        for table in _tables():
+            columns = [c["name"] for c in inspect(conn).get_columns(table.name)]
+            sources = [table.name]
+            if is_partitioned(conn, table.name):
+                sources = [name for name, _ in list_partitions(conn, table.name)]
+            for source in sources:
+                suffix = "" if source == table.name else f".{source}"
+                units.append({
+                    "table": table.name,
+                    "source": source,
+                    "file": f"{table.name}{suffix}.csv.gz",
+                    "columns": columns,
+                })
+
+        def dump(unit):
+            cols = ", ".join(f'"{c}"' for c in unit["columns"])
+            sql = f'COPY (SELECT {cols} FROM ONLY "{unit["source"]}") TO STDOUT WITH (FORMAT csv, HEADER true)'
+            unit["rows"] = _copy_out(engine, snapshot, sql, os.path.join(output, unit["file"]))
+            say(f"  {unit['file']}: {unit['rows']} row(s)")
+            return unit
+
+        with ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+            # the biggest tables first, so they do not start last
+            units.sort(key=lambda u: u["table"] not in ("outgoing", "purchase", "change_log"))
+            list(pool.map(dump, units))
+
+    manifest = {"schema_version": schema_version, "units": units}
+    _write_manifest(output, manifest)
+    return manifest
+
+
+def _backup_sqlite(output, say):
+    database = _sqlite_database()
+    tmp = os.path.join(output, "database.sqlite3.tmp")
+    source = sqlite3.connect(database)
+    target = sqlite3.connect(tmp)
+    try:
+        # one consistent copy of every page, taken while the app keeps running
+        source.backup(target)
+        rows = {
+            table.name: target.execute(f'SELECT count(*) FROM "{table.name}"').fetchone()[0]
+            for table in _tables()
+            if target.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+                              (table.name,)).fetchone()
+        }
+        schema_version = target.execute("SELECT max(version) FROM schema_migrations").fetchone()[0]
+    finally:
+        source.close()
+        target.close()
+
+    with open(tmp, "rb") as src, gzip.open(os.path.join(output, SQLITE_FILE), "wb", compresslevel=COMPRESSLEVEL) as dst:
+        shutil.copyfileobj(src, dst, COPY_BUFFER)
+    os.remove(tmp)
+    for name, count in rows.items():
+        say(f"  {name}: {count} row(s)")
+
+    manifest = {"schema_version": schema_version, "file": SQLITE_FILE, "rows": rows}
+    _write_manifest(output, manifest)
+    return manifest
+
+
+def _sqlite_database():
+    database = db.engine.url.database
+    if not database or database == ":memory:":
+        raise BackupError("The database is in memory.")
+    return database
+
+
+# --------------------------------------------------
+# RESTORE
+# --------------------------------------------------
+def restore(path, jobs=4, echo=None):
+    """
+    Replace every row of the database with the backup in directory `path`.
+    The files are checked before anything is deleted; a failure after that
+    leaves the database partially loaded (see the module docstring).
+    """
+    say = echo or (lambda msg: None)
+    manifest = read_manifest(path)
+    if manifest["dialect"] == "postgresql":
+        _restore_postgres(path, manifest, jobs, say)
+    else:
+        _restore_sqlite(path, manifest, say)
+    return manifest
+
+
+def _copy_in(engine, table, columns, path):
+    raw = engine.raw_connection()
+    cols = ", ".join(f'"{c}"' for c in columns)
+    try:
+        with raw.cursor() as cur, gzip.open(path, "rb") as fh:
+            cur.copy_expert(f'COPY "{table}" ({cols}) FROM STDIN WITH (FORMAT csv, HEADER true)', fh,
+                            size=COPY_BUFFER)
+            rows = cur.rowcount
+        raw.commit()
+        return rows
+    except Exception:
+        raw.rollback()
+        raise
+    finally:
+        raw.close()
+
+
+def _restore_postgres(path, manifest, jobs, say):
+    engine = db.engine
+    db.create_all()
+    upgrade(echo=say)
+
+    units = manifest["units"]
+    tables = list(dict.fromkeys(unit["table"] for unit in units))
+    _check_units(engine, path, units, jobs, say)
+    with engine.begin() as conn:
+        conn.execute(text("TRUNCATE " + ", ".join(f'"{t}"' for t in tables) + " RESTART IDENTITY"))
+
+    def load(unit):
+        rows = _copy_in(engine, unit["table"], unit["columns"], os.path.join(path, unit["file"]))
+        if rows != unit["rows"]:
+            raise BackupError(f"{unit['file']}: restored {rows} row(s), the backup has {unit['rows']}.")
+        say(f"  {unit['file']}: {rows} row(s)")
+
+    levels = _levels([t for t in _tables() if t.name in tables])
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+        for level in sorted(set(levels.values())):
+            list(pool.map(load, [u for u in units if levels[u["table"]] == level]))
+
+    started = time.perf_counter()
+    with engine.begin() as conn:
+        # COPY wrote the ids: move each id sequence past them
+        for table in _tables():
+            key = list(table.primary_key.columns)
+            if table.name not in tables or len(key) != 1:
+                continue
+            conn.execute(text(
+                f'SELECT setval(pg_get_serial_sequence(:t, :c), coalesce(max("{key[0].name}"), 1), '
+                f'max("{key[0].name}") IS NOT NULL) FROM "{table.name}"'
+            ), {"t": f'"{table.name}"', "c": key[0].name})
+        bump_tables(conn, tables)
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        for table in tables:
+            conn.execute(text(f'ANALYZE "{table}"'))
+    say(f"  sequences reset and tables analyzed in {time.perf_counter() - started:.1f}s")
+
+
+def _check_units(engine, path, units, jobs, say):
+    # everything that can be checked without loading, before the TRUNCATE
+    with engine.connect() as conn:
+        inspector = inspect(conn)
+        columns = {
+            table: {c["name"] for c in inspector.get_columns(table)}
+            for table in {unit["table"] for unit in units}
+        }
+
+    def check(unit):
+        missing = set(unit["columns"]) - columns[unit["table"]]
+        if missing:
+            raise BackupError(f"{unit['file']}: no column(s) {', '.join(sorted(missing))} in {unit['table']}.")
+        try:
+            with gzip.open(os.path.join(path, unit["file"]), "rb") as fh:
+                header = next(csv.reader([fh.readline().decode("utf-8")]), [])
+                # reading to the end verifies the gzip checksum and length
+                while fh.read(COPY_BUFFER):
+                    pass
+        except (OSError, EOFError, zlib.error) as e:
+            raise BackupError(f"{unit['file']}: unreadable ({e}); the database was not changed.")
+        if header != unit["columns"]:
+            raise BackupError(f"{unit['file']}: its columns do not match the manifest; the database was not changed.")
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+        list(pool.map(check, units))
+    say(f"  {len(units)} file(s) checked in {time.perf_counter() - started:.1f}s")
+
+
+def _restore_sqlite(path, manifest, say):
+    database = _sqlite_database()
+    tmp = database + ".restore"
+    with gzip.open(os.path.join(path, manifest["file"]), "rb") as src, open(tmp, "wb") as dst:
+        shutil.copyfileobj(src, dst, COPY_BUFFER)
+    try:
+        source = sqlite3.connect(tmp)
+        try:
+            if source.execute("PRAGMA quick_check").fetchone()[0] != "ok":
+                raise BackupError(f"{manifest['file']} is corrupt.")
+            db.engine.dispose()
+            target = sqlite3.connect(database)
+            try:
+                source.backup(target)
+            finally:
+                target.close()
+        finally:
+            source.close()
+    finally:
+        os.remove(tmp)
+
+    for name, count in manifest["rows"].items():
+        say(f"  {name}: {count} row(s)")
+    db.create_all()
+    upgrade(echo=say)
+    with db.engine.begin() as conn:
+        bump_tables(conn, manifest["rows"])
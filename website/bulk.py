@@ -0,0 +1,112 @@
+# website/bulk.py
+"""
+Set-based bulk actions for the admin lists.
+
+Every action is a fixed handful of UPDATE / DELETE statements, whatever
+the number of rows: the selection is either a list of ids (checked rows)
+or a SELECT of ids (every row matching a list's search), used as
+`id IN (...)`. Nothing is loaded into the session.
+
+Deletes remove child rows explicitly, in the order the ORM cascades on
+the models would (outgoing / purchase rows of a product, outgoing rows
+and orders of a customer, purchases of a supplier). Stock follows the
+single-row views: deleting purchases takes their quantity back out of
+the product's stock, as purchase_delete does; deleting a supplier or a
+product leaves stock alone, as their delete views do.
+
+Functions return {table: rows affected} and leave the commit to the caller.
+"""
+
+from decimal import Decimal
+
+from sqlalchemy import delete, func, select, update
+
+from . import db
+from .models import Customer, Outgoing, Product, Purchase, SalesOrder, Supplier
+
+LABELS = {
+    "product": "product(s)",
+    "customer": "customer(s)",
+    "supplier": "supplier(s)",
+    "outgoing": "outgoing record(s)",
+    "purchase": "purchase(s)",
+    "sales_order": "order(s)",
+}
+
+
+def _execute(stmt):
+    return db.session.execute(stmt.execution_options(synchronize_session=False)).rowcount
+
+
+def summary(verb, counts):
+    """'Deleted 3 customer(s), 120 outgoing record(s).' from a counts dict."""
+    main, *rest = counts.items()
+    parts = [f"{main[1]} {LABELS[main[0]]}"]
+    parts += [f"{count} {LABELS[table]}" for table, count in rest if count]
+    return f"{verb} {', '.join(parts)}."
+
+
+# --------------------------------------------------
+# DELETE
+# --------------------------------------------------
+def delete_products(selection):
+    outgoing = _execute(delete(Outgoing).where(Outgoing.product_id.in_(selection)))
+    purchase = _execute(delete(Purchase).where(Purchase.product_id.in_(selection)))
+    product = _execute(delete(Product).where(Product.id.in_(selection)))
+    return {"product": product, "outgoing": outgoing, "purchase": purchase}
+
+
+def delete_customers(selection):
+    # order lines first: they reference both the customer and the order
+    outgoing = _execute(delete(Outgoing).where(Outgoing.customer_id.in_(selection)))
+    orders = _execute(delete(SalesOrder).where(SalesOrder.customer_id.in_(selection)))
+    customer = _execute(delete(Customer).where(Customer.id.in_(selection)))
+    return {"customer": customer, "outgoing": outgoing, "sales_order": orders}
+
+
+def delete_suppliers(selection):
+    purchase = _execute(delete(Purchase).where(Purchase.supplier_id.in_(selection)))
+    supplier = _execute(delete(Supplier).where(Supplier.id.in_(selection)))
+    return {"supplier": supplier, "purchase": purchase}
+
+
+def delete_outgoing(selection):
+    return {"outgoing": _execute(delete(Outgoing).where(Outgoing.id.in_(selection)))}
+
+
+def delete_purchases(selection):
+    # one UPDATE takes each product's purchased quantity back out of stock
+    purchased = (
+        select(func.coalesce(func.sum(Purchase.quantity), 0))
+        .where(Purchase.product_id == Product.id, Purchase.id.in_(selection))
+        .scalar_subquery()
+    )
+    _execute(
+        update(Product)
+        .where(Product.id.in_(select(Purchase.product_id).where(Purchase.id.in_(selection))))
+        .values(quantity=func.coalesce(Product.quantity, 0) - purchased)
+    )
+    return {"purchase": _execute(delete(Purchase).where(Purchase.id.in_(selection)))}
+
+
+# --------------------------------------------------
+# UPDATE
+# --------------------------------------------------
+def set_product_category(selection, category_id):
+    return {"product": _execute(
+        update(Product).where(Product.id.in_(selection)).values(category_id=category_id)
+    )}
+
+
+def adjust_prices(category_id, percent):
+    """
+    Change the price of every product in the category by `percent`
+    (a Decimal, e.g. Decimal("-10") for 10% off), rounded to cents.
+    Outgoing rows keep their sale-time unit_price.
+    """
+    factor = 1 + percent / Decimal(100)
+    return {"product": _execute(
+        update(Product)
+        .where(Product.category_id == category_id, Product.price.is_not(None))
+        .values(price=func.round(Product.price * factor, 2))
+    )}
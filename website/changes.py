@@ -0,0 +1,215 @@
+# website/changes.py
+"""
+Change log for incremental sync (GET /api/changes).
+
+Every insert, update and delete of a synced table (SYNCED_TABLES) adds a
+row to `change_log`: a sequence number, the table, the row id and the
+operation. Flushes are recorded from the session (after_flush). ORM bulk
+UPDATE / DELETE statements are recorded from the ids their WHERE clause
+selects, read just before the statement runs. Rows that `flask archive`
+moves out of the hot tables are logged as "archive", not "delete".
+
+Entries are kept on the session until commit and written in
+before_commit, so seq grows in commit order: a reader that has
+everything up to N can never miss a later commit with a smaller seq. On
+Postgres the writer takes a transaction-level advisory lock just before
+that INSERT; it is held only for the INSERT and the COMMIT, so writers
+never wait on each other's open transactions, only on each other's
+commits. SQLite serializes writers anyway.
+
+The log holds keys only. read_changes() pairs each entry with the row as
+it is now, and keeps only the latest entry per row within one page.
+
+Not recorded:
+- raw SQL (text());
+- ORM bulk INSERTs of a list of rows, whose ids are unknown without
+  RETURNING. Code that inserts that way calls record_changes() itself.
+"""
+
+import os
+import time
+from datetime import date, datetime
+from decimal import Decimal
+
+from sqlalchemy import event, func, insert, select, text
+from sqlalchemy.orm import Session
+
+from . import db
+from .models import ChangeLog
+
+SYNCED_TABLES = frozenset(
+    ("category", "product", "customer", "supplier", "outgoing", "purchase", "sales_order")
+)
+
+ADVISORY_LOCK_KEY = 7310023
+
+_listening = False
+
+
+def init_changes(app):
+    """
+    Config (env vars of the same name):
+    - CHANGES_MAX_LIMIT: most entries per /api/changes page (default 5000)
+    - CHANGE_LOG_RETENTION_DAYS: age `flask changes-prune` keeps (default 90)
+    """
+    global _listening
+    app.config.setdefault("CHANGES_MAX_LIMIT", int(os.getenv("CHANGES_MAX_LIMIT", "5000")))
+    app.config.setdefault("CHANGE_LOG_RETENTION_DAYS", int(os.getenv("CHANGE_LOG_RETENTION_DAYS", "90")))
+
+    if not _listening:
+        event.listen(Session, "after_flush", _after_flush)
+        event.listen(Session, "do_orm_execute", _before_bulk)
+        event.listen(Session, "before_commit", _before_commit)
+        event.listen(Session, "after_transaction_end", _after_transaction_end)
+        _listening = True
+
+
+# --------------------------------------------------
+# RECORDING
+# --------------------------------------------------
+def _lock(connection):
+    # held until commit / rollback
+    if connection.dialect.name == "postgresql":
+        connection.execute(text("SELECT pg_advisory_xact_lock(:k)"), {"k": ADVISORY_LOCK_KEY})
+
+
+def _pending(session):
+    return session.info.setdefault("change_log", [])
+
+
+def record_changes(session, table, ids, op):
+    """Log `op` ("insert", "update", ...) for rows `ids` of the synced `table` at commit."""
+    now = time.time()
+    _pending(session).extend((table, i, op, now) for i in ids)
+
+
+def _synced(obj):
+    return obj.__table__.name in SYNCED_TABLES
+
+
+def _after_flush(session, flush_context):
+    now = time.time()
+    entries = [(obj.__table__.name, obj.id, "insert", now) for obj in session.new if _synced(obj)]
+    entries += [
+        (obj.__table__.name, obj.id, "update", now)
+        for obj in session.dirty
+        if _synced(obj) and session.is_modified(obj, include_collections=False)
+    ]
+    entries += [(obj.__table__.name, obj.id, "delete", now) for obj in session.deleted if _synced(obj)]
+    if entries:
+        _pending(session).extend(entries)
+
+
+def _before_bulk(orm_execute_state):
+    state = orm_execute_state
+    if not (state.is_update or state.is_delete) or state.bind_mapper is None:
+        return
+    table = state.bind_mapper.local_table
+    if table.name not in SYNCED_TABLES:
+        return
+
+    op = state.execution_options.get("change_op") or ("update" if state.is_update else "delete")
+    if isinstance(state.parameters, list):
+        # UPDATE by primary key: session.execute(update(Model), [{"id": ...}, ...])
+        ids = [p["id"] for p in state.parameters]
+    else:
+        # the rows the statement is about to touch
+        rows = select(table.c.id)
+        if state.statement.whereclause is not None:
+            rows = rows.where(state.statement.whereclause)
+        ids = state.session.connection().scalars(rows).all()
+    record_changes(state.session, table.name, ids, op)
+
+
+def _before_commit(session):
+    # Session.commit() runs this hook before its own final flush
+    session.flush()
+    entries = session.info.pop("change_log", None)
+    if not entries:
+        return
+    connection = session.connection()
+    _lock(connection)
+    connection.execute(
+        insert(ChangeLog.__table__),
+        [{"table_name": t, "row_id": i, "op": op, "changed_at": at} for t, i, op, at in entries],
+    )
+
+
+def _after_transaction_end(session, transaction):
+    # a rolled back transaction's entries go with it
+    if transaction.parent is None:
+        session.info.pop("change_log", None)
+
+
+# --------------------------------------------------
+# READING
+# --------------------------------------------------
+def _encode(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+def oldest_seq():
+    return db.session.scalar(select(func.min(ChangeLog.seq)))
+
+
+def read_changes(since, limit):
+    """
+    (changes, cursor, has_more) for up to `limit` log entries after `since`.
+
+    changes are dicts {seq, table, id, op, data}, oldest first, with only
+    the latest entry per row; data is the row as it is now (None for
+    deletes, archives and rows deleted since). cursor is the seq to pass
+    as `since` next time.
+    """
+    entries = db.session.execute(
+        select(ChangeLog.seq, ChangeLog.table_name, ChangeLog.row_id, ChangeLog.op)
+        .where(ChangeLog.seq > since)
+        .order_by(ChangeLog.seq)
+        .limit(limit + 1)
+    ).all()
+    has_more = len(entries) > limit
+    entries = entries[:limit]
+    cursor = entries[-1].seq if entries else since
+
+    latest = {}
+    for entry in entries:
+        latest.pop((entry.table_name, entry.row_id), None)
+        latest[(entry.table_name, entry.row_id)] = entry
+
+    wanted = {}
+    for entry in latest.values():
+        if entry.op in ("insert", "update"):
+            wanted.setdefault(entry.table_name, []).append(entry.row_id)
+
+    rows = {}
+    for table_name, ids in wanted.items():
+        table = db.metadata.tables[table_name]
+        for row in db.session.execute(select(table).where(table.c.id.in_(ids))):
+            data = {key: _encode(value) for key, value in row._mapping.items()}
+            rows[(table_name, data["id"])] = data
+
+    changes = [
+        {
+            "seq": entry.seq,
+            "table": entry.table_name,
+            "id": entry.row_id,
+            "op": entry.op,
+            "data": rows.get((entry.table_name, entry.row_id)),
+        }
+        for entry in latest.values()
+    ]
+    return changes, cursor, has_more
+
+
+def prune_changes(days):
+    """Delete log entries older than `days`; returns the number deleted."""
+    cutoff = time.time() - days * 86400
+    deleted = db.session.execute(
+        ChangeLog.__table__.delete().where(ChangeLog.changed_at < cutoff)
+    ).rowcount
+    db.session.commit()
+    return deleted
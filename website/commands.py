@@ -0,0 +1,310 @@
+# website/commands.py
+
+import click
+
+from . import db
+
+
+def register_commands(app):
+    """Attach the project's `flask ...` CLI commands to the app."""
+
+    @app.cli.command("db-upgrade")
+    def db_upgrade():
+        """Create missing tables and apply pending schema migrations."""
+        from .migrations import upgrade
+
+        db.create_all()
+        applied = upgrade(echo=click.echo)
+        click.echo(f"{len(applied)} migration(s) applied.")
+
+    @app.cli.command("db-status")
+    def db_status():
+        """Show which schema migrations have been applied."""
+        from .migrations import status
+
+        for version, description, applied in status():
+            mark = "x" if applied else " "
+            click.echo(f"[{mark}] {version:04d} {description}")
+
+    @app.cli.command("db-backup")
+    @click.argument("output", type=click.Path(file_okay=False))
+    @click.option("-j", "--jobs", default=4, show_default=True,
+                  help="Tables / partitions dumped in parallel (Postgres).")
+    def db_backup(output, jobs):
+        """Back up the whole database into the directory OUTPUT."""
+        import time
+
+        from .backup import BackupError, backup
+
+        started = time.perf_counter()
+        try:
+            manifest = backup(output, jobs=jobs, echo=click.echo)
+        except BackupError as e:
+            raise click.ClickException(str(e))
+        click.echo(f"Backup of schema version {manifest['schema_version']} written to {output} "
+                   f"in {time.perf_counter() - started:.1f}s.")
+
+    @app.cli.command("db-restore")
+    @click.argument("path", type=click.Path(exists=True, file_okay=False))
+    @click.option("-j", "--jobs", default=4, show_default=True,
+                  help="Tables / partitions loaded in parallel (Postgres).")
+    @click.option("--yes", is_flag=True, help="Do not ask for confirmation.")
+    def db_restore(path, jobs, yes):
+        """
+        Replace ALL data in the database with the backup in PATH.
+
+        The backup files are checked first. A failure after that leaves the
+        database partially loaded: fix the cause and run the restore again.
+        On SQLite, stop the app before restoring.
+        """
+        import time
+
+        from .backup import BackupError, restore
+
+        if not yes:
+            click.confirm(
+                f"Replace all data in {db.engine.url.render_as_string(hide_password=True)} "
+                f"with the backup in {path}? If loading fails part way, the database is left "
+                f"partially loaded until the restore is run again.",
+                abort=True,
+            )
+        started = time.perf_counter()
+        try:
+            manifest = restore(path, jobs=jobs, echo=click.echo)
+        except BackupError as e:
+            raise click.ClickException(str(e))
+        click.echo(f"Restored the backup of {manifest['created_at']} in {time.perf_counter() - started:.1f}s.")
+
+    @app.cli.command("backfill-outgoing-prices")
+    @click.option("--batch-size", default=10000, show_default=True, help="Rows per UPDATE / commit.")
+    def backfill_outgoing_prices(batch_size):
+        """Fill Outgoing.unit_price / line_total from the current Product.price."""
+        from sqlalchemy import func, select, update
+        from .models import Outgoing, Product
+
+        max_id = db.session.scalar(select(func.max(Outgoing.id))) or 0
+        price = (
+            select(func.coalesce(Product.price, 0))
+            .where(Product.id == Outgoing.product_id)
+            .scalar_subquery()
+        )
+
+        total = 0
+        for start in range(1, max_id + 1, batch_size):
+            result = db.session.execute(
+                update(Outgoing)
+                .where(
+                    Outgoing.id >= start,
+                    Outgoing.id < start + batch_size,
+                    Outgoing.unit_price.is_(None),
+                )
+                .values(unit_price=price, line_total=price * Outgoing.quantity)
+                .execution_options(synchronize_session=False)
+            )
+            db.session.commit()
+            total += result.rowcount
+            click.echo(f"  ids {start}-{min(start + batch_size - 1, max_id)}: {result.rowcount} rows")
+
+        click.echo(f"Backfilled {total} outgoing row(s).")
+
+    @app.cli.group("partitions")
+    def partitions():
+        """Monthly range partitioning of outgoing / purchase (Postgres only)."""
+
+    @partitions.command("init")
+    @click.option("--months-ahead", default=3, show_default=True, help="Future months to pre-create.")
+    def partitions_init(months_ahead):
+        """Rebuild outgoing and purchase as partitioned tables (one transaction)."""
+        from .partitioning import PARTITIONED_TABLES, convert_to_partitioned, supported
+
+        with db.engine.begin() as conn:
+            if not supported(conn):
+                click.echo(f"{conn.dialect.name}: partitioning not supported, tables left as they are.")
+                return
+            for table in PARTITIONED_TABLES:
+                convert_to_partitioned(conn, table, months_ahead=months_ahead, echo=click.echo)
+        click.echo("Done.")
+
+    @partitions.command("ensure")
+    @click.option("--months-ahead", default=3, show_default=True, help="Future months to pre-create.")
+    def partitions_ensure(months_ahead):
+        """Create any missing partitions up to --months-ahead months out."""
+        from .partitioning import ensure_partitions
+
+        with db.engine.begin() as conn:
+            created = ensure_partitions(conn, months_ahead=months_ahead, echo=click.echo)
+        click.echo(f"{len(created)} partition(s) created.")
+
+    @partitions.command("status")
+    def partitions_status():
+        """List the partitions of outgoing and purchase."""
+        from .partitioning import PARTITIONED_TABLES, is_partitioned, list_partitions
+
+        with db.engine.connect() as conn:
+            for table in PARTITIONED_TABLES:
+                if not is_partitioned(conn, table):
+                    click.echo(f"{table}: not partitioned")
+                    continue
+                click.echo(f"{table}:")
+                for name, bound in list_partitions(conn, table):
+                    click.echo(f"  {name:28} {bound}")
+
+    @app.cli.command("archive")
+    @click.option("--retention-months", type=int, default=None,
+                  help="Months kept in the hot tables (default ARCHIVE_RETENTION_MONTHS).")
+    @click.option("--dry-run", is_flag=True, help="Only count what would be archived.")
+    def archive(retention_months, dry_run):
+        """Move outgoing / purchase rows older than the retention window to archive files."""
+        from .archive import archive_old_records
+
+        counts = archive_old_records(retention_months, dry_run=dry_run, echo=click.echo)
+        verb = "Would archive" if dry_run else "Archived"
+        click.echo(f"{verb} {counts['outgoing']} outgoing and {counts['purchase']} purchase row(s).")
+
+    @app.cli.command("changes-prune")
+    @click.option("--days", type=int, default=None,
+                  help="Days of change log kept (default CHANGE_LOG_RETENTION_DAYS).")
+    def changes_prune(days):
+        """Delete change log entries older than the retention window."""
+        from flask import current_app
+        from .changes import prune_changes
+
+        days = current_app.config["CHANGE_LOG_RETENTION_DAYS"] if days is None else days
+        click.echo(f"Pruned {prune_changes(days)} change log row(s) older than {days} day(s).")
+
+    @app.cli.command("invoices")
+    @click.argument("kind", type=click.Choice(["outgoing", "purchase"]))
+    @click.option("--date-from", type=click.DateTime(["%Y-%m-%d"]), help="First date (inclusive).")
+    @click.option("--date-to", type=click.DateTime(["%Y-%m-%d"]), help="Last date (inclusive).")
+    @click.option("--customer", "customer_id", type=int, help="Only this customer (outgoing).")
+    @click.option("--supplier", "supplier_id", type=int, help="Only this supplier (purchase).")
+    @click.option("--format", "fmt", type=click.Choice(["zip", "pdf"]), default="zip", show_default=True,
+                  help="ZIP of one PDF per invoice, or one merged PDF.")
+    @click.option("--workers", type=int, default=None, help="Render processes (default INVOICE_WORKERS).")
+    @click.option("-o", "--output", type=click.Path(dir_okay=False), required=True)
+    def invoices(kind, date_from, date_to, customer_id, supplier_id, fmt, workers, output):
+        """Render the invoices of a date range / customer / supplier into one file."""
+        import os
+        import time
+
+        from flask import current_app
+        from .invoices import invoice_query, load_invoice_data, write_invoice_batch
+
+        party_id = customer_id if kind == "outgoing" else supplier_id
+        if (customer_id and kind != "outgoing") or (supplier_id and kind != "purchase"):
+            raise click.UsageError("--customer goes with outgoing, --supplier with purchase.")
+
+        stmt = invoice_query(
+            kind,
+            date_from.date() if date_from else None,
+            date_to.date() if date_to else None,
+            party_id,
+        )
+        items = load_invoice_data(kind, stmt)
+        db.session.rollback()  # nothing else is read; don't sit idle in a transaction
+        if not items:
+            click.echo("No invoices match.")
+            return
+
+        workers = workers or current_app.config["INVOICE_WORKERS"]
+        click.echo(f"Rendering {len(items)} invoice(s) with {workers} worker(s)...")
+        started = time.perf_counter()
+        tmp = output + ".tmp"
+        with open(tmp, "wb") as out:
+            write_invoice_batch(kind, items, out, fmt=fmt, workers=workers)
+        os.replace(tmp, output)
+        click.echo(f"Wrote {output} in {time.perf_counter() - started:.1f}s.")
+
+    @app.cli.command("statements")
+    @click.option("--month", type=click.DateTime(["%Y-%m"]), required=True, help="Statement month, YYYY-MM.")
+    @click.option("--customer", "customer_id", type=int, help="Only this customer.")
+    @click.option("--workers", type=int, default=None, help="Render processes (default INVOICE_WORKERS).")
+    @click.option("-o", "--output", required=True,
+                  help="Output directory, or a .zip file. A manifest.csv is written with the PDFs.")
+    def statements(month, customer_id, workers, output):
+        """Render one monthly statement PDF per customer with outgoing records."""
+        import time
+
+        from flask import current_app
+        from .statements import iter_statements, write_statements
+
+        workers = workers or current_app.config["INVOICE_WORKERS"]
+        click.echo(f"Statements for {month:%Y-%m} with {workers} worker(s)...")
+        started = time.perf_counter()
+        manifest = write_statements(
+            iter_statements(month.date(), customer_id), output, workers=workers, echo=click.echo,
+        )
+        db.session.rollback()
+        if not manifest:
+            click.echo("No outgoing records in that month.")
+            return
+        click.echo(f"Wrote {len(manifest)} statement(s) to {output} in {time.perf_counter() - started:.1f}s.")
+
+    @app.cli.command("import")
+    @click.argument("kind", type=click.Choice(["products", "customers", "suppliers"]))
+    @click.argument("paths", nargs=-1, required=True, type=click.Path(exists=True))
+    @click.option("--workers", type=int, default=None, help="Parse processes (default: number of CPUs).")
+    def import_files(kind, paths, workers):
+        """Import Excel files, or directories of them, like the admin upload forms."""
+        import os
+        import time
+
+        from .importers import parse_file, spreadsheet_paths, write_records
+        from .process_pool import imap_ordered
+
+        kind = kind[:-1]
+        files = spreadsheet_paths(paths)
+        if not files:
+            click.echo("No Excel files found.")
+            return
+        workers = min(workers or os.cpu_count() or 1, len(files))
+        click.echo(f"Importing {len(files)} file(s) with {workers} worker(s)...")
+
+        started = time.perf_counter()
+        counts = {"created": 0, "updated": 0, "skipped": 0}
+        failed = 0
+        # files are parsed in the pool while this process writes the previous ones
+        results = imap_ordered(parse_file, ((kind, path) for path in files), workers)
+        try:
+            for n, (path, records, skipped, error) in enumerate(results, 1):
+                if error:
+                    failed += 1
+                    click.echo(f"  [{n}/{len(files)}] {path}: {error}", err=True)
+                    continue
+                counts["skipped"] += skipped
+                write_records(kind, records, commit=True, counts=counts)
+                click.echo(f"  [{n}/{len(files)}] {path}: {len(records) + skipped} row(s)")
+        except Exception:
+            # batches written so far stay committed
+            db.session.rollback()
+            click.echo(f"Import aborted. Created: {counts['created']}, Updated: {counts['updated']}.", err=True)
+            raise
+
+        click.echo(
+            f"Import complete. Created: {counts['created']}, Updated: {counts['updated']}, "
+            f"Skipped: {counts['skipped']}. {failed} file(s) failed. "
+            f"{time.perf_counter() - started:.1f}s."
+        )
+
+    @app.cli.command("precompile-templates")
+    @click.option("--clear", is_flag=True, help="Empty the cache first (drops entries of old templates).")
+    def precompile_templates_command(clear):
+        """Compile every template into the Jinja bytecode cache (run at build / deploy)."""
+        import time
+
+        from flask import current_app
+        from .template_cache import precompile_templates
+
+        started = time.perf_counter()
+        try:
+            compiled, errors = precompile_templates(current_app, clear=clear)
+        except RuntimeError as e:
+            raise click.ClickException(str(e))
+        for name, message in errors.items():
+            click.echo(f"  {name}: {message}", err=True)
+        click.echo(
+            f"{len(compiled)} template(s) compiled into {current_app.config['TEMPLATE_CACHE_DIR']} "
+            f"in {time.perf_counter() - started:.2f}s."
+        )
+        if errors:
+            raise click.ClickException(f"{len(errors)} template(s) failed to compile.")
@@ -0,0 +1,188 @@
+# website/export_cache.py
+"""
+On-disk cache for export files (Excel / PDF downloads).
+
+@cached_export(...) keys the generated file by export type, query
+arguments and the table_version of every table it reads (see
+versioning.py), so the first download after a change renders the file and
+later identical downloads are served from EXPORT_CACHE_DIR with
+send_file. Any write to one of the tables changes the key; stale files
+are never served and age out through the LRU eviction.
+
+Safe across gunicorn workers: files are written to a unique temp name and
+renamed into place, and a per-key flock makes concurrent requests for the
+same missing file wait for one render instead of all rendering it. A
+rendered export is copied to its cache file in chunks and served from
+there. Files are served from an open handle, so an eviction in another
+worker never breaks a download in flight.
+Eviction keeps the directory under EXPORT_CACHE_MAX_BYTES, dropping the
+least recently served files first (a hit refreshes the file's mtime).
+"""
+
+import fcntl
+import hashlib
+import os
+import uuid
+from functools import wraps
+
+from flask import current_app, request, send_file
+
+from .metrics import record_export_cache
+from .versioning import read_versions
+
+SUFFIX = ".export"
+
+
+def init_export_cache(app):
+    """
+    Config (env vars of the same name):
+    - EXPORT_CACHE_ENABLED: "1" to cache exports (default), "0" to always render
+    - EXPORT_CACHE_DIR: cache directory (default instance/export_cache)
+    - EXPORT_CACHE_MAX_BYTES: size bound of the directory (default 512 MiB)
+    """
+    app.config.setdefault(
+        "EXPORT_CACHE_ENABLED", os.getenv("EXPORT_CACHE_ENABLED", "1") == "1"
+    )
+    app.config.setdefault(
+        "EXPORT_CACHE_DIR",
+        os.getenv("EXPORT_CACHE_DIR") or os.path.join(app.instance_path, "export_cache"),
+    )
+    app.config.setdefault(
+        "EXPORT_CACHE_MAX_BYTES",
+        int(os.getenv("EXPORT_CACHE_MAX_BYTES", str(512 * 1024 * 1024))),
+    )
+
+
+def cache_key(kind, tables):
+    """Key for the current request: export type, query args, table versions, code."""
+    versions = read_versions(tables)
+    parts = [
+        kind,
+        current_app.extensions["versioning_fingerprint"],
+        repr(sorted(request.args.items(multi=True))),
+    ]
+    parts += [f"{name}={version}" for name, (version, _) in sorted(versions.items())]
+    return hashlib.sha256("|".join(parts).encode("utf-8")).hexdigest()
+
+
+def cached_export(kind, *tables, download_name, mimetype):
+    """
+    Decorator for export views whose file depends only on the query
+    arguments and the rows of `tables`. Put it below the permission checks:
+    a cache hit does not call the view.
+    """
+    def decorator(f):
+        @wraps(f)
+        def wrapped(*args, **kwargs):
+            if not current_app.config["EXPORT_CACHE_ENABLED"]:
+                return f(*args, **kwargs)
+
+            cache_dir = current_app.config["EXPORT_CACHE_DIR"]
+            os.makedirs(cache_dir, exist_ok=True)
+            key = cache_key(kind, tables)
+            path = os.path.join(cache_dir, key + SUFFIX)
+
+            def send(fh):
+                return send_file(
+                    fh, as_attachment=True, download_name=download_name,
+                    mimetype=mimetype, conditional=False, etag=False,
+                )
+
+            cached = _open(path)
+            if cached is not None:
+                record_export_cache(kind, hit=True)
+                return send(cached)
+
+            with open(os.path.join(cache_dir, key + ".lock"), "w") as lock:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+                try:
+                    # another worker may have rendered it while we waited
+                    cached = _open(path)
+                    if cached is not None:
+                        record_export_cache(kind, hit=True)
+                        return send(cached)
+
+                    record_export_cache(kind, hit=False)
+                    response = f(*args, **kwargs)
+                    if response.status_code != 200:
+                        return response
+
+                    # streamed to disk chunk by chunk: a large export (a
+                    # spooled temp file) is never held in memory whole
+                    try:
+                        cached = _store(path, response.iter_encoded())
+                    finally:
+                        response.close()
+                finally:
+                    fcntl.flock(lock, fcntl.LOCK_UN)
+
+            if cached is None:
+                # the render went into a failed write; render again, uncached
+                return f(*args, **kwargs)
+            evict(cache_dir, current_app.config["EXPORT_CACHE_MAX_BYTES"])
+            return send(cached)
+        return wrapped
+    return decorator
+
+
+def _open(path):
+    """The cached file open for reading, or None if missing (or just evicted)."""
+    try:
+        fh = open(path, "rb")
+    except FileNotFoundError:
+        return None
+    # LRU: mark as recently used; once open, an eviction no longer matters
+    os.utime(fh.fileno())
+    return fh
+
+
+def _store(path, chunks):
+    """Write `chunks` to the cache file `path`; returns it open for reading, or None."""
+    tmp = f"{path}.{os.getpid()}.{uuid.uuid4().hex[:8]}.tmp"
+    fh = None
+    try:
+        fh = open(tmp, "w+b")
+        for chunk in chunks:
+            fh.write(chunk)
+        fh.flush()
+        os.replace(tmp, path)
+    except Exception as e:
+        if fh is not None:
+            fh.close()
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        if not isinstance(e, OSError):
+            raise
+        # a full or read-only disk must not fail the download
+        current_app.logger.exception("could not cache export %s", path)
+        return None
+    fh.seek(0)
+    return fh
+
+
+def evict(cache_dir, max_bytes):
+    """Remove least recently used files until the directory fits max_bytes."""
+    entries = []
+    total = 0
+    for entry in os.scandir(cache_dir):
+        if not entry.name.endswith(SUFFIX):
+            continue
+        try:
+            stat = entry.stat()
+        except FileNotFoundError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, entry.path))
+        total += stat.st_size
+
+    removed = 0
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        for name in (path, path[: -len(SUFFIX)] + ".lock"):
+            try:
+                os.remove(name)
+            except FileNotFoundError:
+                pass
+        total -= size
+        removed += 1
+    return removed
@@ -0,0 +1,279 @@
+# website/importers.py
+"""
+Spreadsheet imports of products, customers and suppliers, shared by the
+admin upload views and `flask import`.
+
+An import has two halves:
+
+- parse_rows() reads the first sheet and validates each row on its own,
+  without touching the database, so `flask import` can run it for many
+  files at once in worker processes (see process_pool.imap_ordered);
+- write_records() upserts the validated records from a single writer,
+  BATCH_SIZE at a time: one query loads the existing rows of a batch, new
+  rows are added and flushed together.
+
+Both keep the semantics the upload views always had. Completely empty
+rows are ignored; other rows missing a required value, or with a bad
+price / quantity / unknown category, count as skipped. Products match on
+(name, category), customers and suppliers on email; a match is updated,
+anything else created, and a key seen earlier in the same import counts
+as an update of that row.
+"""
+
+import os
+from decimal import Decimal
+from itertools import chain
+
+import openpyxl
+import xlrd
+from sqlalchemy import select
+
+from . import db
+from .models import Category, Customer, Product, Supplier
+from .uploads import file_contents, matches_extension
+
+EXCEL_EXTENSIONS = {"xlsx", "xlsm", "xltx", "xltm", "xls"}
+
+BATCH_SIZE = 1000
+
+KINDS = {
+    "product": {
+        "model": Product,
+        "columns": ("name", "price", "quantity", "category"),
+        "optional": ("image",),
+        "header_error": "Header row must contain columns: Name, Price, Quantity, Category "
+                        "(and optional Image).",
+    },
+    "customer": {
+        "model": Customer,
+        "columns": ("name", "address", "email", "contact"),
+        "optional": (),
+        "header_error": "Header row must contain columns: Name, Address, Email, Contact.",
+    },
+    "supplier": {
+        "model": Supplier,
+        "columns": ("name", "address", "email", "contact"),
+        "optional": (),
+        "header_error": "Header row must contain columns: Name, Address, Email, Contact.",
+    },
+}
+
+
+class SpreadsheetError(ValueError):
+    """A file that cannot be imported at all (no data, missing columns)."""
+
+
+# --------------------------------------------------
+# PARSING (no database access)
+# --------------------------------------------------
+def read_rows(source, ext):
+    """Yield the rows of the first sheet of an Excel file (a path or a binary file object)."""
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, "rb") as fh:
+            yield from read_rows(fh, ext)
+        return
+
+    # check the container before a parser sees the file
+    if not matches_extension(source, ext):
+        raise SpreadsheetError("The file is not a valid Excel workbook.")
+
+    if ext == "xls":
+        book = xlrd.open_workbook(file_contents=file_contents(source))
+        sheet = book.sheet_by_index(0)
+        for r in range(sheet.nrows):
+            yield sheet.row_values(r)
+        return
+
+    # read-only mode streams the sheet instead of building every cell object
+    wb = openpyxl.load_workbook(source, read_only=True, data_only=True)
+    try:
+        yield from wb.active.iter_rows(values_only=True)
+    finally:
+        wb.close()
+
+
+def _cell(row, i):
+    if i is None or i >= len(row):
+        return ""
+    val = row[i]
+    return "" if val is None else str(val).strip()
+
+
+def _product(values):
+    name, price_raw, qty_raw, category_name, image = values
+    if not name:
+        return None
+    try:
+        price = Decimal(price_raw)
+        if price < 0:
+            return None
+        quantity = int(float(qty_raw))  # handles "10.0" too
+        if quantity < 0:
+            return None
+    except Exception:
+        return None
+    if not category_name:
+        return None
+    return {
+        "name": name,
+        "price": price,
+        "quantity": quantity,
+        "category": category_name,
+        "image_filename": image or None,
+    }
+
+
+def _contact(values):
+    name, address, email, contact = values
+    if not name or not email:
+        return None
+    return {"name": name, "address": address, "email": email, "contact": contact}
+
+
+def parse_rows(kind, rows):
+    """
+    Validate spreadsheet `rows` (header first) for `kind`.
+
+    Returns (records, skipped): records are dicts for write_records(),
+    skipped the number of invalid rows. Raises SpreadsheetError if there
+    are no data rows or a required column is missing.
+    """
+    spec = KINDS[kind]
+    rows = iter(rows)
+    header_raw = next(rows, None)
+    first = next(rows, None)
+    if header_raw is None or first is None:
+        raise SpreadsheetError("The uploaded file is empty or has no data rows.")
+
+    header = [(str(c).strip().lower() if c is not None else "") for c in header_raw]
+    columns = spec["columns"] + spec["optional"]
+    indexes = [header.index(c) if c in header else None for c in columns]
+    if None in indexes[:len(spec["columns"])]:
+        raise SpreadsheetError(spec["header_error"])
+
+    clean = _product if kind == "product" else _contact
+    records = []
+    skipped = 0
+    for row in chain([first], rows):
+        if row is None:
+            continue
+        values = [_cell(row, i) for i in indexes]
+        if not any(values):
+            continue
+        record = clean(values)
+        if record is None:
+            skipped += 1
+        else:
+            records.append(record)
+    return records, skipped
+
+
+def spreadsheet_paths(paths):
+    """The Excel files among `paths`, with directories searched recursively, sorted."""
+    found = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _dirs, names in os.walk(path):
+                found += [os.path.join(root, name) for name in names if _is_spreadsheet(name)]
+        elif _is_spreadsheet(path):
+            found.append(path)
+    return sorted(set(found))
+
+
+def _is_spreadsheet(name):
+    # "~$..." are the lock files Excel leaves next to open workbooks
+    base = os.path.basename(name)
+    return not base.startswith("~$") and base.rsplit(".", 1)[-1].lower() in EXCEL_EXTENSIONS
+
+
+def parse_file(kind, path):
+    """
+    Worker task for `flask import`: (path, records, skipped, error) for
+    one file; error is the message of a SpreadsheetError, else None.
+    """
+    ext = path.rsplit(".", 1)[-1].lower()
+    try:
+        records, skipped = parse_rows(kind, read_rows(path, ext))
+    except SpreadsheetError as e:
+        return path, [], 0, str(e)
+    return path, records, skipped, None
+
+
+# --------------------------------------------------
+# WRITING
+# --------------------------------------------------
+def _existing(kind, batch):
+    """{key: row} for the rows already in the database that `batch` matches."""
+    if kind == "product":
+        names = {r["name"] for r in batch}
+        rows = Product.query.filter(Product.name.in_(names)).order_by(Product.id)
+        key = lambda p: (p.name, p.category_id)
+    else:
+        model = KINDS[kind]["model"]
+        emails = {r["email"] for r in batch}
+        rows = model.query.filter(model.email.in_(emails)).order_by(model.id)
+        key = lambda obj: obj.email
+
+    found = {}
+    for obj in rows:
+        # the lowest id wins if several rows share a key
+        found.setdefault(key(obj), obj)
+    return found
+
+
+def _upsert(kind, record, categories, found, counts):
+    if kind == "product":
+        category_id = categories.get(record["category"])
+        if category_id is None:
+            counts["skipped"] += 1
+            return
+        key = (record["name"], category_id)
+        values = {
+            "name": record["name"],
+            "price": record["price"],
+            "quantity": record["quantity"],
+            "category_id": category_id,
+        }
+        if record["image_filename"]:
+            values["image_filename"] = record["image_filename"]
+    else:
+        key = record["email"]
+        values = dict(record)
+
+    existing = found.get(key)
+    if existing is not None:
+        for attr, value in values.items():
+            setattr(existing, attr, value)
+        counts["updated"] += 1
+    else:
+        obj = KINDS[kind]["model"](**values)
+        db.session.add(obj)
+        found[key] = obj
+        counts["created"] += 1
+
+
+def write_records(kind, records, commit=False, counts=None):
+    """
+    Upsert validated `records` of `kind`, BATCH_SIZE at a time. Returns
+    `counts` ({"created", "updated", "skipped"}), updated in place if
+    given. With commit=True every batch is committed on its own (the CLI);
+    otherwise the commit is left to the caller (the upload views).
+    """
+    if counts is None:
+        counts = {"created": 0, "updated": 0, "skipped": 0}
+    categories = {}
+    if kind == "product":
+        for category_id, name in db.session.execute(select(Category.id, Category.name).order_by(Category.id)):
+            categories.setdefault(name, category_id)
+
+    for start in range(0, len(records), BATCH_SIZE):
+        batch = records[start:start + BATCH_SIZE]
+        # earlier batches are flushed, so their rows are found like any other
+        found = _existing(kind, batch)
+        for record in batch:
+            _upsert(kind, record, categories, found, counts)
+        db.session.flush()
+        if commit:
+            db.session.commit()
+            db.session.expunge_all()
+    return counts
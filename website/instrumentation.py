@@ -0,0 +1,160 @@
+# website/instrumentation.py
+
+import json
+import logging
+import os
+import random
+from time import perf_counter
+
+from flask import (
+    g,
+    request,
+    current_app,
+    has_request_context,
+    before_render_template,
+    template_rendered,
+)
+from sqlalchemy import event
+
+from . import db
+
+logger = logging.getLogger("website.perf")
+
+
+def init_instrumentation(app):
+    """
+    Per-request timing: wall time, SQL statement count / time and template
+    render time. Emitted as a Server-Timing header and a JSON log line.
+
+    Config (env vars of the same name):
+    - PERF_INSTRUMENTATION: "1" to enable (default), "0" to disable
+    - PERF_SAMPLE_RATE: fraction of requests to measure (0.0 - 1.0)
+    - PERF_SERVER_TIMING: "1" to add the Server-Timing header
+    - PERF_LOG: "1" to write one structured log line per sampled request
+    """
+    app.config.setdefault("PERF_INSTRUMENTATION", os.getenv("PERF_INSTRUMENTATION", "1") == "1")
+    app.config.setdefault("PERF_SAMPLE_RATE", float(os.getenv("PERF_SAMPLE_RATE", "1.0")))
+    app.config.setdefault("PERF_SERVER_TIMING", os.getenv("PERF_SERVER_TIMING", "1") == "1")
+    app.config.setdefault("PERF_LOG", os.getenv("PERF_LOG", "1") == "1")
+
+    if not app.config["PERF_INSTRUMENTATION"]:
+        return
+
+    if not logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+
+    with app.app_context():
+        engine = db.engine
+
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+    before_render_template.connect(_before_render, app)
+    template_rendered.connect(_after_render, app)
+
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
+
+
+def current_timings():
+    """Timing dict for the current request, or None when it is not sampled."""
+    return g.get("_perf")
+
+
+# --------------------------------------------------
+# REQUEST LIFECYCLE
+# --------------------------------------------------
+def _start_request():
+    rate = current_app.config["PERF_SAMPLE_RATE"]
+    if rate < 1.0 and random.random() >= rate:
+        return
+
+    g._perf = {
+        "start": perf_counter(),
+        "sql_count": 0,
+        "sql_time": 0.0,
+        "template_time": 0.0,
+        "template_stack": [],
+    }
+
+
+def _finish_request(response):
+    perf = g.pop("_perf", None)
+    if perf is None:
+        return response
+
+    total_ms = (perf_counter() - perf["start"]) * 1000
+    sql_ms = perf["sql_time"] * 1000
+    template_ms = perf["template_time"] * 1000
+
+    if current_app.config["PERF_SERVER_TIMING"]:
+        response.headers.add(
+            "Server-Timing",
+            f'app;dur={total_ms:.2f}, '
+            f'db;dur={sql_ms:.2f};desc="{perf["sql_count"]} queries", '
+            f'tpl;dur={template_ms:.2f}',
+        )
+
+    if current_app.config["PERF_LOG"]:
+        logger.info(json.dumps({
+            "event": "request",
+            "endpoint": request.endpoint,
+            "method": request.method,
+            "path": request.path,
+            "status": response.status_code,
+            "duration_ms": round(total_ms, 2),
+            "sql_count": perf["sql_count"],
+            "sql_ms": round(sql_ms, 2),
+            "template_ms": round(template_ms, 2),
+        }))
+
+    return response
+
+
+# --------------------------------------------------
+# SQLALCHEMY ENGINE EVENTS
+# --------------------------------------------------
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._perf_start = perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start = getattr(context, "_perf_start", None)
+    if start is None:
+        return
+
+    perf = _sampled()
+    if perf is None:
+        return
+
+    perf["sql_count"] += 1
+    perf["sql_time"] += perf_counter() - start
+
+
+# --------------------------------------------------
+# TEMPLATE SIGNALS
+# --------------------------------------------------
+def _before_render(sender, template, context, **extra):
+    perf = _sampled()
+    if perf is not None:
+        perf["template_stack"].append(perf_counter())
+
+
+def _after_render(sender, template, context, **extra):
+    perf = _sampled()
+    if perf is not None and perf["template_stack"]:
+        started = perf["template_stack"].pop()
+        # only count the outermost render so nested renders are not summed twice
+        if not perf["template_stack"]:
+            perf["template_time"] += perf_counter() - started
+
+
+def _sampled():
+    if not has_request_context():
+        return None
+    return g.get("_perf")
@@ -0,0 +1,305 @@
+# website/invoices.py
+"""
+Invoice rendering, single and in batches.
+
+The drawing code works on plain dicts (invoice_data() turns an Outgoing /
+Purchase row, or an archived record, into one), so it can run in worker
+processes without a database or an app context. render_invoice() gives
+the PDF of one invoice; write_invoice_batch() renders many across a
+process pool and writes them as one ZIP (a PDF per invoice) or as one
+merged PDF (a page per invoice).
+
+Batches are selected from the hot tables only; archived rows are still
+served one at a time by the invoice views.
+"""
+
+import io
+import os
+import zipfile
+from decimal import Decimal
+
+from pypdf import PdfWriter
+from reportlab.lib.pagesizes import letter
+from reportlab.pdfgen import canvas
+from sqlalchemy import select
+from sqlalchemy.orm import joinedload
+
+from . import db
+from .models import Outgoing, Purchase
+from .process_pool import imap_ordered
+
+# invoices rendered per worker task: large enough that pickling and task
+# overhead stay small, small enough to spread a few hundred over all cores
+CHUNK_SIZE = 50
+
+
+def init_invoices(app):
+    """
+    Config (env vars of the same name):
+    - INVOICE_WORKERS: processes used for batches (default: CPU count)
+    - INVOICE_WEB_WORKERS: processes per batch download, in each web
+      worker (default 2, at most INVOICE_WORKERS)
+    - INVOICE_BATCH_MAX: most invoices per batch download (default 5000)
+    """
+    app.config.setdefault("INVOICE_WORKERS", int(os.getenv("INVOICE_WORKERS", "0")) or os.cpu_count() or 1)
+    app.config.setdefault(
+        "INVOICE_WEB_WORKERS",
+        min(int(os.getenv("INVOICE_WEB_WORKERS", "2")), app.config["INVOICE_WORKERS"]),
+    )
+    app.config.setdefault("INVOICE_BATCH_MAX", int(os.getenv("INVOICE_BATCH_MAX", "5000")))
+
+
+# --------------------------------------------------
+# DATA
+# --------------------------------------------------
+def invoice_data(kind, record):
+    """Plain, picklable dict with everything the invoice of `record` shows."""
+    data = {
+        "id": record.id,
+        "date": record.date.isoformat() if record.date else "",
+        "product_name": record.product.name if record.product else "",
+        "quantity": record.quantity,
+    }
+
+    if kind == "purchase":
+        data["supplier_name"] = record.supplier.name if record.supplier else ""
+        return data
+
+    data["unit_price"] = _unit_price(record)
+    data.update(_customer_fields(record.customer))
+    return data
+
+
+def _unit_price(line):
+    if line.unit_price is not None:
+        # price snapshot taken when the sale was recorded
+        return line.unit_price
+    # rows created before the snapshot existed and not yet backfilled
+    if line.product and line.product.price is not None:
+        return line.product.price
+    return Decimal("0.00")
+
+
+def _customer_fields(customer):
+    return {
+        "customer_name": customer.name if customer else "",
+        "customer_address": customer.address if customer else None,
+        "customer_email": customer.email if customer else None,
+        "customer_contact": customer.contact if customer else None,
+    }
+
+
+def order_invoice_data(order):
+    """Like invoice_data, for a SalesOrder with all its lines."""
+    data = {
+        "id": order.id,
+        "date": order.date.isoformat() if order.date else "",
+        "lines": [
+            (line.product.name if line.product else "", line.quantity, _unit_price(line))
+            for line in order.lines
+        ],
+    }
+    data.update(_customer_fields(order.customer))
+    return data
+
+
+INVOICE_PREFIXES = {
+    "outgoing": "invoice",
+    "purchase": "purchase_invoice",
+    "order": "order_invoice",
+}
+
+
+def invoice_filename(kind, data):
+    return f"{INVOICE_PREFIXES[kind]}_{data['id']}.pdf"
+
+
+# --------------------------------------------------
+# DRAWING (no database access)
+# --------------------------------------------------
+def _draw_customer_header(c, data, id_label):
+    """Title, id, date and customer block; returns the y below it."""
+    width, height = letter
+
+    c.setFont("Helvetica-Bold", 16)
+    c.drawString(200, height - 50, "INVOICE")
+
+    y = height - 120
+    c.setFont("Helvetica", 11)
+    c.drawString(50, y, f"{id_label}: {data['id']}")
+    y -= 20
+    c.drawString(50, y, f"Date: {data['date']}")
+    y -= 30
+
+    c.drawString(50, y, "Customer:")
+    y -= 20
+    c.drawString(70, y, data["customer_name"])
+    y -= 15
+    if data["customer_address"]:
+        c.drawString(70, y, data["customer_address"])
+        y -= 15
+    if data["customer_email"]:
+        c.drawString(70, y, f"Email: {data['customer_email']}")
+        y -= 15
+    if data["customer_contact"]:
+        c.drawString(70, y, f"Contact: {data['customer_contact']}")
+        y -= 30
+    return y
+
+
+def _draw_line_titles(c, y):
+    c.setFont("Helvetica-Bold", 11)
+    c.drawString(50, y, "Product")
+    c.drawString(300, y, "Quantity")
+    c.drawString(380, y, "Unit Price")
+    c.drawString(470, y, "Total")
+    c.setFont("Helvetica", 11)
+    return y - 20
+
+
+def _draw_line(c, y, product_name, quantity, unit_price):
+    total = unit_price * quantity
+    c.drawString(50, y, product_name)
+    c.drawString(300, y, str(quantity))
+    c.drawString(380, y, f"{unit_price:.2f}")
+    c.drawString(470, y, f"{total:.2f}")
+    return total
+
+
+def draw_outgoing_invoice(c, data):
+    y = _draw_customer_header(c, data, "Invoice ID")
+
+    # product table
+    y = _draw_line_titles(c, y)
+    total = _draw_line(c, y, data["product_name"], data["quantity"], data["unit_price"])
+    y -= 30
+
+    c.setFont("Helvetica-Bold", 12)
+    c.drawRightString(550, y, f"Grand Total: {total:.2f}")
+
+
+def draw_order_invoice(c, data):
+    width, height = letter
+    y = _draw_customer_header(c, data, "Order No")
+
+    y = _draw_line_titles(c, y)
+    grand_total = Decimal("0.00")
+    for product_name, quantity, unit_price in data["lines"]:
+        if y < 80:
+            # continuation page: repeat the column titles only
+            c.showPage()
+            c.setFont("Helvetica", 11)
+            c.drawString(50, height - 50, f"Order No {data['id']} (continued)")
+            y = _draw_line_titles(c, height - 80)
+        grand_total += _draw_line(c, y, product_name, quantity, unit_price)
+        y -= 20
+    y -= 10
+
+    c.setFont("Helvetica-Bold", 12)
+    c.drawRightString(550, y, f"Grand Total: {grand_total:.2f}")
+
+
+def draw_purchase_invoice(c, data):
+    width, height = letter
+
+    c.setFont("Helvetica-Bold", 16)
+    c.drawString(50, height - 50, "Purchase Invoice")
+
+    c.setFont("Helvetica", 11)
+    y = height - 100
+    c.drawString(50, y, f"Invoice ID: {data['id']}")
+    y -= 20
+    c.drawString(50, y, f"Date: {data['date']}")
+    y -= 20
+    c.drawString(50, y, f"Product: {data['product_name']}")
+    y -= 20
+    c.drawString(50, y, f"Supplier: {data['supplier_name']}")
+    y -= 20
+    c.drawString(50, y, f"Quantity: {data['quantity']}")
+
+
+DRAWERS = {
+    "outgoing": draw_outgoing_invoice,
+    "purchase": draw_purchase_invoice,
+    "order": draw_order_invoice,
+}
+
+
+def render_invoices_pdf(kind, items):
+    """One PDF with a page per invoice in `items`."""
+    draw = DRAWERS[kind]
+    buffer = io.BytesIO()
+    c = canvas.Canvas(buffer, pagesize=letter)
+    for data in items:
+        draw(c, data)
+        c.showPage()
+    c.save()
+    return buffer.getvalue()
+
+
+def render_invoice(kind, data):
+    """PDF bytes of a single invoice."""
+    return render_invoices_pdf(kind, [data])
+
+
+def _render_chunk(kind, items, merged):
+    # runs in a worker process
+    if merged:
+        return [render_invoices_pdf(kind, items)]
+    return [render_invoice(kind, data) for data in items]
+
+
+# --------------------------------------------------
+# BATCHES
+# --------------------------------------------------
+def invoice_query(kind, date_from=None, date_to=None, party_id=None):
+    """Rows of `kind` in the date range (inclusive), for one customer / supplier if given."""
+    if kind == "outgoing":
+        model, party_column, party = Outgoing, Outgoing.customer_id, Outgoing.customer
+    else:
+        model, party_column, party = Purchase, Purchase.supplier_id, Purchase.supplier
+
+    stmt = select(model).options(joinedload(model.product), joinedload(party))
+    if date_from:
+        stmt = stmt.where(model.date >= date_from)
+    if date_to:
+        stmt = stmt.where(model.date <= date_to)
+    if party_id:
+        stmt = stmt.where(party_column == party_id)
+    return stmt.order_by(model.date, model.id)
+
+
+def load_invoice_data(kind, stmt):
+    return [invoice_data(kind, record) for record in db.session.scalars(stmt)]
+
+
+def write_invoice_batch(kind, items, out, fmt="zip", workers=1):
+    """
+    Render `items` (invoice_data dicts) and write them to the binary file
+    `out`: a ZIP of one PDF per invoice (fmt="zip") or a single merged PDF
+    (fmt="pdf"). Rendering is spread over `workers` processes.
+    Returns the number of invoices written.
+    """
+    merged = fmt == "pdf"
+    chunks = [items[i:i + CHUNK_SIZE] for i in range(0, len(items), CHUNK_SIZE)]
+    workers = min(workers, len(chunks))
+
+    results = imap_ordered(_render_chunk, ((kind, chunk, merged) for chunk in chunks), workers)
+    _write_results(kind, chunks, results, out, merged)
+    return len(items)
+
+
+def _write_results(kind, chunks, results, out, merged):
+    # results arrive in submission order, so output follows `items`
+    if merged:
+        writer = PdfWriter()
+        for (pdf,) in results:
+            writer.append(io.BytesIO(pdf))
+        writer.write(out)
+        return
+
+    # PDFs barely compress; storing them keeps the zip step cheap
+    with zipfile.ZipFile(out, "w", compression=zipfile.ZIP_STORED) as zf:
+        for chunk, pdfs in zip(chunks, results):
+            for data, pdf in zip(chunk, pdfs):
+                zf.writestr(invoice_filename(kind, data), pdf)
@@ -0,0 +1,158 @@
+# website/metrics.py
+
+import os
+import hmac
+from time import perf_counter
+
+from flask import Blueprint, Response, abort, current_app, g, request
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from sqlalchemy import event
+
+from . import db
+
+# --------------------------------------------------
+# METRIC DEFINITIONS
+# --------------------------------------------------
+# Under gunicorn, PROMETHEUS_MULTIPROC_DIR is set by gunicorn.conf.py so each
+# worker writes its values to shared mmap files and /metrics sums them.
+
+REQUEST_LATENCY = Histogram(
+    "inventory_request_duration_seconds",
+    "Request latency per endpoint.",
+    ["endpoint", "method"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60),
+)
+REQUESTS_IN_FLIGHT = Gauge(
+    "inventory_requests_in_flight",
+    "Requests currently being handled.",
+    multiprocess_mode="livesum",
+)
+DB_POOL_CHECKED_OUT = Gauge(
+    "inventory_db_pool_checked_out",
+    "Database connections currently checked out of the pool.",
+    multiprocess_mode="livesum",
+)
+DB_POOL_CONNECTIONS = Gauge(
+    "inventory_db_pool_connections",
+    "Database connections currently open (idle + checked out).",
+    multiprocess_mode="livesum",
+)
+ROWS_PROCESSED = Counter(
+    "inventory_rows_processed_total",
+    "Rows processed by imports and exports.",
+    ["operation"],
+)
+EXPORT_CACHE_REQUESTS = Counter(
+    "inventory_export_cache_requests_total",
+    "Export downloads by cache result (hit / miss).",
+    ["export", "result"],
+)
+
+metrics = Blueprint("metrics", __name__)
+
+
+def init_metrics(app):
+    """
+    Register the /metrics endpoint and the request / pool hooks.
+
+    Config (env vars of the same name):
+    - METRICS_ENABLED: "1" to enable (default), "0" to disable
+    - METRICS_TOKEN: if set, /metrics requires "Authorization: Bearer <token>"
+    """
+    app.config.setdefault("METRICS_ENABLED", os.getenv("METRICS_ENABLED", "1") == "1")
+    app.config.setdefault("METRICS_TOKEN", os.getenv("METRICS_TOKEN"))
+
+    if not app.config["METRICS_ENABLED"]:
+        return
+
+    with app.app_context():
+        engine = db.engine
+
+    event.listen(engine.pool, "connect", _pool_connect)
+    event.listen(engine.pool, "close", _pool_close)
+    event.listen(engine.pool, "checkout", _pool_checkout)
+    event.listen(engine.pool, "checkin", _pool_checkin)
+
+    app.before_request(_start_request)
+    app.teardown_request(_finish_request)
+    app.register_blueprint(metrics)
+
+
+def record_rows(operation, count):
+    """Count rows handled by an import / export, e.g. record_rows("product_import", 120)."""
+    if count:
+        ROWS_PROCESSED.labels(operation=operation).inc(count)
+
+
+def record_export_cache(export, hit):
+    """Count an export download served from the cache (hit) or rendered (miss)."""
+    EXPORT_CACHE_REQUESTS.labels(export=export, result="hit" if hit else "miss").inc()
+
+
+# --------------------------------------------------
+# /metrics
+# --------------------------------------------------
+@metrics.route("/metrics")
+def metrics_endpoint():
+    token = current_app.config.get("METRICS_TOKEN")
+    if token:
+        supplied = request.headers.get("Authorization", "")
+        if not hmac.compare_digest(supplied, f"Bearer {token}"):
+            abort(401)
+
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+
+    return Response(generate_latest(registry), content_type=CONTENT_TYPE_LATEST)
+
+
+# --------------------------------------------------
+# REQUEST HOOKS
+# --------------------------------------------------
+def _start_request():
+    if request.endpoint == "metrics.metrics_endpoint":
+        return
+    g._metrics_start = perf_counter()
+    REQUESTS_IN_FLIGHT.inc()
+
+
+def _finish_request(exc=None):
+    start = g.pop("_metrics_start", None)
+    if start is None:
+        return
+    REQUESTS_IN_FLIGHT.dec()
+    REQUEST_LATENCY.labels(
+        endpoint=request.endpoint or "unknown",
+        method=request.method,
+    ).observe(perf_counter() - start)
+
+
+# --------------------------------------------------
+# POOL EVENTS
+# --------------------------------------------------
+def _pool_connect(dbapi_connection, connection_record):
+    DB_POOL_CONNECTIONS.inc()
+
+
+def _pool_close(dbapi_connection, connection_record):
+    DB_POOL_CONNECTIONS.dec()
+
+
+def _pool_checkout(dbapi_connection, connection_record, connection_proxy):
+    DB_POOL_CHECKED_OUT.inc()
+
+
+def _pool_checkin(dbapi_connection, connection_record):
+    DB_POOL_CHECKED_OUT.dec()
@@ -0,0 +1,204 @@
+# website/migrations.py
+"""
+Lightweight schema migrations.
+
+db.create_all() creates missing tables (with every index and column the
+models declare) but never changes a table that already exists. Changes to
+existing tables go here as numbered, idempotent steps; the applied
+versions are recorded in `schema_migrations`.
+
+They run with `flask db-upgrade` (at deploy) and, on SQLite, also
+automatically from create_app() unless AUTO_MIGRATE=0. On Postgres the
+steps run in autocommit mode so indexes can be built CONCURRENTLY without
+blocking writes; every step must therefore be safe to re-run, which the
+helpers below are.
+"""
+
+import time
+from datetime import datetime, timezone
+
+from sqlalchemy import inspect, text
+
+from . import db
+from .partitioning import is_partitioned, list_partitions
+
+MIGRATIONS = []
+
+
+def migration(version, description):
+    """Register a migration step: fn(conn) runs inside one transaction."""
+    def decorator(fn):
+        MIGRATIONS.append((version, description, fn))
+        MIGRATIONS.sort(key=lambda m: m[0])
+        return fn
+    return decorator
+
+
+# --------------------------------------------------
+# HELPERS (idempotent on SQLite and Postgres)
+# --------------------------------------------------
+def create_index(conn, name, table, columns, unique=False):
+    cols = ", ".join(f'"{c}"' for c in columns)
+    kind = "UNIQUE INDEX" if unique else "INDEX"
+    if conn.dialect.name != "postgresql":
+        conn.execute(text(f'CREATE {kind} IF NOT EXISTS {name} ON "{table}" ({cols})'))
+        return
+
+    if is_partitioned(conn, table):
+        # CONCURRENTLY is not supported on a partitioned table: create the
+        # parent index alone, build each partition's index concurrently and
+        # attach it; the parent index becomes valid once all are attached
+        conn.execute(text(f'CREATE {kind} IF NOT EXISTS {name} ON ONLY "{table}" ({cols})'))
+        for partition, _ in list_partitions(conn, table):
+            covered = conn.execute(text(
+                "SELECT 1 FROM pg_inherits h JOIN pg_index x ON x.indexrelid = h.inhrelid "
+                "WHERE h.inhparent = CAST(:i AS regclass) AND x.indrelid = CAST(:p AS regclass)"
+            ), {"i": name, "p": partition}).first()
+            if covered:
+                continue
+            child = f"{name}__{partition[len(table) + 1:]}"
+            create_index(conn, child, partition, columns, unique)
+            conn.execute(text(f"ALTER INDEX {name} ATTACH PARTITION {child}"))
+        return
+
+    # an interrupted concurrent build leaves an INVALID index behind, which
+    # IF NOT EXISTS would then skip: drop it and build again
+    invalid = conn.execute(text(
+        "SELECT 1 FROM pg_index x JOIN pg_class i ON i.oid = x.indexrelid "
+        "WHERE i.relname = :n AND NOT x.indisvalid"
+    ), {"n": name}).first()
+    if invalid:
+        conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {name}"))
+    conn.execute(text(f'CREATE {kind} CONCURRENTLY IF NOT EXISTS {name} ON "{table}" ({cols})'))
+
+
+def has_column(conn, table, column):
+    return any(c["name"] == column for c in inspect(conn).get_columns(table))
+
+
+def add_column(conn, table, column, ddl_type):
+    """ALTER TABLE ... ADD COLUMN unless the column is already there."""
+    if not has_column(conn, table, column):
+        conn.execute(text(f'ALTER TABLE "{table}" ADD COLUMN "{column}" {ddl_type}'))
+
+
+# --------------------------------------------------
+# RUNNER
+# --------------------------------------------------
+ADVISORY_LOCK_KEY = 7310021
+
+
+def upgrade(echo=None):
+    """Apply pending migrations. Must be called inside an app context."""
+    engine = db.engine
+
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE IF NOT EXISTS schema_migrations ("
+            " version INTEGER PRIMARY KEY,"
+            " description VARCHAR(255) NOT NULL,"
+            " applied_at VARCHAR(40) NOT NULL)"
+        ))
+
+    if engine.dialect.name == "postgresql":
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            # serialize concurrent runners; polled, so a waiting runner holds
+            # no snapshot that a CREATE INDEX CONCURRENTLY would wait on
+            while not conn.execute(text("SELECT pg_try_advisory_lock(:k)"), {"k": ADVISORY_LOCK_KEY}).scalar():
+                time.sleep(0.5)
+            try:
+                return [version for version, description, fn in MIGRATIONS
+                        if _apply(conn, version, description, fn, echo)]
+            finally:
+                conn.execute(text("SELECT pg_advisory_unlock(:k)"), {"k": ADVISORY_LOCK_KEY})
+
+    applied_now = []
+    for version, description, fn in MIGRATIONS:
+        with engine.begin() as conn:
+            if engine.dialect.name == "sqlite":
+                # take the write lock before the "already applied?" check so
+                # concurrent gunicorn workers run each step one at a time
+                conn.exec_driver_sql("BEGIN IMMEDIATE")
+            if _apply(conn, version, description, fn, echo):
+                applied_now.append(version)
+    return applied_now
+
+
+def _apply(conn, version, description, fn, echo):
+    done = conn.execute(
+        text("SELECT 1 FROM schema_migrations WHERE version = :v"),
+        {"v": version},
+    ).first()
+    if done:
+        return False
+
+    if echo:
+        echo(f"Applying migration {version:04d}: {description}")
+    fn(conn)
+    # another runner finishing the same step first is fine
+    conn.execute(
+        text(
+            "INSERT INTO schema_migrations (version, description, applied_at) "
+            "VALUES (:v, :d, :t) ON CONFLICT (version) DO NOTHING"
+        ),
+        {"v": version, "d": description, "t": datetime.now(timezone.utc).isoformat()},
+    )
+    return True
+
+
+def status():
+    """List of (version, description, applied) for every known migration."""
+    with db.engine.connect() as conn:
+        try:
+            applied = {r[0] for r in conn.execute(text("SELECT version FROM schema_migrations"))}
+        except Exception:
+            applied = set()
+    return [(v, d, v in applied) for v, d, _ in MIGRATIONS]
+
+
+# --------------------------------------------------
+# MIGRATIONS
+# --------------------------------------------------
+@migration(1, "foreign-key and sort-order indexes on inventory tables")
+def _0001_inventory_indexes(conn):
+    create_index(conn, "ix_outgoing_product_id", "outgoing", ["product_id"])
+    create_index(conn, "ix_outgoing_customer_id", "outgoing", ["customer_id"])
+    create_index(conn, "ix_outgoing_date_id", "outgoing", ["date", "id"])
+    create_index(conn, "ix_purchase_product_id", "purchase", ["product_id"])
+    create_index(conn, "ix_purchase_supplier_id", "purchase", ["supplier_id"])
+    create_index(conn, "ix_purchase_date_id", "purchase", ["date", "id"])
+    create_index(conn, "ix_product_category_id", "product", ["category_id"])
+    create_index(conn, "ix_product_name_category_id", "product", ["name", "category_id"])
+    create_index(conn, "ix_customer_email", "customer", ["email"])
+    create_index(conn, "ix_supplier_email", "supplier", ["email"])
+
+
+@migration(2, "unit price / line total snapshot on outgoing")
+def _0002_outgoing_price_snapshot(conn):
+    add_column(conn, "outgoing", "unit_price", "NUMERIC(10, 2)")
+    add_column(conn, "outgoing", "line_total", "NUMERIC(12, 2)")
+    create_index(conn, "ix_outgoing_date_line_total", "outgoing", ["date", "line_total"])
+
+
+@migration(3, "sales order link on outgoing lines")
+def _0003_outgoing_order_id(conn):
+    add_column(conn, "outgoing", "order_id", "INTEGER REFERENCES sales_order (id)")
+    create_index(conn, "ix_outgoing_order_id", "outgoing", ["order_id"])
+
+
+@migration(4, "updated_at on inventory tables, created_at on customer")
+def _0004_updated_at(conn):
+    postgres = conn.dialect.name == "postgresql"
+    timestamp = "TIMESTAMP WITH TIME ZONE" if postgres else "DATETIME"
+    for table in ("customer", "supplier", "product", "outgoing", "purchase"):
+        if postgres:
+            # now() is evaluated once: existing rows count as changed at
+            # migration time, and Postgres 11+ adds the column without a rewrite
+            add_column(conn, table, "updated_at", f"{timestamp} DEFAULT now()")
+        else:
+            # SQLite can't add a column with a non-constant default
+            add_column(conn, table, "updated_at", timestamp)
+            conn.execute(text(f'UPDATE "{table}" SET updated_at = CURRENT_TIMESTAMP WHERE updated_at IS NULL'))
+        create_index(conn, f"ix_{table}_updated_at", table, ["updated_at"])
+    # existing customers keep created_at NULL: when they were added is unknown
+    add_column(conn, "customer", "created_at", timestamp)
@@ -2,6 +2,7 @@ from . import db
 from flask_login import UserMixin
 from sqlalchemy.sql import func
 from datetime import date
+from decimal import Decimal
 
 
 class Note(db.Model):
@@ -83,9 +84,11 @@ class Supplier(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(150), nullable=False)
     address = db.Column(db.String(255))
-    email = db.Column(db.String(150))
+    email = db.Column(db.String(150), index=True)
     contact = db.Column(db.String(50))
     created_at = db.Column(db.DateTime(timezone=True), server_default=func.now())
+    updated_at = db.Column(db.DateTime(timezone=True), default=func.now(), server_default=func.now(),
+                           onupdate=func.now(), index=True)
     purchases = db.relationship(
         "Purchase",
         back_populates="supplier",
@@ -95,31 +98,62 @@ class Supplier(db.Model):
 ## for outgoing Product
 class Outgoing(db.Model):
     __tablename__ = "outgoing"
+    __table_args__ = (
+        # outgoing_list / exports sort by (date desc, id desc)
+        db.Index("ix_outgoing_date_id", "date", "id"),
+        # revenue sums by date range read only this index
+        db.Index("ix_outgoing_date_line_total", "date", "line_total"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
-    product_id = db.Column(db.Integer, db.ForeignKey("product.id"), nullable=False)
-    customer_id = db.Column(db.Integer, db.ForeignKey("customer.id"), nullable=False)
+    product_id = db.Column(db.Integer, db.ForeignKey("product.id"), nullable=False, index=True)
+    customer_id = db.Column(db.Integer, db.ForeignKey("customer.id"), nullable=False, index=True)
     quantity = db.Column(db.Integer, nullable=False)
     date = db.Column(db.Date, nullable=False, server_default=func.current_date())
     created_at = db.Column(db.DateTime(timezone=True), server_default=func.now())
+    updated_at = db.Column(db.DateTime(timezone=True), default=func.now(), server_default=func.now(),
+                           onupdate=func.now(), index=True)
+
+    # price at the time of sale, so invoices don't change with Product.price
+    unit_price = db.Column(db.Numeric(10, 2))
+    line_total = db.Column(db.Numeric(12, 2))
+
+    # set for the lines of a multi-line sales order
+    order_id = db.Column(db.Integer, db.ForeignKey("sales_order.id"), index=True)
 
     # relationships
     product = db.relationship("Product", back_populates="outgoings")
     customer = db.relationship("Customer", back_populates="outgoings")
+    order = db.relationship("SalesOrder", back_populates="lines")
+
+    def snapshot_price(self, product):
+        """Copy the product's current price onto this record and recompute the total."""
+        self.unit_price = product.price if product.price is not None else Decimal("0.00")
+        self.update_total()
+
+    def update_total(self):
+        if self.unit_price is not None and self.quantity is not None:
+            self.line_total = self.unit_price * self.quantity
 
 
 # Make sure Product and Customer have back_populates
 
 class Product(db.Model):
     __tablename__ = "product"
+    __table_args__ = (
+        # importer upsert lookup (name, category_id); also serves ORDER BY name
+        db.Index("ix_product_name_category_id", "name", "category_id"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(150), nullable=False)
     price = db.Column(db.Numeric(10, 2))
     quantity = db.Column(db.Integer, default=0)
     image_filename = db.Column(db.String(255))
-    category_id = db.Column(db.Integer, db.ForeignKey("category.id"))
+    category_id = db.Column(db.Integer, db.ForeignKey("category.id"), index=True)
     created_at = db.Column(db.DateTime(timezone=True), server_default=func.now())
+    updated_at = db.Column(db.DateTime(timezone=True), default=func.now(), server_default=func.now(),
+                           onupdate=func.now(), index=True)
 
     # category = db.relationship("Category", back_populates="products")
     outgoings = db.relationship("Outgoing", back_populates="product", cascade="all, delete-orphan")
@@ -136,10 +170,32 @@ class Customer(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(150), nullable=False)
     address = db.Column(db.String(255))
-    email = db.Column(db.String(150))
+    email = db.Column(db.String(150), index=True)
     contact = db.Column(db.String(50))
+    # default= too: on SQLite, migration 4 adds these columns without a database default
+    created_at = db.Column(db.DateTime(timezone=True), default=func.now(), server_default=func.now())
+    updated_at = db.Column(db.DateTime(timezone=True), default=func.now(), server_default=func.now(),
+                           onupdate=func.now(), index=True)
 
     outgoings = db.relationship("Outgoing", back_populates="customer", cascade="all, delete-orphan")
+    orders = db.relationship("SalesOrder", back_populates="customer", cascade="all, delete-orphan")
+
+
+class SalesOrder(db.Model):
+    """A customer order; each line is an Outgoing row with order_id set."""
+    __tablename__ = "sales_order"
+    __table_args__ = (
+        db.Index("ix_sales_order_date_id", "date", "id"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    customer_id = db.Column(db.Integer, db.ForeignKey("customer.id"), nullable=False, index=True)
+    date = db.Column(db.Date, nullable=False, server_default=func.current_date())
+    created_at = db.Column(db.DateTime(timezone=True), server_default=func.now())
+
+    customer = db.relationship("Customer", back_populates="orders")
+    lines = db.relationship("Outgoing", back_populates="order", order_by="Outgoing.id")
+
 
 class Category(db.Model):
     __tablename__ = "category"
@@ -156,14 +212,51 @@ class Category(db.Model):
 
 class Purchase(db.Model):
     __tablename__ = "purchase"
+    __table_args__ = (
+        db.Index("ix_purchase_date_id", "date", "id"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
-    product_id = db.Column(db.Integer, db.ForeignKey("product.id"), nullable=False)
-    supplier_id = db.Column(db.Integer, db.ForeignKey("supplier.id"), nullable=False)
+    product_id = db.Column(db.Integer, db.ForeignKey("product.id"), nullable=False, index=True)
+    supplier_id = db.Column(db.Integer, db.ForeignKey("supplier.id"), nullable=False, index=True)
     quantity = db.Column(db.Integer, nullable=False)
     date = db.Column(db.Date, nullable=False, default=date.today)
     created_at = db.Column(db.DateTime(timezone=True), server_default=func.now())
+    updated_at = db.Column(db.DateTime(timezone=True), default=func.now(), server_default=func.now(),
+                           onupdate=func.now(), index=True)
 
     # relationships
     product = db.relationship("Product", back_populates="purchases")
     supplier = db.relationship("Supplier", back_populates="purchases")
+
+
+class ArchivedRecord(db.Model):
+    """Where an archived outgoing / purchase row went (see website/archive.py)."""
+    __tablename__ = "archived_record"
+
+    kind = db.Column(db.String(20), primary_key=True)        # "outgoing" / "purchase"
+    record_id = db.Column(db.Integer, primary_key=True)
+    month = db.Column(db.String(7), nullable=False)           # "YYYY-MM"
+    path = db.Column(db.String(255), nullable=False)          # relative to ARCHIVE_DIR
+
+
+class TableVersion(db.Model):
+    """Change counter per table, bumped by every write (see website/versioning.py)."""
+    __tablename__ = "table_version"
+
+    table_name = db.Column(db.String(64), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    changed_at = db.Column(db.Float, nullable=False)          # unix time of the last bump
+
+
+class ChangeLog(db.Model):
+    """One row per insert / update / delete of a synced table (see website/changes.py)."""
+    __tablename__ = "change_log"
+    # AUTOINCREMENT on SQLite: seq must never be reused, even after pruning
+    __table_args__ = {"sqlite_autoincrement": True}
+
+    seq = db.Column(db.BigInteger().with_variant(db.Integer, "sqlite"), primary_key=True)
+    table_name = db.Column(db.String(64), nullable=False)
+    row_id = db.Column(db.Integer, nullable=False)
+    op = db.Column(db.String(8), nullable=False)                # insert / update / delete / archive
+    changed_at = db.Column(db.Float, nullable=False)          # unix time
@@ -0,0 +1,194 @@
+# website/partitioning.py
+"""
+Optional monthly range partitioning of the history tables on Postgres.
+
+`flask partitions init` rebuilds `outgoing` and `purchase` as tables
+PARTITION BY RANGE (date): one partition per month plus a DEFAULT
+partition, so date-filtered queries only touch the months they need
+(partition pruning) and old months can be vacuumed, archived or dropped
+on their own. The primary key becomes (id, date), as Postgres requires
+the partition key in it; the ORM models still identify rows by id alone,
+so views keep working unchanged.
+
+Future partitions are created ahead of time by `flask partitions ensure`,
+run at deploy and from a monthly cron job; it is never run from the app
+itself, as it takes locks and moves rows. Rows that still land outside
+the existing partitions go to the DEFAULT partition; when that month's
+partition is created later, they are moved into it.
+
+On SQLite all of this is a no-op and the plain tables are used.
+"""
+
+import re
+from datetime import date
+
+from sqlalchemy import text
+
+PARTITIONED_TABLES = ("outgoing", "purchase")
+
+
+def supported(conn):
+    return conn.dialect.name == "postgresql"
+
+
+def month_start(d):
+    return date(d.year, d.month, 1)
+
+
+def add_months(d, months):
+    index = d.year * 12 + (d.month - 1) + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(table, start):
+    return f"{table}_p{start.year:04d}_{start.month:02d}"
+
+
+def is_partitioned(conn, table):
+    if not supported(conn):
+        return False
+    return conn.execute(text(
+        "SELECT 1 FROM pg_partitioned_table p "
+        "JOIN pg_class c ON c.oid = p.partrelid "
+        "WHERE c.relname = :t AND c.relnamespace = current_schema()::regnamespace"
+    ), {"t": table}).first() is not None
+
+
+def list_partitions(conn, table):
+    """[(partition name, bound expression)] for a partitioned table."""
+    rows = conn.execute(text(
+        "SELECT c.relname, pg_get_expr(c.relpartbound, c.oid) "
+        "FROM pg_inherits i "
+        "JOIN pg_class c ON c.oid = i.inhrelid "
+        "JOIN pg_class p ON p.oid = i.inhparent "
+        "WHERE p.relname = :t AND p.relnamespace = current_schema()::regnamespace "
+        "ORDER BY c.relname"
+    ), {"t": table})
+    return [(r[0], r[1]) for r in rows]
+
+
+def _relation_exists(conn, name):
+    return conn.execute(text("SELECT to_regclass(:n)"), {"n": name}).scalar() is not None
+
+
+def create_month_partition(conn, table, start):
+    """
+    Create and attach the partition for the month starting at `start`.
+    Rows for that month already sitting in the DEFAULT partition are moved
+    into the new partition before it is attached.
+    """
+    name = partition_name(table, start)
+    if _relation_exists(conn, name):
+        return False
+
+    end = add_months(start, 1)
+    lo, hi = start.isoformat(), end.isoformat()
+
+    conn.execute(text(f'CREATE TABLE "{name}" (LIKE "{table}" INCLUDING DEFAULTS INCLUDING CONSTRAINTS)'))
+    if _relation_exists(conn, f"{table}_default"):
+        conn.execute(text(
+            f'WITH moved AS (DELETE FROM "{table}_default" '
+            f"WHERE date >= '{lo}' AND date < '{hi}' RETURNING *) "
+            f'INSERT INTO "{name}" SELECT * FROM moved'
+        ))
+    conn.execute(text(
+        f'ALTER TABLE "{table}" ATTACH PARTITION "{name}" '
+        f"FOR VALUES FROM ('{lo}') TO ('{hi}')"
+    ))
+    return True
+
+
+def ensure_partitions(conn, months_ahead=3, today=None, echo=None):
+    """Create missing partitions from the current month to `months_ahead` months out."""
+    if not supported(conn):
+        return []
+
+    # serialize overlapping runs (deploy and cron)
+    conn.execute(text("SELECT pg_advisory_xact_lock(7310022)"))
+
+    first = month_start(today or date.today())
+    created = []
+    for table in PARTITIONED_TABLES:
+        if not is_partitioned(conn, table):
+            continue
+        for i in range(months_ahead + 1):
+            start = add_months(first, i)
+            if create_month_partition(conn, table, start):
+                created.append(partition_name(table, start))
+                if echo:
+                    echo(f"  created {partition_name(table, start)}")
+    return created
+
+
+def convert_to_partitioned(conn, table, months_ahead=3, echo=None):
+    """
+    Rebuild `table` as a monthly range-partitioned table, copying its rows.
+    Runs in the caller's transaction: on any error nothing is changed.
+    """
+    if is_partitioned(conn, table):
+        if echo:
+            echo(f"{table}: already partitioned")
+        return False
+
+    old = f"{table}_unpartitioned"
+    say = echo or (lambda msg: None)
+
+    conn.execute(text(f'LOCK TABLE "{table}" IN ACCESS EXCLUSIVE MODE'))
+
+    # foreign keys and indexes to recreate on the new parent
+    fkeys = conn.execute(text(
+        "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+        "WHERE conrelid = CAST(:t AS regclass) AND contype = 'f'"
+    ), {"t": table}).fetchall()
+    indexes = conn.execute(text(
+        "SELECT i.relname, pg_get_indexdef(i.oid) FROM pg_index x "
+        "JOIN pg_class i ON i.oid = x.indexrelid "
+        "WHERE x.indrelid = CAST(:t AS regclass) AND NOT x.indisprimary"
+    ), {"t": table}).fetchall()
+    pkey = conn.execute(text(
+        "SELECT conname FROM pg_constraint "
+        "WHERE conrelid = CAST(:t AS regclass) AND contype = 'p'"
+    ), {"t": table}).scalar()
+    sequence = conn.execute(text("SELECT pg_get_serial_sequence(:t, 'id')"), {"t": table}).scalar()
+
+    say(f"{table}: moving current table aside")
+    conn.execute(text(f'ALTER TABLE "{table}" RENAME TO "{old}"'))
+    if pkey:
+        conn.execute(text(f'ALTER TABLE "{old}" RENAME CONSTRAINT "{pkey}" TO "{old}_pkey"'))
+    for name, _ in indexes:
+        conn.execute(text(f'DROP INDEX "{name}"'))
+    if sequence:
+        # keep the id sequence alive when the old table is dropped
+        conn.execute(text(f"ALTER SEQUENCE {sequence} OWNED BY NONE"))
+
+    say(f"{table}: creating partitioned table")
+    conn.execute(text(
+        f'CREATE TABLE "{table}" (LIKE "{old}" INCLUDING DEFAULTS) PARTITION BY RANGE (date)'
+    ))
+    conn.execute(text(f'ALTER TABLE "{table}" ADD CONSTRAINT "{table}_pkey" PRIMARY KEY (id, date)'))
+    if sequence:
+        conn.execute(text(f'ALTER SEQUENCE {sequence} OWNED BY "{table}".id'))
+    for name, definition in fkeys:
+        conn.execute(text(f'ALTER TABLE "{table}" ADD CONSTRAINT "{name}" {definition}'))
+    for name, definition in indexes:
+        # pg_get_indexdef names the old (renamed) table
+        conn.execute(text(re.sub(rf" ON (\S+\.)?{old} ", f' ON "{table}" ', definition, count=1)))
+
+    conn.execute(text(f'CREATE TABLE "{table}_default" PARTITION OF "{table}" DEFAULT'))
+
+    lo, hi = conn.execute(text(f'SELECT MIN(date), MAX(date) FROM "{old}"')).first()
+    first = month_start(lo or date.today())
+    last = add_months(month_start(max(hi or date.today(), date.today())), months_ahead)
+    start, count = first, 0
+    while start <= last:
+        create_month_partition(conn, table, start)
+        start = add_months(start, 1)
+        count += 1
+    say(f"{table}: {count} monthly partitions ({first:%Y-%m} .. {last:%Y-%m})")
+
+    rows = conn.execute(text(f'INSERT INTO "{table}" SELECT * FROM "{old}"')).rowcount
+    say(f"{table}: copied {rows} rows")
+
+    conn.execute(text(f'DROP TABLE "{old}"'))
+    conn.execute(text(f'ANALYZE "{table}"'))
+    return True
@@ -0,0 +1,33 @@
+# website/process_pool.py
+"""
+Ordered, bounded fan-out of CPU-bound work (PDF rendering) to processes.
+
+imap_ordered() is like ProcessPoolExecutor.map, but keeps at most a few
+tasks per worker in flight, so a long input (a generator over a streamed
+query) is never materialized in full, and results come back in input
+order. With workers <= 1 the tasks run inline.
+"""
+
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+
+def imap_ordered(fn, tasks, workers=1, window=2):
+    """Yield fn(*task) for each tuple in `tasks`, in order."""
+    if workers <= 1:
+        for task in tasks:
+            yield fn(*task)
+        return
+
+    # forkserver: children start from a clean process, not a copy of this
+    # one with its open database connections and threads
+    context = multiprocessing.get_context("forkserver")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+        pending = deque()
+        for task in tasks:
+            pending.append(pool.submit(fn, *task))
+            if len(pending) >= workers * window:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
@@ -0,0 +1,167 @@
+# website/profiling.py
+
+import cProfile
+import os
+import sys
+import threading
+import uuid
+from collections import Counter
+from datetime import datetime
+
+from flask import current_app, g, request, url_for
+from flask_login import current_user
+
+from .roles import has_role
+
+# X-Profile: prof       -> deterministic cProfile, stored as .prof (pstats / snakeviz)
+# X-Profile: collapsed  -> sampling profiler, stored as collapsed stacks
+#                          (flamegraph.pl, speedscope, inferno)
+# The same values are accepted as a ?_profile=... query flag.
+PROFILE_MODES = ("prof", "collapsed")
+
+
+def init_profiler(app):
+    """
+    On-demand profiling of a single request, for admins only.
+
+    Config (env vars of the same name):
+    - PROFILE_DIR: where profiles are stored (default instance/profiles)
+    - PROFILE_SAMPLE_INTERVAL_MS: sampling interval for "collapsed" mode (default 5)
+    - PROFILE_MAX_FILES: newest profiles kept in PROFILE_DIR, older ones are
+      deleted (default 200)
+    """
+    app.config.setdefault(
+        "PROFILE_DIR",
+        os.getenv("PROFILE_DIR") or os.path.join(app.instance_path, "profiles"),
+    )
+    app.config.setdefault(
+        "PROFILE_SAMPLE_INTERVAL_MS",
+        float(os.getenv("PROFILE_SAMPLE_INTERVAL_MS", "5")),
+    )
+    app.config.setdefault("PROFILE_MAX_FILES", int(os.getenv("PROFILE_MAX_FILES", "200")))
+
+    app.before_request(_start_profile)
+    app.after_request(_finish_profile)
+    app.teardown_request(_abort_profile)
+
+
+def _requested_mode():
+    # cheap checks first: requests without the flag pay for one dict lookup
+    mode = request.environ.get("HTTP_X_PROFILE")
+    if mode is None:
+        if b"_profile=" not in request.query_string:
+            return None
+        mode = request.args.get("_profile")
+
+    mode = (mode or "").strip().lower()
+    if mode in ("1", "true"):
+        mode = "prof"
+    return mode if mode in PROFILE_MODES else None
+
+
+def _start_profile():
+    mode = _requested_mode()
+    if mode is None or not has_role(current_user, "admin"):
+        return
+
+    if mode == "prof":
+        profiler = cProfile.Profile()
+    else:
+        profiler = StackSampler(
+            threading.get_ident(),
+            current_app.config["PROFILE_SAMPLE_INTERVAL_MS"] / 1000,
+        )
+
+    g._profile = (mode, profiler)
+    profiler.enable()
+
+
+def _finish_profile(response):
+    active = g.pop("_profile", None)
+    if active is None:
+        return response
+
+    mode, profiler = active
+    profiler.disable()
+
+    profile_dir = current_app.config["PROFILE_DIR"]
+    os.makedirs(profile_dir, exist_ok=True)
+
+    endpoint = (request.endpoint or "unknown").replace(".", "_")
+    stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+    name = f"{stamp}-{endpoint}-{uuid.uuid4().hex[:8]}.{mode}"
+    path = os.path.join(profile_dir, name)
+
+    if mode == "prof":
+        profiler.dump_stats(path)
+    else:
+        with open(path, "w", encoding="utf-8") as fh:
+            fh.write(profiler.collapsed())
+    prune_profiles(profile_dir, current_app.config["PROFILE_MAX_FILES"])
+
+    response.headers["X-Profile-Id"] = name
+    response.headers["X-Profile-Url"] = url_for("views.profile_download", name=name)
+    return response
+
+
+def prune_profiles(profile_dir, keep):
+    """Delete all but the `keep` newest profiles in profile_dir."""
+    paths = [
+        os.path.join(profile_dir, name)
+        for name in os.listdir(profile_dir)
+        if name.endswith(tuple("." + m for m in PROFILE_MODES))
+    ]
+    if len(paths) <= keep:
+        return
+    paths.sort(key=os.path.getmtime, reverse=True)
+    for path in paths[keep:]:
+        try:
+            os.remove(path)
+        except OSError:
+            pass  # already removed by another worker
+
+
+def _abort_profile(exc=None):
+    # request failed before after_request ran: just stop profiling
+    active = g.pop("_profile", None)
+    if active is not None:
+        active[1].disable()
+
+
+class StackSampler:
+    """
+    Minimal sampling profiler: a background thread snapshots the stack of
+    the request thread every `interval` seconds and counts identical stacks.
+    """
+
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.counts = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def enable(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def disable(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                filename = os.path.basename(code.co_filename)
+                stack.append(f"{code.co_name} ({filename}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if stack:
+                self.counts[";".join(reversed(stack))] += 1
+
+    def collapsed(self):
+        return "".join(f"{stack} {count}\n" for stack, count in self.counts.most_common())
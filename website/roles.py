@@ -0,0 +1,37 @@
+# website/roles.py
+
+from functools import wraps
+
+from flask import abort
+from flask_login import current_user
+
+
+def has_role(user, *roles):
+    """True if `user` is logged in and user.role is in roles.
+    Falls back to attribute `is_admin` if `role` is not present."""
+    # ensure user is logged in
+    if not user or not user.is_authenticated:
+        return False
+
+    # prefer string role if model has it
+    user_role = getattr(user, "role", None)
+    if user_role is None:
+        # fallback to boolean is_admin property (older model):
+        # if 'admin' is required and user has is_admin True -> allow
+        return "admin" in roles and bool(getattr(user, "is_admin", False))
+
+    # if role exists, check it is allowed
+    return user_role in roles
+
+
+def roles_required(*roles):
+    """Decorator: require current_user.role to be in roles (see has_role).
+    Usage: @roles_required('admin') above a view function."""
+    def decorator(f):
+        @wraps(f)
+        def wrapped(*args, **kwargs):
+            if not has_role(current_user, *roles):
+                abort(403)
+            return f(*args, **kwargs)
+        return wrapped
+    return decorator
@@ -0,0 +1,259 @@
+# website/slow_queries.py
+
+import glob
+import json
+import logging
+import os
+import re
+import threading
+from datetime import datetime, timezone
+from logging.handlers import RotatingFileHandler
+from time import perf_counter
+
+from flask import has_request_context, request
+from sqlalchemy import event
+
+from . import db
+
+logger = logging.getLogger("website.slow_queries")
+
+# statements we are willing to EXPLAIN (EXPLAIN never executes them)
+EXPLAINABLE = ("select", "with", "update", "delete")
+
+# statements whose parameter values are never written, even with SLOW_QUERY_LOG_PARAMS
+SENSITIVE = re.compile(r"\buser\b|password", re.IGNORECASE)
+
+_handler_lock = threading.Lock()
+_handler_pid = None
+
+
+def init_slow_query_log(app):
+    """
+    Opt-in slow-query recorder.
+
+    Config (env vars of the same name):
+    - SLOW_QUERY_LOG: "1" to enable (default off)
+    - SLOW_QUERY_THRESHOLD_MS: statements slower than this are recorded (default 200)
+    - SLOW_QUERY_LOG_FILE: JSON-lines log (default instance/slow_queries.log);
+      each process writes and rotates its own <file>.<pid>
+    - SLOW_QUERY_EXPLAIN: "1" to capture the query plan (default on)
+    - SLOW_QUERY_LOG_PARAMS: "1" to log parameter values; by default only
+      their types and lengths are kept, and statements on the user table or
+      a password column never log values
+    """
+    app.config.setdefault("SLOW_QUERY_LOG", os.getenv("SLOW_QUERY_LOG", "0") == "1")
+    app.config.setdefault("SLOW_QUERY_THRESHOLD_MS", float(os.getenv("SLOW_QUERY_THRESHOLD_MS", "200")))
+    app.config.setdefault(
+        "SLOW_QUERY_LOG_FILE",
+        os.getenv("SLOW_QUERY_LOG_FILE") or os.path.join(app.instance_path, "slow_queries.log"),
+    )
+    app.config.setdefault("SLOW_QUERY_EXPLAIN", os.getenv("SLOW_QUERY_EXPLAIN", "1") == "1")
+    app.config.setdefault("SLOW_QUERY_LOG_PARAMS", os.getenv("SLOW_QUERY_LOG_PARAMS", "0") == "1")
+
+    if not app.config["SLOW_QUERY_LOG"]:
+        return
+
+    log_file = app.config["SLOW_QUERY_LOG_FILE"]
+    os.makedirs(os.path.dirname(log_file), exist_ok=True)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+    recorder = SlowQueryRecorder(
+        threshold=app.config["SLOW_QUERY_THRESHOLD_MS"] / 1000,
+        explain=app.config["SLOW_QUERY_EXPLAIN"],
+        log_params=app.config["SLOW_QUERY_LOG_PARAMS"],
+        log_file=log_file,
+    )
+
+    with app.app_context():
+        engine = db.engine
+
+    event.listen(engine, "before_cursor_execute", recorder.before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", recorder.after_cursor_execute)
+
+
+def _use_process_handler(log_file):
+    """
+    Point the logger at this process's own rotating file. Rotation renames
+    the file, which is not safe while other processes append to it, so
+    every gunicorn worker gets <log_file>.<pid>. Checked on each write: a
+    worker forked from a preloaded app must not keep its parent's file.
+    """
+    global _handler_pid
+    with _handler_lock:
+        if _handler_pid == os.getpid():
+            return
+        for old in list(logger.handlers):
+            logger.removeHandler(old)
+        handler = RotatingFileHandler(
+            f"{log_file}.{os.getpid()}", maxBytes=5 * 1024 * 1024, backupCount=5, delay=True,
+        )
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        logger.addHandler(handler)
+        _handler_pid = os.getpid()
+
+
+class SlowQueryRecorder:
+    def __init__(self, threshold, explain=True, log_params=False, log_file=None):
+        self.threshold = threshold
+        self.explain = explain
+        self.log_params = log_params
+        self.log_file = log_file
+
+    def before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context._slow_query_start = perf_counter()
+
+    def after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        start = getattr(context, "_slow_query_start", None)
+        if start is None:
+            return
+
+        elapsed = perf_counter() - start
+        if elapsed < self.threshold:
+            return
+
+        plan = None
+        if self.explain and not executemany:
+            plan = explain_statement(conn, statement, parameters)
+
+        if self.log_file:
+            _use_process_handler(self.log_file)
+        logger.info(json.dumps({
+            "ts": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "duration_ms": round(elapsed * 1000, 2),
+            "view": request.endpoint if has_request_context() else None,
+            "statement": statement,
+            "parameters": describe_parameters(statement, parameters, self.log_params),
+            "executemany": executemany,
+            "plan": plan,
+        }))
+
+
+def describe_parameters(statement, parameters, include_values=False):
+    """
+    Loggable form of a statement's parameters: the values themselves only
+    when `include_values` is set and the statement is not SENSITIVE,
+    otherwise just each value's type (and length for strings).
+    """
+    if include_values and not SENSITIVE.search(statement):
+        return _shorten(repr(parameters))
+    return _shorten(repr(_redact(parameters)))
+
+
+def _redact(value):
+    if isinstance(value, dict):
+        return {k: _redact(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return type(value)(_redact(v) for v in value)
+    if isinstance(value, (str, bytes)):
+        return _Placeholder(f"<{type(value).__name__}:{len(value)}>")
+    return _Placeholder(f"<{type(value).__name__}>")
+
+
+class _Placeholder(str):
+    def __repr__(self):
+        return str(self)
+
+
+def explain_statement(conn, statement, parameters):
+    """
+    Run EXPLAIN (Postgres) or EXPLAIN QUERY PLAN (SQLite) for a statement on
+    the same DBAPI connection, bypassing engine events. Returns a list of plan
+    lines, or None if the statement or dialect is not supported.
+    """
+    if not statement.lstrip().lower().startswith(EXPLAINABLE):
+        return None
+
+    dialect = conn.dialect.name
+    if dialect == "postgresql":
+        prefix = "EXPLAIN "
+    elif dialect == "sqlite":
+        prefix = "EXPLAIN QUERY PLAN "
+    else:
+        return None
+
+    cursor = conn.connection.cursor()
+    try:
+        # a failed EXPLAIN must not abort the caller's Postgres transaction
+        if dialect == "postgresql":
+            cursor.execute("SAVEPOINT slow_query_explain")
+        try:
+            cursor.execute(prefix + statement, parameters)
+            rows = cursor.fetchall()
+        except Exception as e:
+            if dialect == "postgresql":
+                cursor.execute("ROLLBACK TO SAVEPOINT slow_query_explain")
+            return [f"EXPLAIN failed: {e}"]
+        if dialect == "postgresql":
+            cursor.execute("RELEASE SAVEPOINT slow_query_explain")
+    except Exception as e:
+        return [f"EXPLAIN failed: {e}"]
+    finally:
+        cursor.close()
+
+    if dialect == "postgresql":
+        return [r[0] for r in rows]
+    # SQLite rows: (id, parent, notused, detail)
+    return [r[-1] for r in rows]
+
+
+def summarize_slow_queries(log_file, limit=50):
+    """
+    Read the slow-query logs of every process (including rotated files)
+    and group entries by statement. Returns a list of dicts ordered by
+    total time, worst first.
+    """
+    groups = {}
+
+    for path in sorted(glob.glob(log_file + "*")):
+        try:
+            with open(path, encoding="utf-8") as fh:
+                for line in fh:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue
+
+                    key = _normalize(entry.get("statement") or "")
+                    g = groups.get(key)
+                    if g is None:
+                        g = groups[key] = {
+                            "statement": key,
+                            "count": 0,
+                            "total_ms": 0.0,
+                            "max_ms": 0.0,
+                            "views": set(),
+                            "last_seen": None,
+                            "parameters": None,
+                            "plan": None,
+                        }
+
+                    duration = entry.get("duration_ms") or 0.0
+                    g["count"] += 1
+                    g["total_ms"] += duration
+                    if entry.get("view"):
+                        g["views"].add(entry["view"])
+                    if duration >= g["max_ms"]:
+                        # keep parameters and plan of the slowest execution
+                        g["max_ms"] = duration
+                        g["parameters"] = entry.get("parameters")
+                        g["plan"] = entry.get("plan")
+                    if not g["last_seen"] or (entry.get("ts") or "") > g["last_seen"]:
+                        g["last_seen"] = entry.get("ts")
+        except OSError:
+            continue
+
+    summary = sorted(groups.values(), key=lambda g: g["total_ms"], reverse=True)[:limit]
+    for g in summary:
+        g["avg_ms"] = g["total_ms"] / g["count"]
+        g["views"] = sorted(g["views"])
+    return summary
+
+
+def _normalize(statement):
+    return re.sub(r"\s+", " ", statement).strip()
+
+
+def _shorten(text, limit=1000):
+    return text if len(text) <= limit else text[:limit] + "..."
@@ -0,0 +1,103 @@
+# website/sqlite_profile.py
+"""
+Engine profile for SQLite, the fallback database of create_app() (small
+offices run on it) and the benchmarks' default.
+
+Every new connection of the app's engine gets these PRAGMAs (a "connect"
+listener on that engine, so it applies with or without an app context:
+pool refills on other threads, CLI helpers, benchmarks):
+
+- journal_mode=WAL: readers no longer block the writer or each other;
+  a commit appends to the -wal file instead of rewriting pages twice.
+- synchronous=NORMAL: with WAL, fsync at checkpoints instead of every
+  commit. A power cut can lose the last commits, never corrupt the file.
+- busy_timeout: a writer waits for the write lock instead of failing
+  with "database is locked" at once.
+- cache_size / mmap_size: a bigger page cache per connection, and reads
+  through a memory map instead of read() calls.
+- foreign_keys=ON: SQLite ignores the models' foreign keys otherwise.
+- temp_store=MEMORY: sorts and temp indexes stay off the disk.
+
+The pool keeps SQLITE_POOL_SIZE connections open, so the PRAGMAs and
+SQLite's schema parsing are paid once per connection, not per request.
+Size it to at least the gunicorn threads of one worker.
+
+WAL needs the database on a local filesystem (not NFS / SMB shares).
+SQLITE_PROFILE=0 keeps SQLite's defaults.
+"""
+
+import os
+
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+from . import db
+
+
+def init_sqlite(app):
+    """
+    Call before db.init_app(): the pool options must be in place when the
+    engine is created. attach_sqlite_pragmas() then hooks the engine.
+
+    Config (env vars of the same name):
+    - SQLITE_PROFILE: "1" to apply the profile (default), "0" to not
+    - SQLITE_BUSY_TIMEOUT_MS: wait for the write lock (default 5000)
+    - SQLITE_CACHE_KB: page cache per connection (default 32768)
+    - SQLITE_MMAP_BYTES: memory-mapped I/O size (default 256 MB)
+    - SQLITE_FOREIGN_KEYS: "1" to enforce foreign keys (default), "0" to not
+    - SQLITE_POOL_SIZE: connections kept open per process (default 8)
+    """
+    url = make_url(app.config["SQLALCHEMY_DATABASE_URI"])
+    if url.get_backend_name() != "sqlite":
+        return
+
+    app.config.setdefault("SQLITE_PROFILE", os.getenv("SQLITE_PROFILE", "1") == "1")
+    app.config.setdefault("SQLITE_BUSY_TIMEOUT_MS", int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000")))
+    app.config.setdefault("SQLITE_CACHE_KB", int(os.getenv("SQLITE_CACHE_KB", "32768")))
+    app.config.setdefault("SQLITE_MMAP_BYTES", int(os.getenv("SQLITE_MMAP_BYTES", str(256 * 1024 * 1024))))
+    app.config.setdefault("SQLITE_FOREIGN_KEYS", os.getenv("SQLITE_FOREIGN_KEYS", "1") == "1")
+    app.config.setdefault("SQLITE_POOL_SIZE", int(os.getenv("SQLITE_POOL_SIZE", "8")))
+
+    if not app.config["SQLITE_PROFILE"]:
+        return
+
+    in_memory = url.database in (None, "", ":memory:")
+    pragmas = [f"busy_timeout = {app.config['SQLITE_BUSY_TIMEOUT_MS']}"]
+    if not in_memory:
+        pragmas += ["journal_mode = WAL", f"mmap_size = {app.config['SQLITE_MMAP_BYTES']}"]
+    pragmas += [
+        "synchronous = NORMAL",
+        f"cache_size = -{app.config['SQLITE_CACHE_KB']}",
+        f"foreign_keys = {'ON' if app.config['SQLITE_FOREIGN_KEYS'] else 'OFF'}",
+        "temp_store = MEMORY",
+    ]
+    app.extensions["sqlite_pragmas"] = pragmas
+
+    if not in_memory:
+        # an in-memory database keeps Flask-SQLAlchemy's single static connection
+        options = app.config.setdefault("SQLALCHEMY_ENGINE_OPTIONS", {})
+        options.setdefault("pool_size", app.config["SQLITE_POOL_SIZE"])
+        options.setdefault("max_overflow", app.config["SQLITE_POOL_SIZE"])
+        # pooled connections move between gunicorn threads
+        options.setdefault("connect_args", {}).setdefault("check_same_thread", False)
+
+
+def attach_sqlite_pragmas(app):
+    """Call after db.init_app(): apply the profile's PRAGMAs to the app's SQLite engines."""
+    pragmas = app.extensions.get("sqlite_pragmas")
+    if not pragmas:
+        return
+    with app.app_context():
+        engines = list(db.engines.values())
+
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for pragma in pragmas:
+                cursor.execute(f"PRAGMA {pragma}")
+        finally:
+            cursor.close()
+
+    for engine in engines:
+        if engine.dialect.name == "sqlite":
+            event.listen(engine, "connect", set_pragmas)
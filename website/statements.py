@@ -0,0 +1,217 @@
+# website/statements.py
+"""
+Monthly customer statements.
+
+One query streams the month's Outgoing rows ordered by customer (joined
+with product and customer), so each customer's lines arrive together and
+are grouped on the fly. Groups are batched and rendered to PDF in worker
+processes (see process_pool.imap_ordered), and written either to a
+directory or into a ZIP, together with manifest.csv listing every
+statement with its customer, line count, total and file name.
+"""
+
+import csv
+import io
+import os
+import zipfile
+from datetime import date
+from decimal import Decimal
+from itertools import groupby
+
+from reportlab.lib.pagesizes import letter
+from reportlab.pdfgen import canvas
+from sqlalchemy import select
+
+from . import db
+from .models import Customer, Outgoing, Product
+from .process_pool import imap_ordered
+
+# statements rendered per worker task
+CHUNK_SIZE = 25
+
+MANIFEST_FIELDS = ["customer_id", "customer_name", "email", "lines", "total", "file"]
+
+
+def month_range(month):
+    """(first day, first day of the next month) for a date in the month."""
+    start = date(month.year, month.month, 1)
+    end = date(start.year + start.month // 12, start.month % 12 + 1, 1)
+    return start, end
+
+
+# --------------------------------------------------
+# DATA
+# --------------------------------------------------
+def statement_query(month, customer_id=None):
+    start, end = month_range(month)
+    stmt = (
+        select(
+            Customer.id, Customer.name, Customer.address, Customer.email, Customer.contact,
+            Outgoing.id, Outgoing.date, Outgoing.order_id, Product.name,
+            Outgoing.quantity, Outgoing.unit_price, Outgoing.line_total, Product.price,
+        )
+        .join(Customer, Customer.id == Outgoing.customer_id)
+        .join(Product, Product.id == Outgoing.product_id)
+        .where(Outgoing.date >= start, Outgoing.date < end)
+    )
+    if customer_id:
+        stmt = stmt.where(Outgoing.customer_id == customer_id)
+    return stmt.order_by(Outgoing.customer_id, Outgoing.date, Outgoing.id)
+
+
+def iter_statements(month, customer_id=None):
+    """Yield one plain, picklable dict per customer with outgoing rows in `month`."""
+    rows = db.session.execute(statement_query(month, customer_id).execution_options(yield_per=5000))
+    for (cid, name, address, email, contact), group in groupby(rows, key=lambda r: tuple(r[:5])):
+        lines = []
+        total = Decimal("0.00")
+        for row in group:
+            _, _, _, _, _, outgoing_id, day, order_id, product, quantity, unit_price, line_total, price = row
+            if unit_price is None:
+                # rows not yet backfilled with a price snapshot
+                unit_price = price if price is not None else Decimal("0.00")
+                line_total = unit_price * quantity
+            lines.append((day.isoformat(), outgoing_id, order_id, product, quantity, unit_price, line_total))
+            total += line_total
+        yield {
+            "month": f"{month:%Y-%m}",
+            "customer_id": cid,
+            "customer_name": name,
+            "customer_address": address,
+            "customer_email": email,
+            "customer_contact": contact,
+            "lines": lines,
+            "total": total,
+        }
+
+
+def statement_filename(data):
+    return f"statement_{data['month']}_{data['customer_id']}.pdf"
+
+
+# --------------------------------------------------
+# RENDERING (no database access)
+# --------------------------------------------------
+def render_statement(data):
+    """PDF bytes of one customer's statement."""
+    buffer = io.BytesIO()
+    c = canvas.Canvas(buffer, pagesize=letter)
+    width, height = letter
+
+    c.setFont("Helvetica-Bold", 16)
+    c.drawString(50, height - 50, f"Statement {data['month']}")
+
+    y = height - 90
+    c.setFont("Helvetica", 11)
+    c.drawString(50, y, data["customer_name"])
+    y -= 15
+    for value in (data["customer_address"], data["customer_email"], data["customer_contact"]):
+        if value:
+            c.drawString(50, y, value)
+            y -= 15
+    y -= 15
+
+    def titles(y):
+        c.setFont("Helvetica-Bold", 10)
+        for x, title in ((50, "Date"), (120, "Ref"), (180, "Order"), (230, "Product")):
+            c.drawString(x, y, title)
+        for x, title in ((420, "Qty"), (490, "Unit Price"), (560, "Total")):
+            c.drawRightString(x, y, title)
+        c.setFont("Helvetica", 10)
+        return y - 18
+
+    y = titles(y)
+    for day, outgoing_id, order_id, product, quantity, unit_price, line_total in data["lines"]:
+        if y < 70:
+            c.showPage()
+            c.setFont("Helvetica", 10)
+            c.drawString(50, height - 50, f"Statement {data['month']} - {data['customer_name']} (continued)")
+            y = titles(height - 80)
+        c.drawString(50, y, day)
+        c.drawString(120, y, str(outgoing_id))
+        c.drawString(180, y, str(order_id) if order_id else "")
+        c.drawString(230, y, product[:32])
+        c.drawRightString(420, y, str(quantity))
+        c.drawRightString(490, y, f"{unit_price:.2f}")
+        c.drawRightString(560, y, f"{line_total:.2f}")
+        y -= 15
+
+    c.setFont("Helvetica-Bold", 12)
+    c.drawRightString(560, y - 15, f"Total for {data['month']}: {data['total']:.2f}")
+
+    c.showPage()
+    c.save()
+    return buffer.getvalue()
+
+
+def _render_chunk(chunk):
+    # runs in a worker process
+    return [(statement_filename(data), render_statement(data)) for data in chunk]
+
+
+# --------------------------------------------------
+# OUTPUT
+# --------------------------------------------------
+def _chunks(statements, manifest):
+    chunk = []
+    for data in statements:
+        manifest.append({
+            "customer_id": data["customer_id"],
+            "customer_name": data["customer_name"],
+            "email": data["customer_email"] or "",
+            "lines": len(data["lines"]),
+            "total": f"{data['total']:.2f}",
+            "file": statement_filename(data),
+        })
+        chunk.append(data)
+        if len(chunk) == CHUNK_SIZE:
+            yield (chunk,)
+            chunk = []
+    if chunk:
+        yield (chunk,)
+
+
+def _manifest_csv(manifest):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=MANIFEST_FIELDS)
+    writer.writeheader()
+    writer.writerows(manifest)
+    return buffer.getvalue()
+
+
+def _progress(say, done, count):
+    if (done + count) // 1000 > done // 1000:
+        say(f"  {done + count} statement(s) rendered")
+    return done + count
+
+
+def write_statements(statements, output, workers=1, echo=None):
+    """
+    Render `statements` (from iter_statements) into `output`: a directory,
+    or a ZIP file if the path ends in .zip. Returns the manifest rows.
+    """
+    say = echo or (lambda msg: None)
+    manifest = []
+    results = imap_ordered(_render_chunk, _chunks(statements, manifest), workers)
+    done = 0
+
+    if output.lower().endswith(".zip"):
+        tmp = output + ".tmp"
+        with zipfile.ZipFile(tmp, "w", compression=zipfile.ZIP_STORED) as zf:
+            for rendered in results:
+                for name, pdf in rendered:
+                    zf.writestr(name, pdf)
+                done = _progress(say, done, len(rendered))
+            zf.writestr("manifest.csv", _manifest_csv(manifest))
+        os.replace(tmp, output)
+        return manifest
+
+    os.makedirs(output, exist_ok=True)
+    for rendered in results:
+        for name, pdf in rendered:
+            with open(os.path.join(output, name), "wb") as fh:
+                fh.write(pdf)
+        done = _progress(say, done, len(rendered))
+    with open(os.path.join(output, "manifest.csv"), "w", newline="", encoding="utf-8") as fh:
+        fh.write(_manifest_csv(manifest))
+    return manifest
@@ -25,6 +25,29 @@ function refreshCaptcha() {
   img.src = baseUrl + '?t=' + Date.now(); // cache-buster
 }
 
+// Bulk actions on the admin lists: the [data-bulk-all] header checkbox
+// toggles the row checkboxes of its table; bulk forms confirm first
+document.addEventListener("change", (event) => {
+  const all = event.target.closest("[data-bulk-all]");
+  if (!all) return;
+  all.closest("table").querySelectorAll("input[name='ids']").forEach((box) => {
+    box.checked = all.checked;
+  });
+});
+
+function confirmBulk(form) {
+  const scope = form.querySelector("[name='scope']");
+  if (scope && scope.value === "all") {
+    return confirm(`Apply to all ${scope.dataset.total} matching rows?`);
+  }
+  const checked = document.querySelectorAll(`input[name='ids'][form='${form.id}']:checked`).length;
+  if (!checked) {
+    alert("Select at least one row first.");
+    return false;
+  }
+  return confirm(`Apply to ${checked} selected row(s)?`);
+}
+
 const sidebar = document.querySelector(".admin-sidebar");
 const overlay = document.createElement("div");
 overlay.classList.add("sidebar-overlay");
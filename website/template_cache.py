@@ -0,0 +1,63 @@
+# website/template_cache.py
+"""
+Jinja bytecode cache for faster cold starts.
+
+Compiling a template (parse, generate Python source, compile()) is the
+bulk of the first render of a page in a fresh worker; base_admin.html and
+the big admin lists take milliseconds each. With a FileSystemBytecodeCache
+the compiled code is stored in TEMPLATE_CACHE_DIR and the next worker,
+or the next deploy of the same templates, loads it with marshal instead.
+
+Entries are keyed by template name and checked against a hash of the
+source, so an edited template is recompiled and never served stale.
+Writes go to a temp file renamed into place, so gunicorn workers can
+share the directory.
+
+`flask precompile-templates` compiles every template into the cache; the
+Docker build runs it, so even the first worker after a deploy starts warm.
+"""
+
+import os
+
+from jinja2 import FileSystemBytecodeCache, TemplateSyntaxError
+
+
+def init_template_cache(app):
+    """
+    Config (env vars of the same name):
+    - TEMPLATE_CACHE: "1" to cache compiled templates (default), "0" to not
+    - TEMPLATE_CACHE_DIR: cache directory (default instance/jinja_cache)
+    """
+    app.config.setdefault("TEMPLATE_CACHE", os.getenv("TEMPLATE_CACHE", "1") == "1")
+    app.config.setdefault(
+        "TEMPLATE_CACHE_DIR",
+        os.getenv("TEMPLATE_CACHE_DIR") or os.path.join(app.instance_path, "jinja_cache"),
+    )
+    if not app.config["TEMPLATE_CACHE"]:
+        return
+
+    os.makedirs(app.config["TEMPLATE_CACHE_DIR"], exist_ok=True)
+    app.jinja_env.bytecode_cache = FileSystemBytecodeCache(app.config["TEMPLATE_CACHE_DIR"])
+
+
+def precompile_templates(app, clear=False):
+    """
+    Compile every template of the app (and its blueprints) into the
+    bytecode cache. Returns (compiled names, {name: error message}).
+    """
+    env = app.jinja_env
+    if env.bytecode_cache is None:
+        raise RuntimeError("The template cache is disabled (TEMPLATE_CACHE=0).")
+    if clear:
+        env.bytecode_cache.clear()
+
+    compiled, errors = [], {}
+    for name in env.list_templates(extensions=["html", "txt", "xml"]):
+        try:
+            # get_template compiles the source and stores the bytecode
+            env.get_template(name)
+        except TemplateSyntaxError as e:
+            errors[name] = f"line {e.lineno}: {e.message}"
+        else:
+            compiled.append(name)
+    return compiled, errors
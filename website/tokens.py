@@ -1,5 +1,7 @@
 # website/tokens.py
 
+import hashlib
+
 from itsdangerous import URLSafeTimedSerializer
 from flask import current_app
 
@@ -24,3 +26,54 @@ def verify_reset_token(token, expiration=3600):
     except Exception:
         return None
     return email
+
+
+def _password_fingerprint(user):
+    # changing the password invalidates the user's API tokens
+    return hashlib.sha256((user.password or "").encode("utf-8")).hexdigest()[:16]
+
+
+def generate_api_token(user):
+    s = URLSafeTimedSerializer(current_app.config['SECRET_KEY'])
+    return s.dumps({"id": user.id, "pw": _password_fingerprint(user)}, salt="api-token")
+
+
+def verify_api_token(token, expiration):
+    """
+    expiration: seconds
+    Returns the User if the token is valid, otherwise None.
+    """
+    from .models import User
+
+    s = URLSafeTimedSerializer(current_app.config['SECRET_KEY'])
+    try:
+        data = s.loads(token, salt="api-token", max_age=expiration)
+        user = User.query.get(int(data["id"]))
+    except Exception:
+        return None
+    if user is None or data.get("pw") != _password_fingerprint(user):
+        return None
+    return user
+
+
+def generate_export_token(export, watermark):
+    """Continuation token of a delta export: where the next delta of `export` starts."""
+    s = URLSafeTimedSerializer(current_app.config['SECRET_KEY'])
+    return s.dumps({"e": export, "since": watermark.isoformat()}, salt="export-since")
+
+
+def verify_export_token(token, export):
+    """
+    Returns the token's watermark (an aware datetime) if it is a valid
+    token of `export`, otherwise None. Tokens don't expire.
+    """
+    from datetime import datetime
+
+    s = URLSafeTimedSerializer(current_app.config['SECRET_KEY'])
+    try:
+        data = s.loads(token, salt="export-since")
+        if data["e"] != export:
+            return None
+        return datetime.fromisoformat(data["since"])
+    except Exception:
+        return None
@@ -0,0 +1,154 @@
+# website/uploads.py
+"""
+Size limits and content checks for uploaded files.
+
+MAX_CONTENT_LENGTH caps every request body. Views that take a file lower
+it further with @upload_limit(<config key>): the limit is set on the
+request before its body is read, so an oversized upload is refused from
+its Content-Length (or as soon as the stream passes the limit) with a
+413, shown to the browser as a flash message. Werkzeug already spools
+file parts over 500 KB to temporary files while parsing, so uploads
+within the limits never sit in worker memory as a whole.
+
+The content of a file is checked against its extension from its first
+bytes (sniff()) before any parser sees it: a zip container for the
+xlsx family, an OLE2 compound file for .xls, PNG / JPEG / GIF magic for
+images. Parsers get file handles, never the bytes: openpyxl reads the
+spooled file directly, xlrd gets an mmap of it, Pillow opens the stream.
+"""
+
+import io
+import mmap
+import os
+import uuid
+from functools import wraps
+
+from flask import current_app, flash, jsonify, redirect, request, url_for
+from PIL import Image, UnidentifiedImageError
+from werkzeug.exceptions import RequestEntityTooLarge
+
+IMAGE_EXTENSIONS = {"png", "jpg", "jpeg", "gif"}
+
+# first bytes of each container, by the kind sniff() reports
+SIGNATURES = {
+    "zip": (b"PK\x03\x04",),
+    "ole": (b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1",),
+    "png": (b"\x89PNG\r\n\x1a\n",),
+    "jpeg": (b"\xff\xd8\xff",),
+    "gif": (b"GIF87a", b"GIF89a"),
+}
+
+# the kind a file with each extension must sniff as
+EXPECTED = {
+    "xlsx": "zip", "xlsm": "zip", "xltx": "zip", "xltm": "zip",
+    "xls": "ole",
+    "png": "png", "jpg": "jpeg", "jpeg": "jpeg", "gif": "gif",
+}
+
+PILLOW_FORMATS = {"png": "PNG", "jpeg": "JPEG", "gif": "GIF"}
+
+
+class UploadError(ValueError):
+    """An uploaded file that is refused; the message is shown to the user."""
+
+
+def init_uploads(app):
+    """
+    Config (env vars of the same name):
+    - MAX_CONTENT_LENGTH: bytes, any request body (default 32 MB)
+    - IMPORT_MAX_BYTES: bytes, spreadsheet uploads (default 16 MB)
+    - IMAGE_MAX_BYTES: bytes, product images (default 5 MB)
+    - UPLOAD_FOLDER: where product images are stored (default static/uploads)
+    """
+    mb = 1024 * 1024
+    if app.config.get("MAX_CONTENT_LENGTH") is None:
+        # Flask's own default is None (unlimited), so setdefault would not apply
+        app.config["MAX_CONTENT_LENGTH"] = int(os.getenv("MAX_CONTENT_LENGTH", str(32 * mb)))
+    app.config.setdefault("IMPORT_MAX_BYTES", int(os.getenv("IMPORT_MAX_BYTES", str(16 * mb))))
+    app.config.setdefault("IMAGE_MAX_BYTES", int(os.getenv("IMAGE_MAX_BYTES", str(5 * mb))))
+    app.config.setdefault(
+        "UPLOAD_FOLDER", os.getenv("UPLOAD_FOLDER", os.path.join(app.static_folder, "uploads"))
+    )
+    os.makedirs(app.config["UPLOAD_FOLDER"], exist_ok=True)
+    app.register_error_handler(RequestEntityTooLarge, _too_large)
+
+
+def _too_large(e):
+    limit = request.max_content_length
+    size = f"{limit // (1024 * 1024)} MB" if limit >= 1024 * 1024 else f"{limit // 1024} KB"
+    message = f"The upload is too large (at most {size})."
+    if request.path.startswith("/api/"):
+        return jsonify(error=message), 413
+    flash(message, "error")
+    return redirect(request.referrer or url_for("views.home"))
+
+
+def upload_limit(config_key):
+    """Cap this view's request body at app.config[config_key] bytes."""
+    def decorator(f):
+        @wraps(f)
+        def wrapped(*args, **kwargs):
+            request.max_content_length = min(
+                current_app.config[config_key], current_app.config["MAX_CONTENT_LENGTH"]
+            )
+            return f(*args, **kwargs)
+        return wrapped
+    return decorator
+
+
+# --------------------------------------------------
+# CONTENT CHECKS
+# --------------------------------------------------
+def sniff(stream):
+    """The kind of file ("zip", "ole", "png", ...) from its first bytes, or None."""
+    start = stream.tell()
+    head = stream.read(8)
+    stream.seek(start)
+    for kind, signatures in SIGNATURES.items():
+        if head.startswith(signatures):
+            return kind
+    return None
+
+
+def matches_extension(stream, ext):
+    return EXPECTED.get(ext) is not None and sniff(stream) == EXPECTED[ext]
+
+
+def file_contents(stream):
+    """A read-only mmap of a file-backed stream (bytes for in-memory ones), for xlrd."""
+    try:
+        fd = stream.fileno()
+    except (AttributeError, OSError, io.UnsupportedOperation):
+        return stream.read()
+    return mmap.mmap(fd, 0, access=mmap.ACCESS_READ)
+
+
+def extension(filename):
+    return filename.rsplit(".", 1)[-1].lower() if "." in filename else ""
+
+
+def save_image(file):
+    """
+    Check an uploaded product image and store it in UPLOAD_FOLDER under a
+    new unique name, which is returned. Raises UploadError.
+    """
+    ext = extension(file.filename)
+    if ext not in IMAGE_EXTENSIONS:
+        raise UploadError("Invalid image type. Allowed: png, jpg, jpeg, gif")
+    kind = sniff(file.stream)
+    if kind != EXPECTED[ext]:
+        raise UploadError("The file is not a valid image.")
+    try:
+        # Pillow reads the header from the stream; verify() checks the rest
+        # without decoding the pixels
+        with Image.open(file.stream) as img:
+            if img.format != PILLOW_FORMATS[kind]:
+                raise UploadError("The file is not a valid image.")
+            img.verify()
+    except (UnidentifiedImageError, OSError, SyntaxError, Image.DecompressionBombError):
+        raise UploadError("The file is not a valid image.")
+    file.stream.seek(0)
+
+    filename = f"{uuid.uuid4().hex}.{ext}"
+    file.save(os.path.join(current_app.config["UPLOAD_FOLDER"], filename))
+    return filename
@@ -0,0 +1,224 @@
+# website/versioning.py
+"""
+Per-table change versions and conditional GET.
+
+Every flush that inserts, updates or deletes rows of a table bumps that
+table's row in `table_version`, and so do ORM bulk UPDATE / DELETE
+statements. The tables are collected on the session and bumped in
+before_commit, in the same transaction: the row locks of the bump are
+held for the commit only, so writers to one table do not queue behind
+each other's open transactions. The @conditional(...) decorator reads the
+versions of the tables a view depends on with one small query, derives a
+strong ETag and Last-Modified from them, and answers a matching
+If-None-Match / If-Modified-Since with 304 before the view runs.
+
+Statements issued as raw SQL (text()) do not bump versions.
+"""
+
+import hashlib
+import math
+import os
+import time
+from email.utils import format_datetime, parsedate_to_datetime
+from datetime import datetime, timezone
+from functools import wraps
+
+from flask import current_app, make_response, request, session
+from flask_login import current_user
+from sqlalchemy import bindparam, event, select, text, update
+from sqlalchemy.orm import Session
+
+from . import db
+from .models import TableVersion
+
+_listening = False
+
+
+def init_versioning(app):
+    """
+    Config (env vars of the same name):
+    - CONDITIONAL_GET: "1" to answer 304s (default), "0" to always render
+    """
+    global _listening
+    app.config.setdefault("CONDITIONAL_GET", os.getenv("CONDITIONAL_GET", "1") == "1")
+    app.extensions["versioning_fingerprint"] = _code_fingerprint(app)
+
+    if not _listening:
+        event.listen(Session, "after_flush", _after_flush)
+        event.listen(Session, "do_orm_execute", _after_bulk)
+        event.listen(Session, "before_commit", _before_commit)
+        event.listen(Session, "after_transaction_end", _after_transaction_end)
+        _listening = True
+
+
+def _code_fingerprint(app):
+    # templates and views change with a deploy: old ETags must not match then
+    digest = hashlib.sha1()
+    package = os.path.dirname(os.path.abspath(__file__))
+    for folder, _, files in sorted(os.walk(package)):
+        for name in sorted(files):
+            if name.endswith((".py", ".html")):
+                stat = os.stat(os.path.join(folder, name))
+                digest.update(f"{name}:{stat.st_mtime_ns}:{stat.st_size}".encode())
+    return digest.hexdigest()[:12]
+
+
+# --------------------------------------------------
+# BUMPING
+# --------------------------------------------------
+def bump_tables(connection, tables):
+    """Increment the version of each table (creating missing rows)."""
+    tables = sorted(set(tables) - {TableVersion.__tablename__})
+    if not tables:
+        return
+
+    now = time.time()
+    stmt = (
+        update(TableVersion)
+        .where(TableVersion.table_name.in_(bindparam("names", expanding=True)))
+        .values(version=TableVersion.version + 1, changed_at=now)
+    )
+    result = connection.execute(stmt, {"names": tables})
+    if result.rowcount == len(tables):
+        return
+
+    existing = set(connection.scalars(
+        select(TableVersion.table_name).where(TableVersion.table_name.in_(tables))
+    ))
+    for name in tables:
+        if name not in existing:
+            connection.execute(
+                text(
+                    "INSERT INTO table_version (table_name, version, changed_at) "
+                    "VALUES (:t, 1, :now) ON CONFLICT (table_name) DO NOTHING"
+                ),
+                {"t": name, "now": now},
+            )
+
+
+def _after_flush(session, flush_context):
+    tables = set()
+    for obj in session.new | session.deleted:
+        tables.add(obj.__table__.name)
+    for obj in session.dirty:
+        if session.is_modified(obj, include_collections=False):
+            tables.add(obj.__table__.name)
+    if tables:
+        session.info.setdefault("bumped_tables", set()).update(tables)
+
+
+def _after_bulk(orm_execute_state):
+    if not (orm_execute_state.is_update or orm_execute_state.is_delete or orm_execute_state.is_insert):
+        return
+    mapper = orm_execute_state.bind_mapper
+    if mapper is None:
+        return
+    table = mapper.local_table.name
+    if table != TableVersion.__tablename__:
+        orm_execute_state.session.info.setdefault("bumped_tables", set()).add(table)
+
+
+def _before_commit(session):
+    # Session.commit() runs this hook before its own final flush
+    session.flush()
+    tables = session.info.pop("bumped_tables", None)
+    if tables:
+        bump_tables(session.connection(), tables)
+
+
+def _after_transaction_end(session, transaction):
+    if transaction.parent is None:
+        session.info.pop("bumped_tables", None)
+
+
+def read_versions(tables):
+    """{table: (version, changed_at)} in one query; missing tables are (0, 0)."""
+    rows = db.session.execute(
+        select(TableVersion.table_name, TableVersion.version, TableVersion.changed_at)
+        .where(TableVersion.table_name.in_(tables))
+    )
+    versions = {name: (0, 0.0) for name in tables}
+    for name, version, changed_at in rows:
+        versions[name] = (version, changed_at or 0.0)
+    return versions
+
+
+# --------------------------------------------------
+# CONDITIONAL GET
+# --------------------------------------------------
+def conditional(*tables):
+    """
+    Decorator for GET views whose output depends only on the request
+    arguments, the current user and the rows of `tables`.
+    The user table is always included, as every page shows the user's name.
+    """
+    tables = tuple(sorted(set(tables) | {"user"}))
+
+    def decorator(f):
+        @wraps(f)
+        def wrapped(*args, **kwargs):
+            if request.method not in ("GET", "HEAD") or not current_app.config["CONDITIONAL_GET"]:
+                return f(*args, **kwargs)
+
+            # a pending flash message is rendered once: never cache that page
+            if session.get("_flashes"):
+                return f(*args, **kwargs)
+
+            versions = read_versions(tables)
+            etag = _etag(versions, kwargs)
+            last_modified = _last_modified(max(c for _, c in versions.values()))
+
+            if _not_modified(etag, last_modified):
+                response = current_app.response_class(status=304)
+            else:
+                response = make_response(f(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+
+            response.set_etag(etag)
+            if last_modified:
+                response.headers["Last-Modified"] = format_datetime(last_modified, usegmt=True)
+            # always revalidate; private: pages differ per user
+            response.headers["Cache-Control"] = "private, no-cache"
+            return response
+        return wrapped
+    return decorator
+
+
+def _etag(versions, view_args):
+    user_id = current_user.get_id() if current_user.is_authenticated else ""
+    role = getattr(current_user, "role", "") or ""
+    parts = [
+        current_app.extensions["versioning_fingerprint"],
+        request.endpoint or "",
+        repr(sorted(view_args.items())),
+        repr(sorted(request.args.items(multi=True))),
+        f"{user_id}:{role}",
+    ]
+    parts += [f"{name}={version}@{changed_at}" for name, (version, changed_at) in sorted(versions.items())]
+    return hashlib.sha1("|".join(parts).encode("utf-8")).hexdigest()
+
+
+def _last_modified(changed_at):
+    # the header has whole seconds: round up, and leave it out until that
+    # second is over, as a later write in the same second would map to the
+    # same value and a client holding it would get a wrong 304
+    if not changed_at:
+        return None
+    seconds = math.ceil(changed_at)
+    if seconds > time.time():
+        return None
+    return datetime.fromtimestamp(seconds, tz=timezone.utc)
+
+
+def _not_modified(etag, last_modified):
+    if request.if_none_match:
+        # strong comparison, per RFC 9110 If-None-Match takes precedence
+        return request.if_none_match.contains(etag)
+    since = request.headers.get("If-Modified-Since")
+    if since and last_modified:
+        try:
+            return last_modified <= parsedate_to_datetime(since)
+        except (TypeError, ValueError):
+            return False
+    return False
@@ -2,65 +2,46 @@ from flask import (
     Blueprint, render_template,
       request, flash, redirect,
         url_for, abort, current_app,
-          send_file )
+          send_file, send_from_directory )
 from flask_login import login_required, current_user
 from io import BytesIO
 import openpyxl
-from reportlab.lib.pagesizes import letter
-from reportlab.pdfgen import canvas
 from decimal import Decimal
 from . import db
 from .models import Device, User, Customer, Category, Product, Supplier  # add User if not imported
 from flask import abort
 import os
-from werkzeug.utils import secure_filename
-import uuid
-import xlrd
 import pandas as pd
-from sqlalchemy import or_
+from sqlalchemy import func, or_, select
+from sqlalchemy.orm import joinedload, selectinload
 from datetime import datetime
-from .models import User, Product, Customer, Outgoing, Purchase
+from .models import User, Product, Customer, Outgoing, Purchase, SalesOrder
 import io
+import tempfile
 from werkzeug.security import generate_password_hash
 from website.models import User, Product, Customer, Supplier, Device
 
-from functools import wraps
-
-def roles_required(*roles):
-    """Decorator: require current_user.role to be in roles.
-    Falls back to attribute `is_admin` if `role` is not present.
-    Usage: @roles_required('admin') above a view function."""
-    def decorator(f):
-        @wraps(f)
-        def wrapped(*args, **kwargs):
-            # ensure user is logged in
-            if not current_user or not current_user.is_authenticated:
-                abort(403)
-
-            # prefer string role if model has it
-            user_role = getattr(current_user, "role", None)
-            if user_role is None:
-                # fallback to boolean is_admin property (older model)
-                is_admin_flag = getattr(current_user, "is_admin", False)
-                # if 'admin' is required and user has is_admin True -> allow
-                if "admin" in roles and is_admin_flag:
-                    return f(*args, **kwargs)
-                # otherwise not allowed
-                abort(403)
-
-            # if role exists, check it is allowed
-            if user_role not in roles:
-                abort(403)
-
-            return f(*args, **kwargs)
-        return wrapped
-    return decorator
+from .metrics import record_rows
+from .slow_queries import summarize_slow_queries
+from .roles import roles_required
+from .archive import load_archived
+from .versioning import conditional
+from .export_cache import cached_export
+from .delta import changed_since, delta_export, export_since
+from .pdf_reports import Column, spooled_report
+from . import bulk, importers
+from .uploads import UploadError, save_image, upload_limit
+from .invoices import (
+    invoice_data, invoice_filename, invoice_query, load_invoice_data,
+    order_invoice_data, render_invoice, write_invoice_batch,
+)
 
 views = Blueprint('views', __name__)
 
 
 @views.route('/', methods=['GET', 'POST'])
 @login_required
+@conditional("category", "product", "customer", "supplier", "outgoing")
 def home():
     # only admins should see the admin dashboard (optional)
     # if not current_user.is_admin:
@@ -85,6 +66,7 @@ def home():
 
 @views.route("/admin/categories", methods=["GET", "POST"])
 @login_required
+@conditional("category")
 def category_list():
     if not current_user.is_admin:
         abort(403)
@@ -149,6 +131,7 @@ def delete_category(category_id):
 
 @views.route("/admin/products", methods=["GET"])
 @login_required
+@conditional("product", "category")
 def product_list():
     if not current_user.is_admin:
         abort(403)
@@ -159,15 +142,7 @@ def product_list():
     search = request.args.get("q", "", type=str).strip()
     category_id = request.args.get("category_id", type=int)
 
-    query = Product.query
-
-    # Apply search (by name)
-    if search:
-        query = query.filter(Product.name.ilike(f"%{search}%"))
-
-    # Apply category filter
-    if category_id:
-        query = query.filter(Product.category_id == category_id)
+    query = _product_query(search, category_id)
 
     # Pagination
     pagination = query.order_by(Product.id).paginate(
@@ -192,8 +167,35 @@ def product_list():
     )
 
 
+def _product_query(search, category_id):
+    query = Product.query
+
+    # Apply search (by name)
+    if search:
+        query = query.filter(Product.name.ilike(f"%{search}%"))
+
+    # Apply category filter
+    if category_id:
+        query = query.filter(Product.category_id == category_id)
+
+    return query
+
+
+def _bulk_selection(query, id_column):
+    """
+    What a bulk action applies to: the ids of the checked rows, or with
+    scope=all every row `query` (the list's search) matches, as a subquery.
+    """
+    if request.form.get("scope") == "all":
+        # correlate(None): used inside UPDATE / DELETE of the same table,
+        # the subquery must keep its own FROM
+        return query.with_entities(id_column).order_by(None).statement.correlate(None)
+    return request.form.getlist("ids", type=int)
+
+
 @views.route("/admin/products/new", methods=["GET", "POST"])
 @login_required
+@upload_limit("IMAGE_MAX_BYTES")
 def product_create():
     if not current_user.is_admin:
         abort(403)
@@ -268,17 +270,11 @@ def product_create():
         filename = None
 
         if file and file.filename != "":
-            if current_app.allowed_file(file.filename):
-                original = secure_filename(file.filename)
-                ext = original.rsplit(".", 1)[1].lower()
-
-                # unique filename
-                filename = f"{uuid.uuid4().hex}.{ext}"
-
-                save_path = os.path.join(current_app.config["UPLOAD_FOLDER"], filename)
-                file.save(save_path)
-            else:
-                flash("Invalid image type. Allowed: png, jpg, jpeg, gif", "error")
+            try:
+                # checked, then stored under a unique filename
+                filename = save_image(file)
+            except UploadError as e:
+                flash(str(e), "error")
                 return redirect(request.url)
 
         # ---------------------------------------------
@@ -308,6 +304,7 @@ def product_create():
 
 @views.route("/admin/products/<int:product_id>/edit", methods=["POST"])
 @login_required
+@upload_limit("IMAGE_MAX_BYTES")
 def product_edit(product_id):
     if not current_user.is_admin:
         abort(403)
@@ -353,12 +350,10 @@ def product_edit(product_id):
     filename = product.image_filename  # keep old image if none uploaded
 
     if file and file.filename != "":
-        if current_app.allowed_file(file.filename):
-            filename = secure_filename(file.filename)
-            save_path = os.path.join(current_app.config["UPLOAD_FOLDER"], filename)
-            file.save(save_path)
-        else:
-            flash("Invalid image file type!", "error")
+        try:
+            filename = save_image(file)
+        except UploadError as e:
+            flash(str(e), "error")
             return redirect(url_for("views.product_list"))
 
     # If errors → show flash messages
@@ -391,8 +386,72 @@ def product_delete(product_id):
     flash("Product deleted.", "success")
     return redirect(url_for("views.product_list"))
 
+
+@views.route("/admin/products/bulk", methods=["POST"])
+@login_required
+@roles_required('admin')
+def product_bulk():
+    """Delete the selected products, or move them to another category."""
+    action = request.form.get("action")
+    query = _product_query(
+        (request.form.get("q") or "").strip(), request.form.get("category_id", type=int)
+    )
+    selection = _bulk_selection(query, Product.id)
+    back = url_for("views.product_list")
+
+    if selection == []:
+        flash("No products selected.", "error")
+        return redirect(back)
+
+    if action == "delete":
+        counts = bulk.delete_products(selection)
+        verb = "Deleted"
+    elif action == "set_category":
+        category = Category.query.get(request.form.get("target_category_id", type=int) or 0)
+        if not category:
+            flash("Selected category does not exist.", "error")
+            return redirect(back)
+        counts = bulk.set_product_category(selection, category.id)
+        verb = f"Moved to {category.name}:"
+    else:
+        abort(400)
+
+    db.session.commit()
+    flash(bulk.summary(verb, counts), "success")
+    return redirect(back)
+
+
+@views.route("/admin/products/adjust-prices", methods=["POST"])
+@login_required
+@roles_required('admin')
+def product_adjust_prices():
+    """Raise or lower every price in a category by a percentage."""
+    category = Category.query.get(request.form.get("category_id", type=int) or 0)
+    percent_raw = (request.form.get("percent") or "").strip()
+
+    errors = []
+    if not category:
+        errors.append("Selected category does not exist.")
+    try:
+        percent = Decimal(percent_raw)
+        if not percent.is_finite() or percent <= -100 or percent > 1000:
+            errors.append("Percentage must be above -100 and at most 1000.")
+    except ArithmeticError:
+        errors.append("Invalid percentage.")
+
+    if errors:
+        for e in errors:
+            flash(e, "error")
+        return redirect(url_for("views.product_list"))
+
+    counts = bulk.adjust_prices(category.id, percent)
+    db.session.commit()
+    flash(bulk.summary(f"Prices in {category.name} changed by {percent}%:", counts), "success")
+    return redirect(url_for("views.product_list", category_id=category.id))
+
 @views.route("/admin/products/import", methods=["POST"])
 @login_required
+@upload_limit("IMPORT_MAX_BYTES")
 def product_import():
     if not current_user.is_admin:
         abort(403)
@@ -407,157 +466,24 @@ def product_import():
     ext = filename.rsplit(".", 1)[-1].lower()
 
     # Allowed Excel extensions
-    allowed_exts = {"xlsx", "xlsm", "xltx", "xltm", "xls"}
-    if ext not in allowed_exts:
+    if ext not in importers.EXCEL_EXTENSIONS:
         flash("Invalid file type. Allowed: .xls, .xlsx Excel files only.", "error")
         return redirect(url_for("views.product_list"))
 
-    created = 0
-    updated = 0
-    skipped = 0
-
     try:
-        rows = None
-
-        # ---- openpyxl for xlsx-like formats ----
-        if ext in {"xlsx", "xlsm", "xltx", "xltm"}:
-            wb = openpyxl.load_workbook(file, data_only=True)
-            ws = wb.active
-            rows = list(ws.iter_rows(values_only=True))
-
-        # ---- xlrd for old .xls ----
-        elif ext == "xls":
-            data = file.read()
-            book = xlrd.open_workbook(file_contents=data)
-            sheet = book.sheet_by_index(0)
-            rows = []
-            for r in range(sheet.nrows):
-                rows.append(sheet.row_values(r))
-
-        if not rows or len(rows) < 2:
-            flash("The uploaded file is empty or has no data rows.", "error")
-            return redirect(url_for("views.product_list"))
-
-        # ---- header mapping ----
-        header_raw = rows[0]
-        header = [
-            (str(c).strip().lower() if c is not None else "")
-            for c in header_raw
-        ]
-
-        def find_col(col_name):
-            try:
-                return header.index(col_name)
-            except ValueError:
-                return None
-
-        # required
-        name_idx = find_col("name")
-        price_idx = find_col("price")
-        qty_idx = find_col("quantity")
-        category_idx = find_col("category")
-        # optional
-        image_idx = find_col("image")  # or "image_filename" if you prefer; adjust header
-
-        if None in (name_idx, price_idx, qty_idx, category_idx):
-            flash(
-                "Header row must contain columns: Name, Price, Quantity, Category "
-                "(and optional Image).",
-                "error",
-            )
-            return redirect(url_for("views.product_list"))
-
-        def get_cell(row, i):
-            if i is None:
-                return ""
-            if i >= len(row):
-                return ""
-            val = row[i]
-            return "" if val is None else str(val).strip()
-
-        # ---- process data rows ----
-        for row in rows[1:]:
-            if row is None:
-                continue
-
-            name = get_cell(row, name_idx)
-            price_raw = get_cell(row, price_idx)
-            qty_raw = get_cell(row, qty_idx)
-            category_name = get_cell(row, category_idx)
-            image_val = get_cell(row, image_idx) if image_idx is not None else ""
-
-            # skip completely empty rows
-            if not (name or price_raw or qty_raw or category_name or image_val):
-                continue
-
-            # basic validations
-            if not name:
-                skipped += 1
-                continue
-
-            # price
-            try:
-                price = Decimal(price_raw)
-                if price < 0:
-                    skipped += 1
-                    continue
-            except Exception:
-                skipped += 1
-                continue
-
-            # quantity
-            try:
-                quantity = int(float(qty_raw))  # handles "10.0" too
-                if quantity < 0:
-                    skipped += 1
-                    continue
-            except Exception:
-                skipped += 1
-                continue
-
-            # category – by name
-            if not category_name:
-                skipped += 1
-                continue
-
-            category = Category.query.filter_by(name=category_name).first()
-            if not category:
-                # if you want to autocreate categories, replace this with making a new Category
-                skipped += 1
-                continue
-
-            # existing product? We'll match by name (and category)
-            existing = Product.query.filter_by(
-                name=name,
-                category_id=category.id
-            ).first()
-
-            image_filename = image_val or None  # can be empty
-
-            if existing:
-                existing.price = price
-                existing.quantity = quantity
-                existing.category_id = category.id
-                if image_filename:
-                    existing.image_filename = image_filename
-                updated += 1
-            else:
-                p = Product(
-                    name=name,
-                    price=price,
-                    quantity=quantity,
-                    category_id=category.id,
-                    image_filename=image_filename,
-                )
-                db.session.add(p)
-                created += 1
-
+        records, skipped = importers.parse_rows("product", importers.read_rows(file, ext))
+        counts = importers.write_records("product", records)
         db.session.commit()
+        created, updated = counts["created"], counts["updated"]
+        skipped += counts["skipped"]
+        record_rows("product_import", created + updated + skipped)
         flash(
             f"Product import complete. Created: {created}, Updated: {updated}, Skipped: {skipped}.",
             "success",
         )
 
+    except importers.SpreadsheetError as e:
+        flash(str(e), "error")
     except Exception as e:
         db.session.rollback()
         flash(f"Failed to import products: {e}", "error")
@@ -586,6 +512,7 @@ def edit_category(category_id):
 
 @views.route("/admin/customers", methods=["GET"])
 @login_required
+@conditional("customer")
 def customer_list():
 
     ## this functions enable even user only
@@ -596,10 +523,7 @@ def customer_list():
     per_page = request.args.get("per_page", 10, type=int)
     search = (request.args.get("q") or "").strip()
 
-    query = Customer.query
-
-    if search:
-        query = query.filter(Customer.name.ilike(f"%{search}%"))
+    query = _customer_query(search)
 
     pagination = query.order_by(Customer.id).paginate(
         page=page,
@@ -618,6 +542,14 @@ def customer_list():
         search=search,
     )
 
+def _customer_query(search):
+    query = Customer.query
+
+    if search:
+        query = query.filter(Customer.name.ilike(f"%{search}%"))
+
+    return query
+
 @views.route("/admin/customers/new", methods=["POST"])
 @login_required
 def customer_create():
@@ -706,13 +638,35 @@ def customer_delete(customer_id):
     flash("Customer deleted.", "success")
     return redirect(url_for("views.customer_list"))
 
+@views.route("/admin/customers/bulk-delete", methods=["POST"])
+@login_required
+@roles_required('admin')
+def customer_bulk_delete():
+    """Delete the selected customers with their outgoing records and orders."""
+    query = _customer_query((request.form.get("q") or "").strip())
+    selection = _bulk_selection(query, Customer.id)
+    if selection == []:
+        flash("No customers selected.", "error")
+        return redirect(url_for("views.customer_list"))
+
+    counts = bulk.delete_customers(selection)
+    db.session.commit()
+    flash(bulk.summary("Deleted", counts), "success")
+    return redirect(url_for("views.customer_list"))
+
 @views.route("/admin/customers/export/excel", methods=["GET"])
 @login_required
+@roles_required('admin')
+@conditional("customer")
+@delta_export
+@cached_export("customer_export_excel", "customer",
+               download_name="customers.xlsx", mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
 def customer_export_excel():
-    if not current_user.is_admin:
-        abort(403)
-
-    customers = Customer.query.order_by(Customer.id).all()
+    query = Customer.query
+    since = export_since()
+    if since:
+        query = query.filter(changed_since(since, Customer))
+    customers = query.order_by(Customer.id).all()
 
     wb = openpyxl.Workbook()
     ws = wb.active
@@ -723,6 +677,7 @@ def customer_export_excel():
 
     for c in customers:
         ws.append([c.id, c.name, c.address, c.email, c.contact])
+    record_rows("customer_export_excel", len(customers))
 
     stream = BytesIO()
     wb.save(stream)
@@ -737,44 +692,29 @@ def customer_export_excel():
 
 @views.route("/admin/customers/export/pdf", methods=["GET"])
 @login_required
+@roles_required('admin')
+@conditional("customer")
+@cached_export("customer_export_pdf", "customer",
+               download_name="customers.pdf", mimetype="application/pdf")
 def customer_export_pdf():
-    if not current_user.is_admin:
-        abort(403)
-
-    customers = Customer.query.order_by(Customer.id).all()
-
-    buffer = BytesIO()
-    p = canvas.Canvas(buffer, pagesize=letter)
-    width, height = letter
-
-    y = height - 50
-    p.setFont("Helvetica-Bold", 14)
-    p.drawString(50, y, "Customer List")
-    y -= 30
-
-    p.setFont("Helvetica-Bold", 10)
-    p.drawString(50, y, "ID")
-    p.drawString(80, y, "Name")
-    p.drawString(220, y, "Address")
-    p.drawString(400, y, "Email")
-    p.drawString(520, y, "Contact")
-    y -= 20
-
-    p.setFont("Helvetica", 9)
-    for c in customers:
-        if y < 50:
-            p.showPage()
-            y = height - 50
-        p.drawString(50, y, str(c.id))
-        p.drawString(80, y, c.name[:30])
-        p.drawString(220, y, c.address[:35])
-        p.drawString(400, y, c.email[:25])
-        p.drawString(520, y, c.contact[:15])
-        y -= 16
-
-    p.showPage()
-    p.save()
-    buffer.seek(0)
+    rows = db.session.execute(
+        select(Customer.id, Customer.name, Customer.address, Customer.email, Customer.contact)
+        .order_by(Customer.id)
+        .execution_options(yield_per=2000)
+    )
+    buffer, count = spooled_report(
+        "Customer List",
+        [
+            Column("ID", 50),
+            Column("Name", 80, 30),
+            Column("Address", 220, 35),
+            Column("Email", 400, 25),
+            Column("Contact", 520, 15),
+        ],
+        rows,
+        row_height=16,
+    )
+    record_rows("customer_export_pdf", count)
 
     return send_file(
         buffer,
@@ -785,6 +725,7 @@ def customer_export_pdf():
 
 @views.route("/admin/customers/import", methods=["POST"])
 @login_required
+@upload_limit("IMPORT_MAX_BYTES")
 def customer_import():
     if not current_user.is_admin:
         abort(403)
@@ -799,114 +740,24 @@ def customer_import():
     ext = filename.rsplit(".", 1)[-1].lower()
 
     # Only allow Excel formats
-    allowed_exts = {"xlsx", "xlsm", "xltx", "xltm", "xls"}
-    if ext not in allowed_exts:
+    if ext not in importers.EXCEL_EXTENSIONS:
         flash("Invalid file type. Allowed: .xls, .xlsx Excel files only.", "error")
         return redirect(url_for("views.customer_list"))
 
-    created = 0
-    updated = 0
-    skipped = 0
-
     try:
-        rows = None
-
-        # ---- .xlsx / .xlsm / xltx / xltm via openpyxl ----
-        if ext in {"xlsx", "xlsm", "xltx", "xltm"}:
-            wb = openpyxl.load_workbook(file, data_only=True)
-            ws = wb.active
-            rows = list(ws.iter_rows(values_only=True))
-
-        # ---- legacy .xls via xlrd ----
-        elif ext == "xls":
-            # xlrd wants bytes
-            data = file.read()
-            book = xlrd.open_workbook(file_contents=data)
-            sheet = book.sheet_by_index(0)
-            rows = []
-            for r in range(sheet.nrows):
-                rows.append(sheet.row_values(r))
-
-        if not rows or len(rows) < 2:
-            flash("The uploaded file is empty or has no data rows.", "error")
-            return redirect(url_for("views.customer_list"))
-
-        # ---- header mapping ----
-        header_raw = rows[0]
-        header = [
-            (str(c).strip().lower() if c is not None else "")
-            for c in header_raw
-        ]
-
-        def find_col(col_name):
-            try:
-                return header.index(col_name)
-            except ValueError:
-                return None
-
-        name_idx = find_col("name")
-        address_idx = find_col("address")
-        email_idx = find_col("email")
-        contact_idx = find_col("contact")
-
-        if None in (name_idx, address_idx, email_idx, contact_idx):
-            flash(
-                "Header row must contain columns: Name, Address, Email, Contact.",
-                "error",
-            )
-            return redirect(url_for("views.customer_list"))
-
-        # ---- process data rows ----
-        for row in rows[1:]:
-            # Some libraries return tuples, others lists – treat the same
-            if row is None:
-                continue
-
-            # Safely get each column
-            def get_cell(i):
-                if i is None:
-                    return ""
-                if i >= len(row):
-                    return ""
-                val = row[i]
-                return "" if val is None else str(val).strip()
-
-            name = get_cell(name_idx)
-            address = get_cell(address_idx)
-            email = get_cell(email_idx)
-            contact = get_cell(contact_idx)
-
-            # Skip completely empty rows
-            if not (name or address or email or contact):
-                continue
-
-            # Basic validation – must at least have name + email
-            if not name or not email:
-                skipped += 1
-                continue
-
-            # Use email to detect existing customer
-            existing = Customer.query.filter_by(email=email).first()
-
-            if existing:
-                existing.name = name
-                existing.address = address
-                existing.contact = contact
-                updated += 1
-            else:
-                c = Customer(
-                    name=name,
-                    address=address,
-                    email=email,
-                    contact=contact,
-                )
-                db.session.add(c)
-                created += 1
-
+        records, skipped = importers.parse_rows("customer", importers.read_rows(file, ext))
+        counts = importers.write_records("customer", records)
         db.session.commit()
-        msg = f"Import complete. Created: {created}, Updated: {updated}, Skipped: {skipped}."
-        flash(msg, "success")
+        created, updated = counts["created"], counts["updated"]
+        skipped += counts["skipped"]
+        record_rows("customer_import", created + updated + skipped)
+        flash(
+            f"Import complete. Created: {created}, Updated: {updated}, Skipped: {skipped}.",
+            "success",
+        )
 
+    except importers.SpreadsheetError as e:
+        flash(str(e), "error")
     except Exception as e:
         db.session.rollback()
         flash(f"Failed to import customers: {e}", "error")
@@ -916,6 +767,7 @@ def customer_import():
 
 @views.route("/admin/suppliers")
 @login_required
+@conditional("supplier")
 def supplier_list():
     if not current_user.is_admin:
         abort(403)
@@ -924,18 +776,7 @@ def supplier_list():
     per_page = request.args.get("per_page", 10, type=int)
     search = (request.args.get("q") or "").strip()
 
-    query = Supplier.query
-
-    if search:
-        like = f"%{search}%"
-        query = query.filter(
-            or_(
-                Supplier.name.ilike(like),
-                Supplier.address.ilike(like),
-                Supplier.email.ilike(like),
-                Supplier.contact.ilike(like),
-            )
-        )
+    query = _supplier_query(search)
 
     pagination = query.order_by(Supplier.id).paginate(
         page=page, per_page=per_page, error_out=False
@@ -950,6 +791,21 @@ def supplier_list():
         search=search,
         per_page=per_page,
     )
+def _supplier_query(search):
+    query = Supplier.query
+
+    if search:
+        like = f"%{search}%"
+        query = query.filter(
+            or_(
+                Supplier.name.ilike(like),
+                Supplier.address.ilike(like),
+                Supplier.email.ilike(like),
+                Supplier.contact.ilike(like),
+            )
+        )
+
+    return query
 @views.route("/admin/suppliers/new", methods=["POST"])
 @login_required
 def supplier_create():
@@ -1011,13 +867,34 @@ def supplier_delete(supplier_id):
     db.session.commit()
     flash("Supplier deleted.", "success")
     return redirect(url_for("views.supplier_list"))
+@views.route("/admin/suppliers/bulk-delete", methods=["POST"])
+@login_required
+@roles_required('admin')
+def supplier_bulk_delete():
+    """Delete the selected suppliers with their purchases (stock is left as is)."""
+    query = _supplier_query((request.form.get("q") or "").strip())
+    selection = _bulk_selection(query, Supplier.id)
+    if selection == []:
+        flash("No suppliers selected.", "error")
+        return redirect(url_for("views.supplier_list"))
+
+    counts = bulk.delete_suppliers(selection)
+    db.session.commit()
+    flash(bulk.summary("Deleted", counts), "success")
+    return redirect(url_for("views.supplier_list"))
 @views.route("/admin/suppliers/export/excel")
 @login_required
+@roles_required('admin')
+@conditional("supplier")
+@delta_export
+@cached_export("supplier_export_excel", "supplier",
+               download_name="suppliers.xlsx", mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
 def supplier_export_excel():
-    if not current_user.is_admin:
-        abort(403)
-
-    suppliers = Supplier.query.order_by(Supplier.id).all()
+    query = Supplier.query
+    since = export_since()
+    if since:
+        query = query.filter(changed_since(since, Supplier))
+    suppliers = query.order_by(Supplier.id).all()
 
     data = [
         {
@@ -1031,6 +908,7 @@ def supplier_export_excel():
     ]
 
     df = pd.DataFrame(data)
+    record_rows("supplier_export_excel", len(data))
 
     output = BytesIO()
     with pd.ExcelWriter(output, engine="xlsxwriter") as writer:
@@ -1045,32 +923,28 @@ def supplier_export_excel():
     )
 @views.route("/admin/suppliers/export/pdf")
 @login_required
+@roles_required('admin')
+@conditional("supplier")
+@cached_export("supplier_export_pdf", "supplier",
+               download_name="suppliers.pdf", mimetype="application/pdf")
 def supplier_export_pdf():
-    if not current_user.is_admin:
-        abort(403)
-
-    suppliers = Supplier.query.order_by(Supplier.id).all()
-
-    buffer = BytesIO()
-    p = canvas.Canvas(buffer)
-
-    y = 800
-    p.setFont("Helvetica-Bold", 14)
-    p.drawString(50, y, "List of Suppliers")
-    y -= 30
-    p.setFont("Helvetica", 10)
-
-    for s in suppliers:
-        line = f"{s.id}  | {s.name} | {s.address or ''} | {s.email or ''} | {s.contact or ''}"
-        p.drawString(50, y, line[:130])  # simple clipping
-        y -= 15
-        if y < 50:  # new page
-            p.showPage()
-            y = 800
-
-    p.showPage()
-    p.save()
-    buffer.seek(0)
+    rows = db.session.execute(
+        select(Supplier.id, Supplier.name, Supplier.address, Supplier.email, Supplier.contact)
+        .order_by(Supplier.id)
+        .execution_options(yield_per=2000)
+    )
+    buffer, count = spooled_report(
+        "List of Suppliers",
+        [
+            Column("ID", 50),
+            Column("Name", 80, 30),
+            Column("Address", 220, 35),
+            Column("Email", 400, 25),
+            Column("Contact", 520, 15),
+        ],
+        rows,
+    )
+    record_rows("supplier_export_pdf", count)
 
     return send_file(
         buffer,
@@ -1080,6 +954,7 @@ def supplier_export_pdf():
     )
 @views.route("/admin/suppliers/import", methods=["POST"])
 @login_required
+@upload_limit("IMPORT_MAX_BYTES")
 def supplier_import():
     if not current_user.is_admin:
         abort(403)
@@ -1092,104 +967,26 @@ def supplier_import():
 
     filename = file.filename
     ext = filename.rsplit(".", 1)[-1].lower()
-    allowed_exts = {"xlsx", "xlsm", "xltx", "xltm", "xls"}
 
-    if ext not in allowed_exts:
+    # Only allow Excel formats
+    if ext not in importers.EXCEL_EXTENSIONS:
         flash("Invalid file type. Allowed: .xls, .xlsx Excel files only.", "error")
         return redirect(url_for("views.supplier_list"))
 
-    created = 0
-    updated = 0
-    skipped = 0
-
     try:
-        rows = None
-
-        if ext in {"xlsx", "xlsm", "xltx", "xltm"}:
-            wb = openpyxl.load_workbook(file, data_only=True)
-            ws = wb.active
-            rows = list(ws.iter_rows(values_only=True))
-        elif ext == "xls":
-            data = file.read()
-            book = xlrd.open_workbook(file_contents=data)
-            sheet = book.sheet_by_index(0)
-            rows = []
-            for r in range(sheet.nrows):
-                rows.append(sheet.row_values(r))
-
-        if not rows or len(rows) < 2:
-            flash("The uploaded file is empty or has no data rows.", "error")
-            return redirect(url_for("views.supplier_list"))
-
-        header_raw = rows[0]
-        header = [
-            (str(c).strip().lower() if c is not None else "")
-            for c in header_raw
-        ]
-
-        def find_col(col_name):
-            try:
-                return header.index(col_name)
-            except ValueError:
-                return None
-
-        name_idx = find_col("name")
-        address_idx = find_col("address")
-        email_idx = find_col("email")
-        contact_idx = find_col("contact")
-
-        if None in (name_idx, address_idx, email_idx, contact_idx):
-            flash(
-                "Header row must contain columns: Name, Address, Email, Contact.",
-                "error",
-            )
-            return redirect(url_for("views.supplier_list"))
-
-        def get_cell(row, i):
-            if i is None or i >= len(row):
-                return ""
-            v = row[i]
-            return "" if v is None else str(v).strip()
-
-        for row in rows[1:]:
-            if row is None:
-                continue
-
-            name = get_cell(row, name_idx)
-            address = get_cell(row, address_idx)
-            email = get_cell(row, email_idx)
-            contact = get_cell(row, contact_idx)
-
-            if not (name or address or email or contact):
-                continue
-
-            if not name or not email:
-                skipped += 1
-                continue
-
-            existing = Supplier.query.filter_by(email=email).first()
-
-            if existing:
-                existing.name = name
-                existing.address = address
-                existing.contact = contact
-                updated += 1
-            else:
-                s = Supplier(
-                    name=name,
-                    address=address,
-                    email=email,
-                    contact=contact,
-                )
-                db.session.add(s)
-                created += 1
-
+        records, skipped = importers.parse_rows("supplier", importers.read_rows(file, ext))
+        counts = importers.write_records("supplier", records)
         db.session.commit()
+        created, updated = counts["created"], counts["updated"]
+        skipped += counts["skipped"]
+        record_rows("supplier_import", created + updated + skipped)
         flash(
             f"Supplier import complete. Created: {created}, Updated: {updated}, Skipped: {skipped}.",
             "success",
         )
 
+    except importers.SpreadsheetError as e:
+        flash(str(e), "error")
     except Exception as e:
         db.session.rollback()
         flash(f"Failed to import suppliers: {e}", "error")
@@ -1198,6 +995,7 @@ def supplier_import():
 
 @views.route("/admin/outgoing")
 @login_required
+@conditional("outgoing", "product", "customer")
 def outgoing_list():
      ## this functions enable even user only
     # if not current_user.is_admin:
@@ -1208,16 +1006,7 @@ def outgoing_list():
     per_page = request.args.get("per_page", 10, type=int)
     search = (request.args.get("search") or "").strip()
 
-    query = Outgoing.query.join(Product).join(Customer)
-
-    if search:
-        like = f"%{search}%"
-        query = query.filter(
-            or_(
-                Product.name.ilike(like),
-                Customer.name.ilike(like),
-            )
-        )
+    query = _outgoing_query(search)
 
     pagination = query.order_by(Outgoing.date.desc(), Outgoing.id.desc()).paginate(
         page=page, per_page=per_page, error_out=False
@@ -1240,6 +1029,21 @@ def outgoing_list():
     )
 
 
+def _outgoing_query(search):
+    query = Outgoing.query.join(Product).join(Customer)
+
+    if search:
+        like = f"%{search}%"
+        query = query.filter(
+            or_(
+                Product.name.ilike(like),
+                Customer.name.ilike(like),
+            )
+        )
+
+    return query
+
+
 @views.route("/admin/outgoing/new", methods=["POST"])
 @login_required
 def outgoing_create():
@@ -1291,6 +1095,7 @@ def outgoing_create():
         quantity=quantity,
         date=date_val,
     )
+    record.snapshot_price(product)
     db.session.add(record)
     db.session.commit()
 
@@ -1319,6 +1124,8 @@ def outgoing_edit(outgoing_id):
         errors.append("Product is required.")
     if not customer:
         errors.append("Customer is required.")
+    elif record.order_id and customer.id != record.customer_id:
+        errors.append("This line belongs to an order; its customer can't change.")
 
     try:
         quantity = int(qty_raw)
@@ -1342,11 +1149,19 @@ def outgoing_edit(outgoing_id):
             flash(e, "error")
         return redirect(url_for("views.outgoing_list"))
 
+    product_changed = record.product_id != product.id
+
     record.product_id = product.id
     record.customer_id = customer.id
     record.quantity = quantity
     record.date = date_val
 
+    # keep the sale-time price unless the line now refers to another product
+    if product_changed or record.unit_price is None:
+        record.snapshot_price(product)
+    else:
+        record.update_total()
+
     db.session.commit()
     flash("Outgoing product updated.", "success")
     return redirect(url_for("views.outgoing_list"))
@@ -1364,23 +1179,39 @@ def outgoing_delete(outgoing_id):
     flash("Outgoing product deleted.", "success")
     return redirect(url_for("views.outgoing_list"))
 
+@views.route("/admin/outgoing/bulk-delete", methods=["POST"])
+@login_required
+@roles_required('admin')
+def outgoing_bulk_delete():
+    """Delete the selected outgoing records (stock is left as is, as in outgoing_delete)."""
+    query = _outgoing_query((request.form.get("search") or "").strip())
+    selection = _bulk_selection(query, Outgoing.id)
+    if selection == []:
+        flash("No outgoing records selected.", "error")
+        return redirect(url_for("views.outgoing_list"))
+
+    counts = bulk.delete_outgoing(selection)
+    db.session.commit()
+    flash(bulk.summary("Deleted", counts), "success")
+    return redirect(url_for("views.outgoing_list"))
+
 @views.route("/admin/outgoing/export/excel")
 @login_required
+@roles_required('admin')
+@conditional("outgoing", "product", "customer")
+@delta_export
+@cached_export("outgoing_export_excel", "outgoing", "product", "customer",
+               download_name="outgoing_products.xlsx", mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
 def outgoing_export_excel():
-    if not current_user.is_admin:
-        abort(403)
-
     search = (request.args.get("search") or "").strip()
 
-    query = Outgoing.query.join(Product).join(Customer)
-    if search:
-        like = f"%{search}%"
-        query = query.filter(
-            or_(
-                Product.name.ilike(like),
-                Customer.name.ilike(like),
-            )
-        )
+    query = _outgoing_query(search)
+    since = export_since()
+    if since:
+        # the export shows product and customer names: renames count too
+        query = query.filter(changed_since(
+            since, Outgoing, (Outgoing.product_id, Product), (Outgoing.customer_id, Customer),
+        ))
 
     rows = []
     for o in query.order_by(Outgoing.date.desc(), Outgoing.id.desc()).all():
@@ -1395,6 +1226,7 @@ def outgoing_export_excel():
         )
 
     df = pd.DataFrame(rows)
+    record_rows("outgoing_export_excel", len(rows))
     output = io.BytesIO()
     with pd.ExcelWriter(output, engine="xlsxwriter") as writer:
         df.to_excel(writer, index=False, sheet_name="Outgoing")
@@ -1409,55 +1241,42 @@ def outgoing_export_excel():
 
 @views.route("/admin/outgoing/export/pdf")
 @login_required
+@roles_required('admin')
+@conditional("outgoing", "product", "customer")
+@cached_export("outgoing_export_pdf", "outgoing", "product", "customer",
+               download_name="outgoing_products.pdf", mimetype="application/pdf")
 def outgoing_export_pdf():
-    if not current_user.is_admin:
-        abort(403)
-
     search = (request.args.get("search") or "").strip()
 
-    query = Outgoing.query.join(Product).join(Customer)
+    stmt = (
+        select(Outgoing.id, Product.name, Customer.name, Outgoing.quantity, Outgoing.date)
+        .join(Product, Product.id == Outgoing.product_id)
+        .join(Customer, Customer.id == Outgoing.customer_id)
+    )
     if search:
         like = f"%{search}%"
-        query = query.filter(
+        stmt = stmt.where(
             or_(
                 Product.name.ilike(like),
                 Customer.name.ilike(like),
             )
         )
+    rows = db.session.execute(
+        stmt.order_by(Outgoing.date.desc(), Outgoing.id.desc()).execution_options(yield_per=2000)
+    )
 
-    buffer = io.BytesIO()
-    c = canvas.Canvas(buffer, pagesize=letter)
-
-    width, height = letter
-    y = height - 50
-
-    c.setFont("Helvetica-Bold", 14)
-    c.drawString(30, y, "Outgoing Products List")
-    y -= 30
-
-    c.setFont("Helvetica-Bold", 10)
-    c.drawString(30, y, "ID")
-    c.drawString(60, y, "Product")
-    c.drawString(200, y, "Customer")
-    c.drawString(380, y, "Qty")
-    c.drawString(420, y, "Date")
-    y -= 20
-    c.setFont("Helvetica", 9)
-
-    for o in query.order_by(Outgoing.date.desc(), Outgoing.id.desc()).all():
-        if y < 50:
-            c.showPage()
-            y = height - 50
-            c.setFont("Helvetica", 9)
-        c.drawString(30, y, str(o.id))
-        c.drawString(60, y, (o.product.name if o.product else "")[:20])
-        c.drawString(200, y, (o.customer.name if o.customer else "")[:20])
-        c.drawString(380, y, str(o.quantity))
-        c.drawString(420, y, o.date.isoformat() if o.date else "")
-        y -= 15
-
-    c.save()
-    buffer.seek(0)
+    buffer, count = spooled_report(
+        "Outgoing Products List",
+        [
+            Column("ID", 30),
+            Column("Product", 60, 20),
+            Column("Customer", 200, 20),
+            Column("Qty", 380),
+            Column("Date", 420),
+        ],
+        rows,
+    )
+    record_rows("outgoing_export_pdf", count)
 
     return send_file(
         buffer,
@@ -1469,76 +1288,175 @@ def outgoing_export_pdf():
 
 @views.route("/admin/outgoing/<int:outgoing_id>/invoice")
 @login_required
+@conditional("outgoing", "product", "customer")
 def outgoing_invoice(outgoing_id):
     # if not current_user.is_admin:
     #     abort(403)
 
-    o = Outgoing.query.get_or_404(outgoing_id)
-
-    buffer = io.BytesIO()
-    c = canvas.Canvas(buffer, pagesize=letter)
-    width, height = letter
-
-    c.setFont("Helvetica-Bold", 16)
-    c.drawString(200, height - 50, "INVOICE")
-
-    y = height - 120
-    c.setFont("Helvetica", 11)
-    c.drawString(50, y, f"Invoice ID: {o.id}")
-    y -= 20
-    c.drawString(50, y, f"Date: {o.date.isoformat() if o.date else ''}")
-    y -= 30
-
-    c.drawString(50, y, "Customer:")
-    y -= 20
-    c.drawString(70, y, o.customer.name if o.customer else "")
-    y -= 15
-    if o.customer and o.customer.address:
-        c.drawString(70, y, o.customer.address)
-        y -= 15
-    if o.customer and o.customer.email:
-        c.drawString(70, y, f"Email: {o.customer.email}")
-        y -= 15
-    if o.customer and o.customer.contact:
-        c.drawString(70, y, f"Contact: {o.customer.contact}")
-        y -= 30
-
-    # product table
-    c.setFont("Helvetica-Bold", 11)
-    c.drawString(50, y, "Product")
-    c.drawString(300, y, "Quantity")
-    c.drawString(380, y, "Unit Price")
-    c.drawString(470, y, "Total")
-    y -= 20
-    c.setFont("Helvetica", 11)
-
-    product_name = o.product.name if o.product else ""
-    unit_price = o.product.price if (o.product and o.product.price is not None) else Decimal("0.00")
-    total = unit_price * o.quantity
-
-    c.drawString(50, y, product_name)
-    c.drawString(300, y, str(o.quantity))
-    c.drawString(380, y, f"{unit_price:.2f}")
-    c.drawString(470, y, f"{total:.2f}")
-    y -= 30
-
-    c.setFont("Helvetica-Bold", 12)
-    c.drawRightString(550, y, f"Grand Total: {total:.2f}")
-
-    c.save()
-    buffer.seek(0)
+    o = Outgoing.query.get(outgoing_id) or load_archived("outgoing", outgoing_id)
+    if o is None:
+        abort(404)
 
-    filename = f"invoice_{o.id}.pdf"
+    data = invoice_data("outgoing", o)
     return send_file(
-        buffer,
+        io.BytesIO(render_invoice("outgoing", data)),
+        as_attachment=True,
+        download_name=invoice_filename("outgoing", data),
+        mimetype="application/pdf",
+    )
+
+
+@views.route("/admin/outgoing/invoices")
+@login_required
+@roles_required('admin')
+def outgoing_invoice_batch():
+    return _invoice_batch("outgoing", "customer_id", "views.outgoing_list")
+
+
+# --------------------------------------------------
+# SALES ORDERS (one header, many Outgoing lines)
+# --------------------------------------------------
+@views.route("/admin/orders")
+@login_required
+@conditional("sales_order", "outgoing", "product", "customer")
+def order_list():
+    page = request.args.get("page", 1, type=int)
+    per_page = request.args.get("per_page", 10, type=int)
+    search = (request.args.get("search") or "").strip()
+
+    query = (
+        db.session.query(
+            SalesOrder,
+            Customer.name.label("customer_name"),
+            func.count(Outgoing.id).label("line_count"),
+            func.coalesce(func.sum(Outgoing.line_total), 0).label("total"),
+        )
+        .join(Customer, Customer.id == SalesOrder.customer_id)
+        .outerjoin(Outgoing, Outgoing.order_id == SalesOrder.id)
+        .group_by(SalesOrder.id, Customer.id)
+    )
+    if search:
+        query = query.filter(Customer.name.ilike(f"%{search}%"))
+
+    pagination = query.order_by(SalesOrder.date.desc(), SalesOrder.id.desc()).paginate(
+        page=page, per_page=per_page, error_out=False
+    )
+
+    return render_template(
+        "admin_orders.html",
+        user=current_user,
+        orders=pagination.items,
+        pagination=pagination,
+        products=Product.query.order_by(Product.name).all(),
+        customers=Customer.query.order_by(Customer.name).all(),
+        search=search,
+        per_page=per_page,
+    )
+
+
+@views.route("/admin/orders/new", methods=["POST"])
+@login_required
+def order_create():
+    customer_id = request.form.get("customer_id", type=int)
+    date_raw = (request.form.get("date") or "").strip()
+
+    errors = []
+
+    customer = db.session.get(Customer, customer_id) if customer_id else None
+    if not customer:
+        errors.append("Customer is required.")
+
+    if date_raw:
+        try:
+            date_val = datetime.strptime(date_raw, "%Y-%m-%d").date()
+        except ValueError:
+            errors.append("Invalid date format.")
+            date_val = None
+    else:
+        date_val = datetime.utcnow().date()
+
+    # the form posts product_id / quantity once per line; blank lines are skipped
+    raw_lines = [
+        (number, product_raw.strip(), qty_raw.strip())
+        for number, (product_raw, qty_raw) in enumerate(
+            zip(request.form.getlist("product_id"), request.form.getlist("quantity")), start=1
+        )
+        if product_raw.strip() or qty_raw.strip()
+    ]
+    if not raw_lines:
+        errors.append("An order needs at least one line.")
+
+    # every product of the order in one query
+    product_ids = {int(p) for _, p, _ in raw_lines if p.isdigit()}
+    products = (
+        {p.id: p for p in Product.query.filter(Product.id.in_(product_ids))}
+        if product_ids else {}
+    )
+
+    lines = []
+    for number, product_raw, qty_raw in raw_lines:
+        product = products.get(int(product_raw)) if product_raw.isdigit() else None
+        if not product:
+            errors.append(f"Line {number}: product is required.")
+        try:
+            quantity = int(qty_raw)
+            if quantity <= 0:
+                errors.append(f"Line {number}: quantity must be a positive integer.")
+        except ValueError:
+            errors.append(f"Line {number}: quantity must be an integer.")
+            quantity = None
+        lines.append((product, quantity))
+
+    if errors:
+        for e in errors:
+            flash(e, "error")
+        return redirect(url_for("views.order_list"))
+
+    order = SalesOrder(customer_id=customer.id, date=date_val)
+    for product, quantity in lines:
+        line = Outgoing(
+            product_id=product.id,
+            customer_id=customer.id,
+            quantity=quantity,
+            date=date_val,
+            order=order,
+        )
+        line.snapshot_price(product)
+    db.session.add(order)
+    db.session.commit()
+    record_rows("order_create", len(lines))
+
+    flash(f"Order #{order.id} created with {len(lines)} line(s).", "success")
+    return redirect(url_for("views.order_list"))
+
+
+@views.route("/admin/orders/<int:order_id>/invoice")
+@login_required
+@conditional("sales_order", "outgoing", "product", "customer")
+def order_invoice(order_id):
+    order = db.session.scalars(
+        select(SalesOrder)
+        .options(
+            joinedload(SalesOrder.customer),
+            selectinload(SalesOrder.lines).joinedload(Outgoing.product),
+        )
+        .where(SalesOrder.id == order_id)
+    ).first()
+    if order is None:
+        abort(404)
+
+    data = order_invoice_data(order)
+    return send_file(
+        io.BytesIO(render_invoice("order", data)),
         as_attachment=True,
-        download_name=filename,
+        download_name=invoice_filename("order", data),
         mimetype="application/pdf",
     )
 
 
 @views.route("/admin/purchases")
 @login_required
+@conditional("purchase", "product", "supplier")
 def purchase_list():
     # if not current_user.is_admin:
     #     abort(403)
@@ -1547,16 +1465,7 @@ def purchase_list():
     per_page = request.args.get("per_page", 10, type=int)
     search = (request.args.get("search") or "").strip()
 
-    query = Purchase.query.join(Product).join(Supplier)
-
-    if search:
-        like = f"%{search}%"
-        query = query.filter(
-            db.or_(
-                Product.name.ilike(like),
-                Supplier.name.ilike(like)
-            )
-        )
+    query = _purchase_query(search)
 
     pagination = query.order_by(Purchase.id.desc()).paginate(
         page=page, per_page=per_page, error_out=False
@@ -1578,6 +1487,21 @@ def purchase_list():
     )
 
 
+def _purchase_query(search):
+    query = Purchase.query.join(Product).join(Supplier)
+
+    if search:
+        like = f"%{search}%"
+        query = query.filter(
+            db.or_(
+                Product.name.ilike(like),
+                Supplier.name.ilike(like)
+            )
+        )
+
+    return query
+
+
 @views.route("/admin/purchases/new", methods=["POST"])
 @login_required
 def purchase_create():
@@ -1729,35 +1653,50 @@ def purchase_delete(purchase_id):
     return redirect(url_for("views.purchase_list"))
 
 
-@views.route("/admin/purchases/export/pdf")
+@views.route("/admin/purchases/bulk-delete", methods=["POST"])
 @login_required
-def purchases_export_pdf():
-    if not current_user.is_admin:
-        abort(403)
+@roles_required('admin')
+def purchase_bulk_delete():
+    """Delete the selected purchases, taking their quantities back out of stock."""
+    query = _purchase_query((request.form.get("search") or "").strip())
+    selection = _bulk_selection(query, Purchase.id)
+    if selection == []:
+        flash("No purchases selected.", "error")
+        return redirect(url_for("views.purchase_list"))
 
-    purchases = Purchase.query.join(Product).join(Supplier).order_by(Purchase.id).all()
+    counts = bulk.delete_purchases(selection)
+    db.session.commit()
+    flash(bulk.summary("Deleted", counts), "success")
+    return redirect(url_for("views.purchase_list"))
 
-    buffer = BytesIO()
-    c = canvas.Canvas(buffer, pagesize=letter)
-    width, height = letter
 
-    y = height - 50
-    c.setFont("Helvetica-Bold", 14)
-    c.drawString(50, y, "Purchase Products List")
-    y -= 30
+@views.route("/admin/purchases/export/pdf")
+@login_required
+@roles_required('admin')
+@conditional("purchase", "product", "supplier")
+@cached_export("purchases_export_pdf", "purchase", "product", "supplier",
+               download_name="purchases.pdf", mimetype="application/pdf")
+def purchases_export_pdf():
+    rows = db.session.execute(
+        select(Purchase.id, Product.name, Supplier.name, Purchase.quantity, Purchase.date)
+        .join(Product, Product.id == Purchase.product_id)
+        .join(Supplier, Supplier.id == Purchase.supplier_id)
+        .order_by(Purchase.id)
+        .execution_options(yield_per=2000)
+    )
+    buffer, count = spooled_report(
+        "Purchase Products List",
+        [
+            Column("ID", 50),
+            Column("Product", 90, 25),
+            Column("Supplier", 260, 25),
+            Column("Qty", 430),
+            Column("Date", 480),
+        ],
+        rows,
+    )
+    record_rows("purchases_export_pdf", count)
 
-    c.setFont("Helvetica", 10)
-    for p in purchases:
-        line = f"{p.id} - {p.product.name if p.product else ''} - {p.supplier.name if p.supplier else ''} - Qty: {p.quantity} - Date: {p.date}"
-        c.drawString(50, y, line)
-        y -= 15
-        if y < 50:
-            c.showPage()
-            y = height - 50
-            c.setFont("Helvetica", 10)
-
-    c.save()
-    buffer.seek(0)
     return send_file(
         buffer,
         as_attachment=True,
@@ -1768,11 +1707,19 @@ def purchases_export_pdf():
 
 @views.route("/admin/purchases/export/excel")
 @login_required
+@roles_required('admin')
+@conditional("purchase", "product", "supplier")
+@delta_export
+@cached_export("purchases_export_excel", "purchase", "product", "supplier",
+               download_name="purchases.xlsx", mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
 def purchases_export_excel():
-    if not current_user.is_admin:
-        abort(403)
-
-    purchases = Purchase.query.join(Product).join(Supplier).order_by(Purchase.id).all()
+    query = Purchase.query.join(Product).join(Supplier)
+    since = export_since()
+    if since:
+        query = query.filter(changed_since(
+            since, Purchase, (Purchase.product_id, Product), (Purchase.supplier_id, Supplier),
+        ))
+    purchases = query.order_by(Purchase.id).all()
 
     rows = []
     for p in purchases:
@@ -1785,6 +1732,7 @@ def purchases_export_excel():
         })
 
     df = pd.DataFrame(rows)
+    record_rows("purchases_export_excel", len(rows))
 
     buffer = BytesIO()
     with pd.ExcelWriter(buffer, engine="openpyxl") as writer:
@@ -1801,46 +1749,82 @@ def purchases_export_excel():
 
 @views.route("/admin/purchases/<int:purchase_id>/invoice/pdf")
 @login_required
+@conditional("purchase", "product", "supplier")
 def purchase_invoice_pdf(purchase_id):
     # if not current_user.is_admin:
     #     abort(403)
 
-    p = Purchase.query.get_or_404(purchase_id)
-
-    buffer = BytesIO()
-    c = canvas.Canvas(buffer, pagesize=letter)
-    width, height = letter
-
-    c.setFont("Helvetica-Bold", 16)
-    c.drawString(50, height - 50, "Purchase Invoice")
-
-    c.setFont("Helvetica", 11)
-    y = height - 100
-    c.drawString(50, y, f"Invoice ID: {p.id}")
-    y -= 20
-    c.drawString(50, y, f"Date: {p.date.isoformat() if p.date else ''}")
-    y -= 20
-    c.drawString(50, y, f"Product: {p.product.name if p.product else ''}")
-    y -= 20
-    c.drawString(50, y, f"Supplier: {p.supplier.name if p.supplier else ''}")
-    y -= 20
-    c.drawString(50, y, f"Quantity: {p.quantity}")
-
-    c.showPage()
-    c.save()
-    buffer.seek(0)
+    p = Purchase.query.get(purchase_id) or load_archived("purchase", purchase_id)
+    if p is None:
+        abort(404)
 
+    data = invoice_data("purchase", p)
     return send_file(
-        buffer,
+        io.BytesIO(render_invoice("purchase", data)),
         as_attachment=True,
-        download_name=f"purchase_invoice_{p.id}.pdf",
+        download_name=invoice_filename("purchase", data),
         mimetype="application/pdf",
     )
 
 
+@views.route("/admin/purchases/invoices")
+@login_required
+@roles_required('admin')
+def purchase_invoice_batch():
+    return _invoice_batch("purchase", "supplier_id", "views.purchase_list")
+
+
+def _invoice_batch(kind, party_arg, back):
+    """
+    All invoices of `kind` matching ?date_from=&date_to=&<party_arg>= as one
+    download: ?format=zip (a PDF per invoice, default) or ?format=pdf (merged).
+    """
+    fmt = request.args.get("format", "zip")
+    party_id = request.args.get(party_arg, type=int)
+    try:
+        date_from = _parse_date_arg("date_from")
+        date_to = _parse_date_arg("date_to")
+    except ValueError:
+        flash("Invalid date format.", "error")
+        return redirect(url_for(back))
+    if fmt not in ("zip", "pdf"):
+        flash("Format must be zip or pdf.", "error")
+        return redirect(url_for(back))
+
+    # one row past the limit is enough to refuse; never load a whole history
+    limit = current_app.config["INVOICE_BATCH_MAX"]
+    items = load_invoice_data(kind, invoice_query(kind, date_from, date_to, party_id).limit(limit + 1))
+    if not items:
+        flash("No invoices match the selection.", "error")
+        return redirect(url_for(back))
+    if len(items) > limit:
+        flash(f"More than {limit} invoices match; narrow the selection.", "error")
+        return redirect(url_for(back))
+
+    # spills to disk past 32 MB instead of holding large batches in memory
+    out = tempfile.SpooledTemporaryFile(max_size=32 * 1024 * 1024)
+    # each gunicorn worker starts its own pool: keep it small (`flask invoices` has all cores)
+    write_invoice_batch(kind, items, out, fmt=fmt, workers=current_app.config["INVOICE_WEB_WORKERS"])
+    out.seek(0)
+    record_rows(f"{kind}_invoice_batch", len(items))
+
+    return send_file(
+        out,
+        as_attachment=True,
+        download_name=f"{kind}_invoices.{fmt}",
+        mimetype="application/pdf" if fmt == "pdf" else "application/zip",
+    )
+
+
+def _parse_date_arg(name):
+    raw = (request.args.get(name) or "").strip()
+    return datetime.strptime(raw, "%Y-%m-%d").date() if raw else None
+
+
 @views.route("/admin/users")
 @login_required
 @roles_required('admin')
+@conditional("user")
 def system_users_list():
     page = request.args.get("page", 1, type=int)
     per_page = request.args.get("per_page", 10, type=int)
@@ -2036,5 +2020,33 @@ def system_user_delete(user_id):
     return redirect(url_for("views.system_users_list"))
 
 
+@views.route("/admin/slow-queries")
+@login_required
+@roles_required('admin')
+def slow_query_list():
+    limit = min(max(request.args.get("limit", 50, type=int), 1), 500)
+
+    queries = summarize_slow_queries(
+        current_app.config["SLOW_QUERY_LOG_FILE"],
+        limit=limit,
+    )
 
+    return render_template(
+        "admin_slow_queries.html",
+        user=current_user,
+        queries=queries,
+        enabled=current_app.config["SLOW_QUERY_LOG"],
+        threshold_ms=current_app.config["SLOW_QUERY_THRESHOLD_MS"],
+        limit=limit,
+    )
 
+
+@views.route("/admin/profiles/<name>")
+@login_required
+@roles_required('admin')
+def profile_download(name):
+    return send_from_directory(
+        current_app.config["PROFILE_DIR"],
+        name,
+        as_attachment=True,
+    )